@@ -0,0 +1,76 @@
+"""
+Compares copying the bodies of loops being unrolled with :func:`copy.deepcopy` against pragma's own AST cloning, both
+on their own and as part of unrolling a loop.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_clone [--repeat N] [--sizes N ...]
+"""
+import argparse
+import ast
+import copy
+import gc
+import linecache
+import sys
+import time
+from unittest import mock
+
+import pragma
+from pragma.core.cache import transform_cache
+from pragma.core.clone import clone
+
+transformer = sys.modules['pragma.core.transformer']
+
+BODY = '''
+acc += x[i % 4] * i + (acc - i) // 3
+if acc > i:
+    y = f(acc, b=[1, 2, (3, i)])
+'''
+
+
+def make_kernel(n):
+    source = ('def kernel(x, f):\n    acc = y = 0\n    for i in range({}):\n'.format(n)
+              + ''.join('        ' + line + '\n' for line in BODY.strip().splitlines())
+              + '    return acc, y\n')
+    filename = '<bench_clone {}>'.format(n)
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)  # So pragma can find it
+    namespace = {}
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace['kernel']
+
+
+def measure(run, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+    args = parser.parse_args()
+
+    transform_cache.maxsize = 0
+    body = ast.parse(BODY).body
+    for n in args.sizes:
+        t_deepcopy = measure(lambda: [copy.deepcopy(body) for _ in range(n)], args.repeat)
+        t_clone = measure(lambda: [clone(body) for _ in range(n)], args.repeat)
+        print("{:>6} copies:  deepcopy {:9.2f} ms   clone {:9.2f} ms   speedup {:.1f}x".format(
+            n, t_deepcopy * 1e3, t_clone * 1e3, t_deepcopy / t_clone))
+
+        kernel = make_kernel(n)
+        decorate = pragma.unroll(return_source=True)
+        with mock.patch.object(transformer, 'clone', copy.deepcopy):
+            t_before = measure(lambda: decorate(kernel), args.repeat)
+        t_after = measure(lambda: decorate(kernel), args.repeat)
+        print("{:>6} iterations unrolled:  deepcopy {:9.2f} ms   clone {:9.2f} ms   speedup {:.1f}x".format(
+            n, t_before * 1e3, t_after * 1e3, t_before / t_after))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the code generator backends on the large, straight-line functions that unrolling produces, both rendering
+the whole source at once and streaming it a piece at a time.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_codegen [--sizes N ...]
+"""
+import argparse
+import ast
+import gc
+import io
+import time
+import tracemalloc
+
+from pragma.core import codegen
+
+
+def unrolled_module(n):
+    """Builds the AST that unrolling a loop of ``n`` iterations over a small arithmetic body produces"""
+    body = ''.join('    acc += x[{}] * {} + (acc - {}) // 3\n'.format(i % 4, i, i) for i in range(n))
+    return ast.parse('def f(x):\n    acc = 0\n' + body + '    return acc\n')
+
+
+def measure(render, repeat=3):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        render()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        render()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        f_mod = unrolled_module(n)
+        for backend in sorted(codegen.BACKENDS):
+            modes = [
+                ('whole', lambda: codegen.BACKENDS[backend](f_mod)),
+                ('streaming', lambda: codegen.write_source(f_mod, io.StringIO(), backend)),
+            ]
+            for mode, render in modes:
+                elapsed, peak = measure(render)
+                print("{:>7} statements  {:<8} {:<10} {:8.3f} s  peak {:8.1f} MiB".format(
+                    n, backend, mode, elapsed, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares transformation time with and without pycontracts validation. Since contracts are bound when pragma is
+imported, each mode is measured in its own subprocess.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_contracts [--repeat N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def workload():
+    import pragma
+    from pragma.core.cache import transform_cache
+
+    transform_cache.maxsize = 0  # Every decoration should do the full transformation
+
+    coeffs = [1, 2, 3, 4, 5, 6, 7, 8]
+
+    def kernel(x):
+        acc = 0
+        for i in range(len(coeffs)):
+            for j in range(4):
+                acc += coeffs[i] * x[j] + (i * j) // 2
+        return acc
+
+    pragma.unroll(return_source=True)(kernel)
+    pragma.collapse_literals(return_source=True)(kernel)
+
+
+def measure(repeat):
+    start = time.perf_counter()
+    import pragma  # noqa: F401 -- import cost (including contract registration) is part of the measurement
+    import_time = time.perf_counter() - start
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        workload()
+        times.append(time.perf_counter() - start)
+    return {'import': import_time, 'min': min(times), 'mean': sum(times) / len(times)}
+
+
+def run_mode(contracts, repeat):
+    env = dict(os.environ, PRAGMA_CONTRACTS='1' if contracts else '0')
+    out = subprocess.check_output([sys.executable, '-m', __spec__.name, '--worker', '--repeat', str(repeat)], env=env)
+    return json.loads(out.decode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.repeat)))
+        return
+
+    results = {'production': run_mode(False, args.repeat), 'contracts': run_mode(True, args.repeat)}
+    for mode, res in results.items():
+        print("{:<12} import {:8.1f} ms   transform min {:8.2f} ms   mean {:8.2f} ms".format(
+            mode, res['import'] * 1e3, res['min'] * 1e3, res['mean'] * 1e3))
+    print("speedup: {:.1f}x".format(results['contracts']['min'] / results['production']['min']))
+
+
+if __name__ == '__main__':
+    main()
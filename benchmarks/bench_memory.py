@@ -0,0 +1,86 @@
+"""
+Measures the memory retained by decorating many functions in a module with a large namespace. Each transformed
+function keeps its own global namespace, so this grows with both the number of functions and the module's size.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_memory [--functions N] [--globals N] [--live-globals]
+"""
+import argparse
+import gc
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def module_source(n_functions, n_globals):
+    lines = ['c{} = {}'.format(i, i) for i in range(n_globals)]
+    for i in range(n_functions):
+        lines += [
+            '',
+            'def f{}(x):'.format(i),
+            '    for j in range(3):',
+            '        x += c{} * j'.format(i % n_globals),
+            '    return x',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def load_module(source, directory):
+    path = os.path.join(directory, '_pragma_bench_memory.py')
+    with open(path, 'w') as fp:
+        fp.write(source)
+    spec = importlib.util.spec_from_file_location('_pragma_bench_memory', path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # So that pragma can find the module's file
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(n_functions, n_globals, live_globals=False):
+    import pragma
+    from pragma.core.cache import transform_cache
+
+    transform_cache.maxsize = 0  # The cache would keep its own references to each function
+    directory = tempfile.mkdtemp(prefix='pragma_bench_')
+    try:
+        module = load_module(module_source(n_functions, n_globals), directory)
+        pragma.unroll(module.f0)  # Warm up imports and caches outside of the measurement
+
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        decorate = pragma.unroll(save_source=False, live_globals=live_globals)
+        funcs = [decorate(getattr(module, 'f{}'.format(i))) for i in range(n_functions)]
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert funcs[-1](0) == 3 * ((n_functions - 1) % n_globals)
+        del sys.modules[module.__name__]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {'functions': n_functions, 'globals': n_globals, 'live_globals': live_globals, 'time_s': elapsed,
+            'retained_bytes': retained, 'peak_bytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--functions', type=int, default=1000)
+    parser.add_argument('--globals', type=int, default=5000)
+    parser.add_argument('--live-globals', action='store_true', help="Run transformed functions against live globals")
+    args = parser.parse_args()
+
+    res = measure(args.functions, args.globals, args.live_globals)
+    print("{functions} functions, {globals} globals: {time_s:.2f} s, retained {retained:.1f} MiB, "
+          "peak {peak:.1f} MiB".format(retained=res['retained_bytes'] / 2 ** 20, peak=res['peak_bytes'] / 2 ** 20,
+                                       **res))
+
+
+if __name__ == '__main__':
+    main()
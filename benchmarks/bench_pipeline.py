@@ -0,0 +1,65 @@
+"""
+Compares stacking deindex, unroll, and collapse_literals against fusing them with ``pragma.pipeline``, which parses
+and compiles the function once rather than once per decorator.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_pipeline [--repeat N] [--sizes N ...]
+"""
+import argparse
+import gc
+import math
+import time
+
+import pragma
+from pragma.core.cache import transform_cache
+
+
+def make_kernel(n):
+    fns = [math.sin, math.cos, math.tan] * (n // 3 + 1)
+
+    def kernel(x):
+        y = 0
+        for i in range(n):
+            y += fns[i](x) * i
+        return y
+
+    return fns, kernel
+
+
+def stacked(fns, kernel):
+    return pragma.collapse_literals(pragma.deindex(fns, 'fns')(pragma.unroll(kernel)))
+
+
+def fused(fns, kernel):
+    return pragma.pipeline(pragma.unroll, pragma.deindex(fns, 'fns'), pragma.collapse_literals)(kernel)
+
+
+def measure(decorate, fns, kernel, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        decorate(fns, kernel)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 32, 256])
+    args = parser.parse_args()
+
+    transform_cache.maxsize = 0  # Every decoration should do the full transformation
+    for n in args.sizes:
+        fns, kernel = make_kernel(n)
+        assert stacked(fns, kernel)(0.5) == fused(fns, kernel)(0.5)
+        t_stacked = measure(stacked, fns, kernel, args.repeat)
+        t_fused = measure(fused, fns, kernel, args.repeat)
+        print("trip count {:>5}: stacked {:8.2f} ms   pipeline {:8.2f} ms   speedup {:.1f}x".format(
+            n, t_stacked * 1e3, t_fused * 1e3, t_stacked / t_fused))
+
+
+if __name__ == '__main__':
+    main()
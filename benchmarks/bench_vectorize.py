@@ -0,0 +1,57 @@
+"""
+Compares calling an element-wise kernel over NumPy arrays as a loop, unrolled, and vectorized into slice operations
+with ``pragma.vectorize_loops``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_vectorize [--repeat N] [--sizes N ...]
+"""
+import argparse
+import linecache
+import timeit
+
+import numpy as np
+
+import pragma
+
+
+def make_kernel(n):
+    source = (
+        'def kernel(out, a, b, k):\n'
+        '    for i in range({}):\n'
+        '        out[i] = a[i] * b[i] + k\n'
+        '    return out\n'
+    ).format(n)
+    filename = '<bench_vectorize {}>'.format(n)
+    # pragma reads the kernel's source through linecache
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = {}
+    exec(compile(source, filename, 'exec'), namespace)
+    return namespace['kernel']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[8, 64, 512])
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        kernel = make_kernel(n)
+        versions = [
+            ('loop', kernel),
+            ('unrolled', pragma.unroll(kernel)),
+            ('vectorized', pragma.vectorize_loops(kernel)),
+            ('unrolled+vectorized', pragma.pipeline(pragma.unroll, pragma.vectorize_loops)(kernel)),
+        ]
+        a, b = np.random.rand(n), np.random.rand(n)
+        expected = kernel(np.empty(n), a, b, 2.0)
+        out = np.empty(n)
+        for name, f in versions:
+            np.testing.assert_allclose(f(out, a, b, 2.0), expected)
+            elapsed = min(timeit.repeat(lambda: f(out, a, b, 2.0), number=args.repeat, repeat=3)) / args.repeat
+            print("size {:>5}: {:<20} {:10.2f} us".format(n, name, elapsed * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Measures transformation time and peak memory for each decorator over synthetic functions of increasing size.
+
+Every benchmark generates a module's source, imports it, and times decorating one of its functions. Time and memory
+are measured in separate runs, since tracing allocations slows everything down. Results are written as JSON so they
+can be compared across releases. Only the standard library is needed.
+
+Run from the repository root::
+
+    python -m benchmarks.run [--output results.json] [--quick] [--only unroll ...]
+"""
+import argparse
+import datetime
+import gc
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+
+import pragma
+from pragma.core.cache import transform_cache
+
+
+class Benchmark:
+    """A family of synthetic functions, parameterized by a single size, and how to decorate them"""
+
+    def __init__(self, name, decorator, param, values, quick_values, source, decorate):
+        self.name = name
+        self.decorator = decorator
+        self.param = param
+        self.values = values
+        self.quick_values = quick_values
+        self._source = source
+        self._decorate = decorate
+
+    def source(self, value):
+        return textwrap.dedent(self._source(value))
+
+    def decorate(self, module, value):
+        return self._decorate(module, value)
+
+
+def _unroll_trip_count(n):
+    return '''
+    N = {}
+
+    def f(x):
+        acc = 0
+        for i in range(N):
+            acc += x[i % 4] * i
+        return acc
+    '''.format(n)
+
+
+def _unroll_nesting(depth):
+    lines = ['def f(x):', '    acc = 0']
+    for d in range(depth):
+        lines.append('    ' * (d + 1) + 'for i{} in range(4):'.format(d))
+    lines.append('    ' * (depth + 1) + 'acc += x * ({})'.format(' + '.join('i{}'.format(d) for d in range(depth))))
+    lines.append('    return acc')
+    return '\n'.join(lines)
+
+
+def _collapse_globals(n):
+    glbls = '\n'.join('c{} = {}'.format(i, i) for i in range(n))
+    return glbls + '''
+
+def f(x):
+    y = c0 + c1 * 2
+    if c0 > 0:
+        y += x
+    return y * c{} + x
+'''.format(n - 1)
+
+
+def _deindex_elements(n):
+    body = '\n'.join('    y += fns[{}](x)'.format(i) for i in range(n))
+    return '''
+import math
+
+fns = [math.sin, math.cos, math.tan] * {}
+
+def f(x):
+    y = 0
+{}
+    return y
+'''.format((n + 2) // 3, body)
+
+
+def _inline_call_sites(n):
+    body = '\n'.join('    y += sqr(x + {})'.format(i) for i in range(n))
+    return '''
+def sqr(a):
+    return a ** 2
+
+def f(x):
+    y = 0
+{}
+    return y
+'''.format(body)
+
+
+def _lift_closure_vars(n):
+    names = ['v{}'.format(i) for i in range(n)]
+    return '''
+def make():
+{}
+    def f(x):
+        return x + {}
+    return f
+'''.format('\n'.join('    {} = {}'.format(v, i) for i, v in enumerate(names)), ' + '.join(names))
+
+
+BENCHMARKS = [
+    Benchmark('unroll_trip_count', 'unroll', 'trip_count', [10, 100, 1000, 10000, 100000], [10, 100, 1000],
+              _unroll_trip_count, lambda mod, n: pragma.unroll(mod.f)),
+    Benchmark('unroll_nesting', 'unroll', 'depth', [1, 2, 3, 4, 5, 6], [1, 2, 3],
+              _unroll_nesting, lambda mod, n: pragma.unroll(mod.f)),
+    Benchmark('collapse_globals', 'collapse_literals', 'globals', [10, 100, 1000, 10000, 100000], [10, 100, 1000],
+              _collapse_globals, lambda mod, n: pragma.collapse_literals(mod.f)),
+    Benchmark('deindex_elements', 'deindex', 'elements', [10, 100, 1000, 3000], [10, 100],
+              _deindex_elements, lambda mod, n: pragma.deindex(mod.fns, 'fns')(mod.f)),
+    Benchmark('inline_call_sites', 'inline', 'call_sites', [1, 10, 100, 1000], [1, 10, 100],
+              _inline_call_sites, lambda mod, n: pragma.inline(mod.sqr)(mod.f)),
+    Benchmark('lift_closure_vars', 'lift', 'closure_vars', [10, 100, 1000], [10, 100],
+              _lift_closure_vars, lambda mod, n: pragma.lift(imports=False)(mod.make())),
+]
+
+_module_ids = itertools.count()
+
+
+def load_module(source, directory):
+    name = '_pragma_bench_{}'.format(next(_module_ids))
+    path = os.path.join(directory, name + '.py')
+    with open(path, 'w') as fp:
+        fp.write(source)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # So that pragma can find the module's file
+    spec.loader.exec_module(module)
+    return module
+
+
+def measure(bench, value, directory, min_time=0.2, max_repeat=20):
+    module = load_module(bench.source(value), directory)
+
+    times = []
+    while len(times) < max_repeat and (not times or sum(times) < min_time):
+        gc.collect()
+        start = time.perf_counter()
+        bench.decorate(module, value)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        bench.decorate(module, value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    del sys.modules[module.__name__]
+    return {
+        'benchmark': bench.name,
+        'decorator': bench.decorator,
+        'param': bench.param,
+        'value': value,
+        'repeat': len(times),
+        'time_min_s': min(times),
+        'time_mean_s': sum(times) / len(times),
+        'peak_memory_bytes': peak,
+    }
+
+
+def run(benchmarks, quick=False, log=sys.stderr):
+    transform_cache.maxsize = 0  # Each decoration must do the whole transformation
+    directory = tempfile.mkdtemp(prefix='pragma_bench_')
+    results = []
+    try:
+        for bench in benchmarks:
+            for value in (bench.quick_values if quick else bench.values):
+                res = measure(bench, value, directory)
+                results.append(res)
+                print("{:<20} {:>12}={:<8} {:10.4f} s  {:10.1f} KiB".format(
+                    bench.name, bench.param, value, res['time_min_s'], res['peak_memory_bytes'] / 1024), file=log)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--output', '-o', help="JSON file to write results to (default: stdout)")
+    parser.add_argument('--quick', action='store_true', help="Only run the smaller sizes of each benchmark")
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help="Only run benchmarks whose name or decorator matches")
+    args = parser.parse_args()
+
+    benchmarks = [b for b in BENCHMARKS if not args.only or b.name in args.only or b.decorator in args.only]
+    report = {
+        'meta': {
+            'pragma_version': pragma.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'contracts': pragma.config.contracts,
+            'quick': args.quick,
+            'timestamp': datetime.datetime.now().isoformat(),
+        },
+        'results': run(benchmarks, quick=args.quick),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
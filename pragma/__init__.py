@@ -1,7 +1,12 @@
+__version__ = '0.2.5'
+
 from . import core
 from .collapse_literals import collapse_literals
+from .core import materialize_all
 from .deindex import deindex
 from .inline import inline
 # from .cleanup import cleanup
 from .lift import lift
+from .pipeline import optimize, pipeline
 from .unroll import unroll
+from .vectorize import vectorize_loops
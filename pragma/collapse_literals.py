@@ -18,7 +18,7 @@ class CollapseTransformer(TrackedContextTransformer):
             if self.collapse_iterables:
                 return res
             else:
-                log.debug("Not collapsing iterable {}. Change this setting with collapse_literals(collapse_iterables=True)".format(res))
+                log.debug("Not collapsing iterable %s. Change this setting with collapse_literals(collapse_iterables=True)", res)
         return node
 
     def visit_BinOp(self, node):
@@ -77,7 +77,7 @@ class CollapseTransformer(TrackedContextTransformer):
         cond = self.resolve_literal(node.test, raw=True)
         # print("Attempting to collapse IF conditioned on {}".format(cond))
         if not isinstance(cond, ast.AST):
-            log.debug("Collapsing if condition ({} resolved to {})".format(node.test, cond))
+            log.debug("Collapsing if condition (%s resolved to %s)", node.test, cond)
             body = node.body if cond else node.orelse
             result = []
             for subnode in body:
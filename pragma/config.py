@@ -0,0 +1,47 @@
+"""
+Global settings, read from the environment when pragma is first imported. Settings that determine how pragma's
+internals are bound, such as :data:`contracts`, have no effect if changed afterwards; the others may be changed at any
+time.
+"""
+import os
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('', '0', 'false', 'no', 'off')
+
+
+#: Validate the arguments and return values of pragma's internal functions with pycontracts. Every resolver call is
+#: checked, including each recursive call, which makes transformations several times slower, so this is meant as a
+#: debugging aid. Enable it by setting ``PRAGMA_CONTRACTS=1``.
+contracts = _env_flag('PRAGMA_CONTRACTS')
+
+#: How source code is generated from transformed ASTs (for ``return_source``, ``save_source``, and debug logging):
+#: ``'astor'``, the default, whose formatting pragma's documentation follows; ``'unparse'``, the standard library's
+#: faster :func:`ast.unparse` (Python 3.9+); or ``'auto'``, for ``unparse`` where it's available. Set it with
+#: ``PRAGMA_CODEGEN``.
+codegen = os.environ.get('PRAGMA_CODEGEN', 'astor')
+
+#: Functions with more statements than this have their source generated, and saved, a piece at a time, rather than
+#: building all of it in memory at once. Set it with ``PRAGMA_STREAMING_THRESHOLD``.
+streaming_threshold = int(os.environ.get('PRAGMA_STREAMING_THRESHOLD', 2000))
+
+#: The most iterations ``unroll`` will run a ``while`` loop for while trying to unroll it. Loops that run longer are left
+#: alone. Set it with ``PRAGMA_MAX_WHILE_ITERATIONS``.
+max_while_iterations = int(os.environ.get('PRAGMA_MAX_WHILE_ITERATIONS', 1000))
+
+#: The most items ``unroll`` will expand a comprehension or generator expression into. Longer ones are left alone. Set it
+#: with ``PRAGMA_MAX_COMPREHENSION_ITEMS``.
+max_comprehension_items = int(os.environ.get('PRAGMA_MAX_COMPREHENSION_ITEMS', 1000))
+
+#: The fewest iterations a loop, or run of unrolled statements, must have for ``vectorize_loops`` to rewrite it as NumPy
+#: slice operations. Shorter ones run faster without the check that the arrays can be vectorized. Set it with
+#: ``PRAGMA_VECTORIZE_MIN_LENGTH``.
+vectorize_min_length = int(os.environ.get('PRAGMA_VECTORIZE_MIN_LENGTH', 16))
+
+#: How many transformed functions saved with ``save_source='linecache'`` may keep their AST until their source is first
+#: needed. Beyond this, the oldest function's source is generated so that its AST can be freed. Set it with
+#: ``PRAGMA_LINECACHE_PENDING``.
+linecache_pending = int(os.environ.get('PRAGMA_LINECACHE_PENDING', 128))
@@ -1,10 +1,14 @@
 import ast
+import contextlib
 import functools
 import inspect
 import logging
 
 import astor
-from miniutils.magic_contract import safe_new_contract
+
+from .. import config
+from .codegen import to_source
+from .contracts import safe_new_contract
 
 log = logging.getLogger(__name__.split('.')[0])
 
@@ -17,13 +21,14 @@ def _is_indexable(x):
     return hasattr(x, '__getitem__')
 
 
-safe_new_contract('iterable', _is_iterable)
-safe_new_contract('indexable', _is_indexable)
-safe_new_contract('literal', 'int|float|str|bool|tuple|list|None')
-for name, tp in inspect.getmembers(ast, inspect.isclass):
-    if name[0] == '_':  # python 3.8 added ast._AST which pycontracts does not like
-        continue
-    safe_new_contract(name, tp)
+if config.contracts:
+    safe_new_contract('iterable', _is_iterable)
+    safe_new_contract('indexable', _is_indexable)
+    safe_new_contract('literal', 'int|float|str|bool|tuple|list|None')
+    for name, tp in inspect.getmembers(ast, inspect.isclass):
+        if name[0] == '_':  # python 3.8 added ast._AST which pycontracts does not like
+            continue
+        safe_new_contract(name, tp)
 
 # Astor tries to get fancy by failing nicely, but in doing so they fail when traversing non-AST type node properties.
 #  By deleting this custom handler, it'll fall back to the default ast visit pattern, which skips these missing
@@ -45,12 +50,30 @@ def _pretty_str(o):
         elif isinstance(o, ast.Attribute):
             return "{}.{}".format(_pretty_str(o.value), o.attr)
 
-        return astor.to_source(o).strip()
+        return to_source(o).strip()
     else:
         return repr(o)
 
 
 _log_call_depth = 0
+_tracing = False
+
+
+@contextlib.contextmanager
+def tracing(enabled=True):
+    """
+    Turns the call tracing of :func:`_log_call` on or off within a block. Tracing renders every argument and result
+    as source code, so it's only worth enabling while debug logging is on
+    :param enabled: Whether resolver calls should be logged
+    :type enabled: bool
+    """
+    global _tracing
+    was_tracing = _tracing
+    _tracing = enabled
+    try:
+        yield
+    finally:
+        _tracing = was_tracing
 
 
 def _log_call(f):
@@ -58,6 +81,9 @@ def _log_call(f):
     def inner(*args, **kwargs):
         global _log_call_depth
 
+        if not _tracing:
+            return f(*args, **kwargs)
+
         result = None
         ex = None
         log.debug("START {}{}({})".format(
@@ -94,5 +120,7 @@ def _log_call(f):
 
 
 from .stack import DictStack
+from .lazy import LazyFunction, materialize_all
+from .stats import TransformStats
 from .resolve import *
 from .transformer import *
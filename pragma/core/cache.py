@@ -0,0 +1,443 @@
+import ast
+import hashlib
+import inspect
+import logging
+import marshal
+import os
+import sys
+import tempfile
+import types
+from collections import OrderedDict, namedtuple
+
+log = logging.getLogger(__name__)
+
+_literal_types = (type(None), bool, int, float, complex, str, bytes, range, type(Ellipsis))
+#: The methods and attributes of classes implemented in C, which can't change. Taken from real objects, since the
+#: names for most of these types were only added to ``types`` in Python 3.7
+_descriptor_types = (type(str.join), type(object.__init__), type(dict.__dict__['fromkeys']),
+                     types.GetSetDescriptorType, types.MemberDescriptorType)
+
+
+class Unfingerprintable(TypeError):
+    """Raised when a value in a function's context can't be reduced to a stable, cross-process fingerprint"""
+
+
+def code_names(code):
+    """
+    Collects every global, closure, and attribute name referenced by a code object, including nested code objects
+    :param code: The code object to inspect
+    :type code: code
+    :return: The set of referenced names
+    :rtype: set
+    """
+    names = set(code.co_names) | set(code.co_freevars)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+#: Builtins that can reach any of a function's globals, not just those its code names
+_dynamic_builtins = frozenset(('globals', 'vars', 'locals', 'dir', 'eval', 'exec'))
+#: Module attributes that the interpreter itself looks up in a function's globals
+_module_attrs = ('__name__', '__builtins__', '__package__', '__spec__', '__loader__', '__file__')
+
+
+def function_namespace(code, context):
+    """
+    Builds a global namespace for compiled code, containing only the names from its context which it refers to
+    :param code: The code object which will run in the namespace
+    :type code: code
+    :param context: The names and values visible to the code
+    :type context: Mapping
+    :return: The new namespace
+    :rtype: dict
+    """
+    names = code_names(code)
+    if names & _dynamic_builtins:
+        return dict(context)
+    return {k: context[k] for k in names.union(_module_attrs) if k in context}
+
+
+def live_closure(func, f):
+    """
+    Builds a closure for a transformed function which shares the original function's cells, wherever both refer to
+    the same free variable
+    :param func: The transformed function, whose closure may contain placeholders for ``f``'s free variables
+    :type func: Callable
+    :param f: The original function
+    :type f: Callable
+    :return: The closure for ``func``'s code
+    :rtype: tuple|None
+    """
+    if not func.__closure__:
+        return None
+    cells = dict(zip(f.__code__.co_freevars, f.__closure__ or ()))
+    return tuple(cells.get(name, cell) for name, cell in zip(func.__code__.co_freevars, func.__closure__))
+
+
+def _source_hash(f):
+    try:
+        source = inspect.getsource(f)
+    except (OSError, TypeError) as ex:
+        raise Unfingerprintable("Cannot get the source of {}".format(f)) from ex
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _attributes(value, names):
+    """
+    :param value: A module or class
+    :param names: The names some code refers to
+    :type names: Iterable[str]
+    :return: Those of ``value``'s attributes which the code could read, found without running any descriptors
+    :rtype: dict
+    """
+    attrs = {}
+    for name in names:
+        if name.startswith('__'):
+            continue
+        try:
+            attr = inspect.getattr_static(value, name)
+        except AttributeError:
+            continue
+        if isinstance(attr, (staticmethod, classmethod)):
+            attr = attr.__func__
+        attrs[name] = attr
+    return attrs
+
+
+def fingerprint(value, names=()):
+    """
+    Reduces a value to a nested tuple of strings which is stable across processes, so it can be hashed into a key.
+    Values whose identity can't be captured this way raise :class:`Unfingerprintable`
+    :param value: The value to fingerprint
+    :param names: The names referred to by the code using ``value``. Modules and classes are fingerprinted along with
+        their attributes of these names, since the resolvers read them (e.g. ``range(settings.N)``)
+    :type names: Iterable[str]
+    :return: The fingerprint
+    :rtype: tuple
+    """
+    return _fingerprint(value, frozenset(names), set())
+
+
+def _fingerprint(value, names, seen):
+    if isinstance(value, _literal_types):
+        return type(value).__name__, repr(value)
+    elif isinstance(value, (tuple, list)):
+        return (type(value).__name__,) + tuple(_fingerprint(v, names, seen) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return (type(value).__name__,) + tuple(sorted(_fingerprint(v, names, seen) for v in value))
+    elif isinstance(value, dict):
+        return ('dict',) + tuple(sorted((_fingerprint(k, names, seen), _fingerprint(v, names, seen))
+                                        for k, v in value.items()))
+    elif isinstance(value, ast.AST):
+        return 'ast', ast.dump(value)
+    elif isinstance(value, (types.ModuleType, type)):
+        if isinstance(value, types.ModuleType):
+            identity = 'module', value.__name__
+        else:
+            identity = 'class', value.__module__, value.__qualname__
+        # Builtins can't change, and modules and classes can refer to each other
+        if id(value) in seen or getattr(value, '__module__', None) == 'builtins':
+            return identity
+        seen.add(id(value))
+        return identity + (_fingerprint(_attributes(value, names), names, seen),)
+    elif isinstance(value, inspect.Signature):
+        return 'signature', str(value)
+    elif isinstance(value, types.FunctionType):
+        attrs = {k: v for k, v in value.__dict__.items() if not k.startswith('__')}
+        return 'function', value.__module__, value.__qualname__, _source_hash(value), _fingerprint(attrs, names, seen)
+    elif isinstance(value, types.BuiltinFunctionType):
+        return 'callable', getattr(value, '__module__', None) or '', value.__qualname__
+    elif isinstance(value, _descriptor_types):
+        return 'descriptor', value.__objclass__.__module__, value.__qualname__
+    elif type(value).__module__ == 'numpy':
+        # Numpy scalars repr as their value, which is sufficient; arrays are better left uncached
+        if getattr(value, 'shape', None) == ():
+            return type(value).__name__, repr(value)
+        # Ufuncs (numpy.add, ...) are fixed, named functions
+        if type(value).__name__ == 'ufunc':
+            return 'ufunc', value.__name__
+    raise Unfingerprintable("Cannot fingerprint {!r} of type {}".format(value, type(value)))
+
+
+def default_cache_dir():
+    """
+    The directory used when caching is enabled without an explicit location. Taken from ``PRAGMA_CACHE_DIR`` if set,
+    otherwise a ``pragma`` folder within the user's cache directory
+    :rtype: str
+    """
+    if os.environ.get('PRAGMA_CACHE_DIR'):
+        return os.environ['PRAGMA_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pragma')
+
+
+class DiskCache:
+    """
+    Stores compiled, transformed functions on disk so that later processes can skip parsing and transformation.
+
+    Each entry is keyed on the function's source, the decorator and its arguments, the pragma and interpreter versions,
+    and a fingerprint of every context value the function refers to. An entry consists of the marshalled module code
+    object and, if the source was saved, a ``.py`` file containing the transformed source, which the code object
+    points to so that the function stays inspectable.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_cache_dir()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, f, decorator, options, context):
+        """
+        Computes the cache key for a transformation, or None if the transformation can't be safely cached
+        :param f: The function being transformed
+        :type f: Callable
+        :param decorator: The name of the decorator doing the transformation
+        :type decorator: str
+        :param options: All arguments given to the decorator which affect the transformation
+        :type options: dict
+        :param context: The names and values visible to the transformer
+        :type context: Mapping
+        :return: The hex digest identifying this transformation
+        :rtype: str|None
+        """
+        from .. import __version__
+
+        used = code_names(f.__code__)
+        try:
+            parts = (
+                __version__,
+                sys.implementation.cache_tag,
+                decorator,
+                _source_hash(f),
+                fingerprint(options),
+                fingerprint({k: context[k] for k in used if k in context}, used),
+            )
+        except Unfingerprintable as ex:
+            log.debug("Not caching {}: {}".format(f.__qualname__, ex))
+            return None
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+    def source_file(self, key):
+        return os.path.join(self.path, key + '.py')
+
+    def _code_file(self, key):
+        return os.path.join(self.path, key + '.marshal')
+
+    def load(self, key):
+        """
+        :param key: The key from :meth:`key`
+        :type key: str
+        :return: The module code object stored under that key, or None on a cache miss
+        :rtype: code|None
+        """
+        try:
+            with open(self._code_file(key), 'rb') as fp:
+                code = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return code
+
+    def store(self, key, code, source=None):
+        """
+        Saves a compiled module (and, optionally, its source) under the given key. Failures are logged, not raised,
+        since the cache is only ever an optimization
+        :param key: The key from :meth:`key`
+        :type key: str
+        :param code: The compiled module
+        :type code: code
+        :param source: The module's source code
+        :type source: str|None
+        """
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            if source is not None:
+                self._atomic_write(self.source_file(key), source.encode('utf-8'))
+            self._atomic_write(self._code_file(key), marshal.dumps(code))
+        except OSError as ex:
+            log.warning("Failed to write pragma cache entry to {}".format(self.path), exc_info=ex)
+
+    def _atomic_write(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+_caches = {}
+
+
+def get_cache(path=None):
+    """
+    Returns the shared :class:`DiskCache` for the given directory
+    :param path: The cache directory, or None for :func:`default_cache_dir`
+    :type path: str|None
+    :rtype: DiskCache
+    """
+    path = path or default_cache_dir()
+    if path not in _caches:
+        _caches[path] = DiskCache(path)
+    return _caches[path]
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+def _slotted(value):
+    """Whether some of ``value``'s attributes are kept in slots, outside its ``__dict__``"""
+    return any(getattr(cls, '__slots__', ()) for cls in type(value).__mro__ if '__slots__' in vars(cls))
+
+
+def _structural(value, pinned, names=frozenset(), seen=None):
+    """In-process counterpart to :func:`fingerprint`: literals and containers are keyed by value, anything else by
+    identity (plus its attributes, since the resolvers can read them, or for modules and classes, those of their
+    attributes in ``names``). Objects keyed by identity are appended to ``pinned`` so that the cache entry keeps them
+    alive and their ids can't be reused. Objects that could be changed in place without it showing in their
+    ``__dict__`` (e.g. arrays, or instances with ``__slots__``) raise :class:`Unfingerprintable`"""
+    if seen is None:
+        seen = set()
+    if isinstance(value, _literal_types):
+        return type(value), value
+    elif isinstance(value, (tuple, list)):
+        return (type(value),) + tuple(_structural(v, pinned, names, seen) for v in value)
+    elif isinstance(value, (set, frozenset)):
+        return type(value), frozenset(_structural(v, pinned, names, seen) for v in value)
+    elif isinstance(value, dict):
+        return dict, frozenset((_structural(k, pinned, names, seen), _structural(v, pinned, names, seen))
+                               for k, v in value.items())
+    elif isinstance(value, ast.AST):
+        return ast.AST, ast.dump(value)
+
+    pinned.append(value)
+    if id(value) in seen:  # Modules and classes can refer to each other
+        return id(value),
+    if isinstance(value, (type, types.ModuleType)):
+        if getattr(value, '__module__', None) == 'builtins':
+            return id(value),
+        seen.add(id(value))
+        return id(value), _structural(_attributes(value, names), pinned, names, seen)
+    if isinstance(value, (types.BuiltinFunctionType,) + _descriptor_types):
+        return id(value),
+    elif type(value).__module__ == 'numpy':
+        if getattr(value, 'shape', None) == ():
+            return type(value), repr(value)
+        if type(value).__name__ == 'ufunc':
+            return id(value),
+    attrs = getattr(value, '__dict__', None)
+    if isinstance(attrs, dict) and not _slotted(value):
+        seen.add(id(value))
+        return id(value), _structural({k: v for k, v in attrs.items() if not k.startswith('__')}, pinned, names, seen)
+    raise Unfingerprintable("Cannot key {!r} of type {}, it could change in place".format(value, type(value)))
+
+
+class TransformLRU:
+    """
+    A bounded, in-process cache of transformed functions, for closures that get re-decorated every time a factory
+    function runs. Entries are keyed on the original function's code object, the decorator's arguments, and the
+    values of the globals and closure variables the function actually refers to. A hit reuses the compiled code and
+    only builds a new function object around it, bound to the new closure's context.
+
+    Setting :attr:`maxsize` to 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def key(self, f, decorator, options, context):
+        """
+        :param f: The function being transformed
+        :type f: Callable
+        :param decorator: The name of the decorator doing the transformation
+        :type decorator: str
+        :param options: All arguments given to the decorator which affect the transformation
+        :type options: dict
+        :param context: The names and values visible to the transformer
+        :type context: Mapping
+        :return: The cache key (or None if caching is disabled, or the context holds something that could change in
+            place without the key noticing), and the objects it refers to by identity
+        :rtype: tuple
+        """
+        if self.maxsize <= 0:
+            return None, None
+        pinned = []
+        used = code_names(f.__code__)
+        try:
+            key = (
+                decorator,
+                f.__code__,
+                _structural(options, pinned),
+                _structural({k: context[k] for k in used if k in context}, pinned, used),
+            )
+        except Unfingerprintable as ex:
+            log.debug("Not caching %s in memory: %s", f.__qualname__, ex)
+            return None, None
+        return key, pinned
+
+    def get(self, key, f, glbls, live=False):
+        """
+        Looks up a transformation, and if found, binds its code to the given function's defaults and context
+        :param key: The key from :meth:`key`
+        :param f: The original function being transformed
+        :type f: Callable
+        :param glbls: The names and values visible to the transformed function
+        :type glbls: Mapping
+        :param live: Whether the transformed function runs against ``f``'s own globals and closure cells
+        :type live: bool
+        :return: The transformed function, or None on a cache miss
+        :rtype: Callable|None
+        """
+        if key is None:
+            return None
+        try:
+            cached, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        if live:
+            func = types.FunctionType(cached.__code__, f.__globals__, cached.__name__, f.__defaults__,
+                                      live_closure(cached, f))
+        else:
+            glbls = function_namespace(cached.__code__, glbls)
+            func = types.FunctionType(cached.__code__, glbls, cached.__name__, f.__defaults__)
+            glbls[func.__name__] = func
+        func.__kwdefaults__ = dict(f.__kwdefaults__) if f.__kwdefaults__ else None
+        func.__annotations__ = dict(f.__annotations__)
+        for attr in ('__qualname__', '__tempfile__'):
+            if hasattr(cached, attr):
+                setattr(func, attr, getattr(cached, attr))
+        return func
+
+    def put(self, key, pinned, func):
+        if key is None:
+            return
+        self._entries[key] = (func, pinned)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def info(self):
+        """
+        :return: Hit and miss counts, like ``functools.lru_cache``'s ``cache_info()``
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+transform_cache = TransformLRU()
@@ -0,0 +1,38 @@
+"""
+A faster equivalent of :func:`copy.deepcopy` for ASTs, for transformations which emit the same code many times (such as
+unrolling a loop or inlining a function at every call site).
+
+A clone is a full deep copy: every node with fields is copied, so nothing is copied on write and no subtrees are shared
+between the clone and the original. Only the field-less contexts and operators (``Load``, ``Add``, ``Eq``, ...), which
+python's parser already shares between all the nodes in a tree, and immutable values such as names, numbers and strings
+are reused. The speed up comes from skipping ``deepcopy``'s memo and dispatch machinery, not from sharing.
+"""
+import ast
+import copy
+
+#: Node types without fields, which are never modified and so are reused rather than copied
+_SHARED = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+_IMMUTABLE = {type(None), bool, int, float, complex, str, bytes, type(Ellipsis)}
+
+
+def clone(node):
+    """
+    :param node: An AST, or a list of them (e.g. a block of statements)
+    :type node: AST|list
+    :return: A copy of the AST which can be modified without affecting the original
+    :rtype: AST|list
+    """
+    tp = type(node)
+    if tp is list:
+        return [clone(n) for n in node]
+    if tp in _IMMUTABLE:
+        return node
+    if isinstance(node, ast.AST):
+        if isinstance(node, _SHARED):
+            return node
+        new = tp.__new__(tp)
+        new.__dict__.update({k: clone(v) for k, v in node.__dict__.items()})
+        return new
+    if tp is tuple:
+        return tuple(clone(n) for n in node)
+    return copy.deepcopy(node)
@@ -0,0 +1,116 @@
+"""
+Generates source code from ASTs, for returning or saving transformed functions and for debug logging. Which backend
+is used is set by :data:`pragma.config.codegen`.
+"""
+import ast
+import copy
+
+import astor
+
+from .. import config
+from .clone import clone
+
+
+def _astor(node):
+    return astor.to_source(node)
+
+
+def _unparse(node):
+    # ast.unparse needs every statement's location, which the nodes transformers create don't have
+    return ast.unparse(ast.fix_missing_locations(clone(node))) + '\n'
+
+
+#: The available code generators, by name. Each takes an AST and returns its source, ending with a newline
+BACKENDS = {'astor': _astor}
+if hasattr(ast, 'unparse'):  # Python 3.9+
+    BACKENDS['unparse'] = _unparse
+
+
+def get_backend(name=None):
+    """
+    :param name: A backend's name, ``'auto'`` for the fastest one available, or None for :data:`pragma.config.codegen`
+    :type name: str|None
+    :return: The code generator
+    :rtype: Callable
+    """
+    name = name or config.codegen
+    if name == 'auto':
+        name = 'unparse' if 'unparse' in BACKENDS else 'astor'
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError("Unknown code generator {!r}, expected one of: auto, {}".format(
+            name, ', '.join(sorted(BACKENDS)))) from None
+
+
+def to_source(node, backend=None):
+    """
+    :param node: The AST to render
+    :type node: AST
+    :param backend: The code generator to use (see :func:`get_backend`)
+    :type backend: str|None
+    :return: The node's source code
+    :rtype: str
+    """
+    render = get_backend(backend)
+    try:
+        if is_large(node):
+            return ''.join(iter_source(node, backend))
+        return render(node)
+    except Exception as ex:  # pragma: nocover
+        raise RuntimeError(astor.dump_tree(node)) from ex
+
+
+def is_large(node):
+    """
+    :param node: An AST
+    :type node: AST
+    :return: Whether the node is a module defining a function with more than :data:`pragma.config.streaming_threshold`
+        statements, whose source should be generated a piece at a time
+    :rtype: bool
+    """
+    return (isinstance(node, ast.Module) and len(node.body) == 1
+            and isinstance(node.body[0], (ast.FunctionDef, ast.AsyncFunctionDef))
+            and len(node.body[0].body) > config.streaming_threshold)
+
+
+def iter_source(f_mod, backend=None, chunk_size=500):
+    """
+    Generates a module's source a piece at a time. The bodies of large functions are rendered ``chunk_size`` statements
+    at a time, so that the whole source never has to be held in memory at once.
+    :param f_mod: The module to render
+    :type f_mod: Module
+    :param backend: The code generator to use (see :func:`get_backend`)
+    :type backend: str|None
+    :param chunk_size: How many of a function's statements to render at a time
+    :type chunk_size: int
+    :return: The pieces of the module's source, in order
+    :rtype: Iterator[str]
+    """
+    render = get_backend(backend)
+    for stmt in f_mod.body:
+        if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)) or len(stmt.body) <= chunk_size:
+            yield render(stmt)
+            continue
+
+        # Render the signature with a placeholder body to find how many lines it takes
+        func_def = copy.copy(stmt)
+        func_def.body = [ast.Pass()]
+        header = render(func_def).splitlines(True)[:-1]
+        yield ''.join(header)
+        for start in range(0, len(stmt.body), chunk_size):
+            func_def.body = stmt.body[start:start + chunk_size]
+            yield render(func_def).split('\n', len(header))[-1]
+
+
+def write_source(f_mod, fp, backend=None):
+    """
+    Writes a module's source to a file as it's generated
+    :param f_mod: The module to render
+    :type f_mod: Module
+    :param fp: An open text file
+    :param backend: The code generator to use (see :func:`get_backend`)
+    :type backend: str|None
+    """
+    for piece in iter_source(f_mod, backend):
+        fp.write(piece)
@@ -0,0 +1,22 @@
+from miniutils import magic_contract as _magic_contract
+from miniutils.magic_contract import safe_new_contract as _safe_new_contract
+
+from .. import config
+
+
+def magic_contract(*args, **kwargs):
+    """
+    Drop-in replacement for ``miniutils.magic_contract`` which only applies the contract when
+    :data:`pragma.config.contracts` is enabled. Otherwise the undecorated function is returned as-is, so the checks
+    cost nothing
+    """
+    if len(args) == 1 and len(kwargs) == 0 and callable(args[0]):
+        return _magic_contract(args[0]) if config.contracts else args[0]
+    if config.contracts:
+        return _magic_contract(*args, **kwargs)
+    return lambda f: f
+
+
+def safe_new_contract(name, *args, **kwargs):
+    if config.contracts:
+        _safe_new_contract(name, *args, **kwargs)
@@ -0,0 +1,74 @@
+import functools
+import threading
+import types
+import weakref
+
+_pending = weakref.WeakSet()
+_lock = threading.RLock()
+
+
+class LazyFunction:
+    """
+    Stands in for a decorated function until it's first called, and only then runs the (potentially expensive)
+    transformation. Once transformed, the proxy replaces itself in its module's namespace with the real function, so
+    later calls through the module don't pay for the indirection.
+    """
+
+    def __init__(self, f, transform):
+        functools.update_wrapper(self, f)
+        self._transform = transform
+        self._func = None
+        _pending.add(self)
+
+    def materialize(self):
+        """
+        Runs the transformation now, if it hasn't been run yet
+        :return: The transformed function
+        :rtype: Callable
+        """
+        if self._func is None:
+            with _lock:
+                if self._func is None:
+                    f = self.__wrapped__
+                    self._func = self._transform(f)
+                    _pending.discard(self)
+                    glbls = getattr(f, '__globals__', {})
+                    if glbls.get(f.__name__) is self:
+                        glbls[f.__name__] = self._func
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.materialize()(*args, **kwargs)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return types.MethodType(self, instance)
+
+    def __repr__(self):
+        return '<lazy {} {}>'.format('transformed' if self._func is not None else 'pending', self.__wrapped__)
+
+
+def materialize(f):
+    """
+    :param f: A function, possibly a :class:`LazyFunction` proxy
+    :type f: Callable
+    :return: The real function behind ``f``
+    :rtype: Callable
+    """
+    return f.materialize() if isinstance(f, LazyFunction) else f
+
+
+def materialize_all():
+    """
+    Transforms every function that was lazily decorated but hasn't been called yet. Use this to move the work to a
+    convenient point, such as before a server forks its workers.
+
+    :return: The number of functions that were transformed
+    :rtype: int
+    """
+    with _lock:
+        pending = list(_pending)
+        for f in pending:
+            f.materialize()
+    return len(pending)
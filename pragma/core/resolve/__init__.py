@@ -1,11 +1,13 @@
 import ast
 import builtins
+import functools
 import inspect
+import itertools
 import logging
 import math
 import operator as ops
 
-from miniutils import magic_contract
+from ..contracts import magic_contract
 
 from .. import _log_call, DictStack, _pretty_str
 
@@ -18,6 +20,56 @@ try:
 except NameError:
     pass
 
+#: Helpers from ``itertools``, ``functools`` and ``operator`` whose results only depend on their arguments, so they can
+#: be evaluated while resolving. ``count``, ``cycle`` and ``repeat`` are left out since they can go on forever, and
+#: ``tee`` and ``groupby`` since they share state between the iterators they return. The in-place operators and
+#: ``setitem``/``delitem`` are left out since they modify their arguments, and ``call`` and ``methodcaller`` since they
+#: call whatever they're given
+pure_iteration_functions = {
+    itertools.chain, itertools.chain.from_iterable, itertools.combinations, itertools.combinations_with_replacement,
+    itertools.compress, itertools.islice, itertools.permutations, itertools.product, itertools.zip_longest,
+}
+pure_iteration_functions.update(
+    func for name, func in inspect.getmembers(ops, callable)
+    if not name.startswith('_') and name not in ('setitem', 'delitem', 'call', 'methodcaller')
+    and not (name.startswith('i') and {name[1:], name[1:] + '_'} & set(ops.__all__))  # iadd, iand, ...
+)
+
+#: Helpers which call a function they're given, with the position and keyword of that argument. They're only pure when
+#: the function they're given is, e.g. ``reduce(operator.mul, shape)``, and never run functions defined by the user
+callback_functions = {
+    functools.reduce: (0, None),
+    itertools.accumulate: (1, 'func'),
+    itertools.dropwhile: (0, None),
+    itertools.filterfalse: (0, None),
+    itertools.starmap: (0, None),
+    itertools.takewhile: (0, None),
+}
+pure_iteration_functions.update(callback_functions)
+pure_functions |= pure_iteration_functions
+
+
+def is_pure_call(func, args, kwargs):
+    """
+    :param func: The function being called, which is in :data:`pure_functions`
+    :type func: callable
+    :param args: Its resolved positional arguments
+    :type args: list
+    :param kwargs: Its resolved keyword arguments
+    :type kwargs: dict
+    :return: Whether calling ``func`` with these arguments only depends on them, and so can be done while resolving
+    :rtype: bool
+    """
+    if func not in callback_functions:
+        return True
+    position, keyword = callback_functions[func]
+    callback = args[position] if len(args) > position else kwargs.get(keyword)
+    try:
+        return callback is None or callback in pure_functions
+    except TypeError:  # Unhashable, so certainly not one of them
+        return False
+
+
 @_log_call
 @magic_contract
 def resolve_name_or_attribute(node, ctxt):
@@ -34,7 +86,7 @@ def resolve_name_or_attribute(node, ctxt):
         try:
             return ctxt[node.id]
         except KeyError:
-            log.debug("'{}' has been assigned to, but with an unknown value".format(node.id))
+            log.debug("'%s' has been assigned to, but with an unknown value", node.id)
             return node
     elif isinstance(node, ast.NameConstant):
         return node.value
@@ -43,7 +95,7 @@ def resolve_name_or_attribute(node, ctxt):
         if not isinstance(base_obj, ast.AST):
             return getattr(base_obj, node.attr, node)
         else:
-            log.debug("Could not resolve '{}.{}'".format(node.value, node.attr))
+            log.debug("Could not resolve '%s.%s'", node.value, node.attr)
             return node
     else:
         return node
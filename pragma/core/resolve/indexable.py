@@ -1,7 +1,7 @@
 import ast
 import logging
 
-from miniutils import magic_contract
+from ..contracts import magic_contract
 
 from .. import _log_call, DictStack
 
@@ -55,6 +55,8 @@ def _resolve_indexable_call(node, ctxt):
 
     args = _resolve_args(node.args, ctxt)
     kwargs = _resolve_keywords(node.keywords, ctxt)
+    if not is_pure_call(func, args, kwargs):
+        raise ValueError("Function {} is only pure when its callback is, can't resolve as iterable".format(func))
     result = func(*args, **kwargs)
 
     return result
@@ -133,6 +135,6 @@ def resolve_indexable(node, ctxt):
 
 
 from pragma.core.resolve import resolve_name_or_attribute, _resolve_args, _resolve_keywords, pure_functions, \
-    _collapse_map
+    is_pure_call, _collapse_map
 from pragma.core.resolve.iterable import resolve_iterable
 from pragma.core.resolve.literal import resolve_literal
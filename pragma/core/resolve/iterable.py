@@ -1,10 +1,10 @@
 import ast
 import logging
 
-from miniutils import magic_contract
+from ..contracts import magic_contract
 
 from .. import _log_call
-from . import pure_functions
+from . import pure_functions, is_pure_call
 
 log = logging.getLogger(__name__)
 
@@ -45,6 +45,8 @@ def _resolve_iterable_call(node, ctxt):
 
     args = _resolve_args(node.args, ctxt)
     kwargs = _resolve_keywords(node.keywords, ctxt)
+    if not is_pure_call(func, args, kwargs):
+        raise ValueError("Function {} is only pure when its callback is, can't resolve as iterable".format(func))
     result = func(*args, **kwargs)
 
     return iter(result)
@@ -76,7 +78,7 @@ def _resolve_mappable_keysvaluesitems(node, ctxt):
     elif node.func.attr == 'items':
         return tuple(base_obj.items())
     else:
-        log.debug('Could not resolve {} of {} as map iterator'.format(node.func.attr, base_obj))  #  deepcode ignore W1202
+        log.debug('Could not resolve %s of %s as map iterator', node.func.attr, base_obj)  #  deepcode ignore W1202
         return node
 
 
@@ -109,6 +111,9 @@ def _resolve_iterable(node, ctxt):
     elif isinstance(node, (ast.List, ast.Tuple)):
         return _resolve_iterable_list_or_tuple(node, ctxt)
 
+    elif isinstance(node, (ast.Str, ast.Bytes)):
+        return iter(node.s)
+
     elif isinstance(node, ast.Subscript):
         return _resolve_iterable_subscript(node, ctxt)
 
@@ -143,7 +148,7 @@ def resolve_iterable(node, ctxt):
     """
     try:
         return list(_resolve_iterable(node, ctxt))
-    except (AssertionError, TypeError, KeyError, IndexError) as ex:
+    except (AssertionError, TypeError, ValueError, KeyError, IndexError) as ex:
         log.debug("Failed to resolve as iterable", exc_info=ex)
         return None
 
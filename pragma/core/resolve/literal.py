@@ -3,7 +3,7 @@ import logging
 import traceback
 import warnings
 
-from miniutils import magic_contract
+from ..contracts import magic_contract
 
 from .. import _log_call, DictStack
 from . import CollapsableNode, primitive_types, primitive_ast_types, iterable_ast_types
@@ -120,10 +120,10 @@ def resolve_literal_name(node, ctxt):
     if isinstance(res, ast.AST) and not isinstance(res, (ast.Name, ast.Attribute, ast.NameConstant)):
         new_res = _resolve_literal(res, ctxt)
         if is_wrappable(new_res):
-            log.debug("{} can be replaced by more specific literal {}".format(res, new_res))
+            log.debug("%s can be replaced by more specific literal %s", res, new_res)
             res = new_res
         else:
-            log.debug("{} is an AST node, but can't safely be made more specific".format(res))
+            log.debug("%s is an AST node, but can't safely be made more specific", res)
     return res
 
 
@@ -183,12 +183,12 @@ def resolve_literal_subscript(node, ctxt):
                 else:
                     return item
             except (KeyError, IndexError):
-                log.debug("Cannot index {}[{}]".format(indexable, slice))
+                log.debug("Cannot index %s[%s]", indexable, slice)
                 return node
         else:
-            log.debug("Cannot resolve index to literal '{}'".format(node.slice))
+            log.debug("Cannot resolve index to literal '%s'", node.slice)
     else:
-        log.debug("Cannot resolve '{}' to indexable object".format(node.value))
+        log.debug("Cannot resolve '%s' to indexable object", node.value)
 
     return node
 
@@ -323,7 +323,7 @@ def resolve_literal_call(node, ctxt):
     if isinstance(func, ast.AST):  # We don't even know what's being called
         return node
     if func not in pure_functions:
-        log.info("Function {} isn't known to be a pure function, can't resolve".format(func))
+        log.info("Function %s isn't known to be a pure function, can't resolve", func)
         return node
 
     args = None
@@ -332,10 +332,13 @@ def resolve_literal_call(node, ctxt):
     try:
         args = _resolve_args(node.args, ctxt)
         kwargs = _resolve_keywords(node.keywords, ctxt)
+        if not is_pure_call(func, args, kwargs):
+            log.info("Function %s is only pure when its callback is, can't resolve", func)
+            return node
         # If we've made it this far, we know the function and its arguments. Run it and return the result
         return func(*args, **kwargs)
     except Exception as ex:
-        log.debug("Failed to run '{}(*{}, **{})'".format(func, args, kwargs), exc_info=ex)
+        log.debug("Failed to run '%s(*%s, **%s)'", func, args, kwargs, exc_info=ex)
         return node
 
 
@@ -358,10 +361,10 @@ def resolve_literal(node, ctxt, give_raw_result=False):
     try:
         return make_ast_from_literal(result)
     except TypeError:
-        log.debug("Failed to convert {} into AST".format(result))
+        log.debug("Failed to convert %s into AST", result)
         return node
 
 
 from pragma.core.resolve import _collapse_map, num_types, float_types, resolve_name_or_attribute, pure_functions, \
-    _resolve_args, _resolve_keywords
+    is_pure_call, _resolve_args, _resolve_keywords
 from pragma.core.resolve.indexable import resolve_indexable
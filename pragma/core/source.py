@@ -0,0 +1,109 @@
+"""
+Finds and parses the source of functions being transformed. Each source file is parsed once to index where its
+function definitions are, and each function's definition is then parsed on its own whenever it's needed, which is much
+cheaper than searching the file for it again.
+"""
+import ast
+import linecache
+import sys
+import textwrap
+import threading
+
+_defs = (ast.FunctionDef, ast.AsyncFunctionDef)
+#: Whether AST nodes record where they end, which is needed to find a definition's source
+_has_spans = sys.version_info >= (3, 8)
+
+
+class SourceIndex:
+    """
+    Where every function definition in a source file is, by the line its code object starts on (its first decorator,
+    or else its ``def``) and by qualified name
+    """
+
+    def __init__(self, lines, filename=''):
+        #: The lines the index was built from, as cached by :mod:`linecache`. The index is only valid for these
+        self.lines = lines
+        self.by_line = {}
+        self.by_qualname = {}
+        self._index(ast.parse(''.join(lines), filename).body, '')
+
+    def _index(self, body, prefix):
+        for node in body:
+            if isinstance(node, _defs):
+                qualname = prefix + node.name
+                start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+                span = (start, node.end_lineno, node.name)
+                self.by_line[start] = self.by_line[node.lineno] = span
+                self.by_qualname.setdefault(qualname, span)
+                self._index(node.body, qualname + '.<locals>.')
+            elif isinstance(node, ast.ClassDef):
+                self._index(node.body, prefix + node.name + '.')
+            else:
+                # Definitions may be nested inside any other compound statement
+                for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                    self._index(getattr(node, field, ()), prefix)
+
+    def source(self, f):
+        """
+        :param f: A function defined in this file
+        :type f: Callable
+        :return: The dedented source of the function's definition, including its decorators, or None if it can't be
+            found
+        :rtype: str|None
+        """
+        span = self.by_line.get(f.__code__.co_firstlineno)
+        if span is None or span[2] != f.__name__:
+            span = self.by_qualname.get(f.__qualname__)
+        if span is None:
+            return None
+        start, end, _ = span
+        return textwrap.dedent(''.join(self.lines[start - 1:end]))
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_index(f):
+    """
+    :param f: A function
+    :type f: Callable
+    :return: The index of the file ``f`` was defined in, or None if its source isn't available
+    :rtype: SourceIndex|None
+    """
+    filename = f.__code__.co_filename
+    # Drops linecache's copy of the file if it's changed on disk, so a new list of lines means the index is stale
+    linecache.checkcache(filename)
+    lines = linecache.getlines(filename, getattr(f, '__globals__', None))
+    if not lines:
+        return None
+    index = _indexes.get(filename)
+    if index is None or index.lines is not lines:
+        with _lock:
+            index = _indexes.get(filename)
+            if index is None or index.lines is not lines:
+                index = _indexes[filename] = SourceIndex(lines, filename)
+    return index
+
+
+def function_source(f):
+    """
+    :param f: A function
+    :type f: Callable
+    :return: The dedented source of ``f``'s definition, or None if it can't be found through an index (either since
+        the source isn't available, or this version of python doesn't record where definitions end)
+    :rtype: str|None
+    """
+    if not _has_spans:
+        return None
+    try:
+        index = get_index(f)
+    except (AttributeError, SyntaxError, ValueError):
+        return None
+    return index.source(f) if index is not None else None
+
+
+def clear():
+    """Forgets every index"""
+    with _lock:
+        _indexes.clear()
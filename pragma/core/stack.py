@@ -1,56 +1,179 @@
+import builtins
+from types import MappingProxyType
+
+#: A read-only view of the builtins, shared as the bottom layer of every stack
+BUILTINS = MappingProxyType(builtins.__dict__)
+
+
 class DictStack:
     """
     Creates a stack of dictionaries to roughly emulate closures and variable environments
+
+    The base mappings (builtins, then each of ``base`` in order) are read-only fallbacks: assignments always go into a
+    scope layered on top of them, so they're never copied or modified. Every name that's bound in some scope is indexed
+    to the scopes that bind it, so looking a name up, testing for it, pushing and popping scopes, and taking and
+    restoring snapshots don't depend on how many names are defined.
+
+    A name may be bound to ``None``, which means that it's defined but its value is unknown: it's in the stack, but
+    getting it raises a ``KeyError``.
     """
 
     def __init__(self, *base):
-        import builtins
-        self.dicts = [dict(builtins.__dict__)] + [dict(d) for d in base]
+        self.base = [BUILTINS] + list(base)
         self.constants = [True] + [False] * len(base)
+        # The topmost scope is always last. The bottom scope receives assignments made before anything's pushed
+        self._scopes = [{}]
+        # Maps each scoped name to the depths of the scopes binding it, innermost last
+        self._index = {}
+        # Maps base names that have been deleted to how many of the base mappings defining them are hidden
+        self._masked = {}
+        # Undo actions, recorded only while a snapshot is outstanding
+        self._journal = []
+        self._snapshots = 0
+
+    def _lookup(self, item):
+        depths = self._index.get(item)
+        if depths:
+            return self._scopes[depths[-1]][item]
+        skip = self._masked.get(item, 0)
+        for dct in reversed(self.base):
+            if item in dct:
+                if not skip:
+                    return dct[item]
+                skip -= 1
+        raise KeyError("Can't find '{}' anywhere in the function's context".format(item))
+
+    def _record(self, undo, *args):
+        if self._snapshots:
+            self._journal.append((undo, args))
 
     def __iter__(self):
-        return (key for dct in self.dicts for key in dct.keys())
+        return iter(self.keys())
 
     def __setitem__(self, key, value):
         # print("SETTING {} = {}".format(key, value))
-        self.dicts[-1][key] = value
+        scope = self._scopes[-1]
+        if key in scope:
+            self._record(scope.__setitem__, key, scope[key])
+        else:
+            self._index.setdefault(key, []).append(len(self._scopes) - 1)
+            self._record(self._unbind, key)
+        scope[key] = value
 
     def __getitem__(self, item):
-        for dct in self.dicts[::-1]:
-            if item in dct:
-                if dct[item] is None:
-                    raise KeyError("Found '{}', but it was set to an unknown value".format(item))
-                return dct[item]
-        raise KeyError("Can't find '{}' anywhere in the function's context".format(item))
+        value = self._lookup(item)
+        if value is None:
+            raise KeyError("Found '{}', but it was set to an unknown value".format(item))
+        return value
 
     def __delitem__(self, item):
-        for dct in self.dicts[::-1]:
-            if item in dct:
-                del dct[item]
-                return
-        raise KeyError()
+        depths = self._index.get(item)
+        if depths:
+            self._record(self._bind, item, depths[-1], self._scopes[depths[-1]][item])
+            self._unbind(item)
+            return
+        self._lookup(item)  # Raises a KeyError if there's nothing left to delete
+        self._record(self._unmask, item)
+        self._masked[item] = self._masked.get(item, 0) + 1
+
+    def _bind(self, key, depth, value):
+        self._scopes[depth][key] = value
+        self._index.setdefault(key, []).append(depth)
+
+    def _unbind(self, key):
+        depths = self._index[key]
+        del self._scopes[depths.pop()][key]
+        if not depths:
+            del self._index[key]
+
+    def _unmask(self, key):
+        self._masked[key] -= 1
+        if not self._masked[key]:
+            del self._masked[key]
 
     def __contains__(self, item):
-        return any(item == key for dct in self.dicts for key in dct.keys())
+        try:
+            self._lookup(item)
+        except KeyError:
+            return False
+        return True
 
     def items(self):
-        items = []
-        for dct in self.dicts[::-1]:
-            for k, v in dct.items():
-                if k not in items:
-                    items.append((k, v))
-        return items
+        return [(k, self._lookup(k)) for k in self.keys()]
 
     def keys(self):
-        return set().union(*[dct.keys() for dct in self.dicts])
+        keys = set(self._index)
+        for k in set().union(*self.base):
+            if k not in keys and k in self:
+                keys.add(k)
+        return keys
 
     def push(self, dct=None, is_constant=False):
-        self.dicts.append(dct or {})
+        self._push_scope(dict(dct or {}))
         self.constants.append(is_constant)
 
+    def _push_scope(self, scope):
+        depth = len(self._scopes)
+        self._scopes.append(scope)
+        for key in scope:
+            self._index.setdefault(key, []).append(depth)
+        self._record(self._pop_scope)
+
     def pop(self):
         self.constants.pop()
-        return self.dicts.pop()
+        return self._pop_scope()
+
+    def _pop_scope(self):
+        scope = self._scopes.pop()
+        for key in scope:
+            self._unbind_popped(key)
+        self._record(self._push_scope, scope)
+        return scope
+
+    def _unbind_popped(self, key):
+        depths = self._index[key]
+        depths.pop()
+        if not depths:
+            del self._index[key]
+
+    def snapshot(self):
+        """
+        Marks the current state, so that it can be returned to with :meth:`restore`. Every snapshot must eventually be
+        passed to either :meth:`restore` or :meth:`release`, most recent first.
+
+        :return: A token identifying this state
+        :rtype: int
+        """
+        self._snapshots += 1
+        return len(self._journal)
+
+    def restore(self, token):
+        """
+        Undoes every change (assignments, deletions, pushes and pops) made since ``token`` was taken
+
+        :param token: A snapshot, as returned by :meth:`snapshot`
+        :type token: int
+        """
+        journal, self._journal = self._journal, []
+        snapshots, self._snapshots = self._snapshots, 0  # Don't record the undo actions themselves
+        try:
+            while len(journal) > token:
+                undo, args = journal.pop()
+                undo(*args)
+        finally:
+            self._journal, self._snapshots = journal, snapshots
+        self.release(token)
+
+    def release(self, token):
+        """
+        Keeps every change made since ``token`` was taken, and forgets the snapshot
+
+        :param token: A snapshot, as returned by :meth:`snapshot`
+        :type token: int
+        """
+        self._snapshots -= 1
+        if not self._snapshots:
+            self._journal = []
 
     def __repr__(self):
-        return "{{...{}...{}}}".format(len(self.dicts) - 1, self.dicts[-2:])
+        return "{{...{}...{}}}".format(len(self.base) + len(self._scopes) - 1, self._scopes[-2:])
@@ -0,0 +1,111 @@
+import contextlib
+import threading
+import time
+from collections import defaultdict
+
+#: The phases of a transformation, in the order they happen. ``resolve`` is time spent inside the resolvers, and so is
+#: also included in ``walk``
+PHASES = ('cache', 'source', 'walk', 'resolve', 'codegen', 'io', 'compile')
+COUNTERS = ('nodes_visited', 'resolver_calls', 'ast_copies', 'emitted_nodes')
+
+
+class TransformStats:
+    """
+    Timings and counters for a single transformation. Transformed functions carry theirs as ``__pragma_stats__``.
+
+    Timings are in seconds, per phase (see :data:`PHASES`). Counters are:
+
+    - ``nodes_visited``: How many AST nodes the transformer visited, including repeat visits (e.g. unrolled bodies)
+    - ``resolver_calls``: How many times the transformer tried to resolve a node to a known value
+    - ``ast_copies``: How many AST subtrees were copied (e.g. once per unrolled iteration)
+    - ``emitted_nodes``: The size of the resulting function's AST
+    """
+    __slots__ = ('decorator', 'function', 'cache', 'timings', 'passes', 'stop_reason') + COUNTERS
+
+    def __init__(self, decorator=None, function=None):
+        self.decorator = decorator
+        self.function = function
+        #: Which cache the result came from, if any ('memory' or 'disk')
+        self.cache = None
+        self.timings = dict.fromkeys(PHASES, 0.0)
+        #: What each pass of a fixed-point optimization did, and why it stopped (see :func:`pragma.optimize`)
+        self.passes = []
+        self.stop_reason = None
+        self.nodes_visited = 0
+        self.resolver_calls = 0
+        self.ast_copies = 0
+        self.emitted_nodes = 0
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += time.perf_counter() - start
+
+    @property
+    def total(self):
+        """Total time, in seconds, across all (non-overlapping) phases"""
+        return sum(t for phase, t in self.timings.items() if phase != 'resolve')
+
+    def as_dict(self):
+        """
+        :return: A JSON-serializable summary of this transformation
+        :rtype: dict
+        """
+        result = {
+            'decorator': self.decorator,
+            'function': self.function,
+            'cache': self.cache,
+            'total': self.total,
+            'timings': dict(self.timings),
+            'passes': list(self.passes),
+            'stop_reason': self.stop_reason,
+        }
+        result.update((counter, getattr(self, counter)) for counter in COUNTERS)
+        return result
+
+    def __repr__(self):
+        return 'TransformStats({})'.format(', '.join('{}={!r}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+class StatsRegistry:
+    """
+    Process-wide totals of every transformation's :class:`TransformStats`, grouped by decorator, for exporting to a
+    metrics pipeline
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, stats):
+        """
+        :param stats: A finished transformation's stats
+        :type stats: TransformStats
+        """
+        with self._lock:
+            totals = self._totals[stats.decorator]
+            totals['transforms'] += 1
+            if stats.cache is not None:
+                totals['cache_hits_' + stats.cache] += 1
+            for phase, t in stats.timings.items():
+                totals['time_' + phase] += t
+            for counter in COUNTERS:
+                totals[counter] += getattr(stats, counter)
+
+    def snapshot(self):
+        """
+        :return: A copy of the current totals, as ``{decorator: {metric: value}}``
+        :rtype: dict
+        """
+        with self._lock:
+            return {decorator: dict(totals) for decorator, totals in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals = defaultdict(lambda: defaultdict(int))
+
+
+registry = StatsRegistry()
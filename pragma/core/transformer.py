@@ -4,16 +4,25 @@ import inspect
 import logging
 import sys
 import textwrap
+import time
 import warnings
+from collections import ChainMap
 
 import astor
 from miniutils.opt_decorator import optional_argument_decorator
-from miniutils import magic_contract
 
+from . import tracing
+from .contracts import magic_contract
 from .stack import DictStack
 from .resolve import resolve_literal, resolve_iterable, resolve_indexable, resolve_name_or_attribute, \
     make_ast_from_literal
-from ..utils import save_or_return_source
+from .cache import get_cache, transform_cache
+from .clone import clone
+from .lazy import LazyFunction, materialize
+from .source import function_source
+from .stats import TransformStats, registry
+from ..utils import save_or_return_source, exec_function, live_module, align_live_module, \
+    to_source
 
 log = logging.getLogger(__name__)
 
@@ -32,6 +41,11 @@ def function_ast(f):
     except (KeyError, AttributeError):  # pragma: nocover
         f_file = ''
 
+    source = function_source(f)
+    if source is not None:
+        root = ast.parse(source, f_file)
+        return root, root.body[0].body, f_file
+
     try:
         found = inspect.findsource(f)
     except IndexError as err:  # pragma: nocover
@@ -48,35 +62,110 @@ def function_ast(f):
 
 
 class DebugTransformerMixin:  # pragma: nocover
+    """Logs every node visit, resolution, and context change. This renders a lot of source code, so it's only mixed in
+    (see :func:`traced`) when debug logging is enabled at the time a function is decorated"""
+    tracing = True
+
     def visit(self, node):
-        orig_node_code = astor.to_source(node).strip()
-        log.debug("Starting to visit >> {} << ({})".format(orig_node_code, type(node)))
+        orig_node_code = to_source(node).strip()
+        log.debug("Starting to visit >> %s << (%s)", orig_node_code, type(node))
 
         new_node = super().visit(node)
 
         try:
             if new_node is None:
-                log.debug("Deleted >>> {} <<<".format(orig_node_code))
+                log.debug("Deleted >>> %s <<<", orig_node_code)
             elif isinstance(new_node, ast.AST):
                 log.debug(
-                    "Converted >>> {} <<< to >>> {} <<<".format(orig_node_code, astor.to_source(new_node).strip()))
+                    "Converted >>> {} <<< to >>> {} <<<".format(orig_node_code, to_source(new_node).strip()))
             elif isinstance(new_node, list):
                 log.debug("Converted >>> {} <<< to [[[ {} ]]]".format(orig_node_code, ", ".join(
-                    astor.to_source(n).strip() for n in new_node)))
+                    to_source(n).strip() for n in new_node)))
         except Exception as ex:
             log.error("Failed on {} >>> {}".format(orig_node_code, astor.dump_tree(new_node)), exc_info=ex)
             raise ex
 
         return new_node
 
+    def resolve_literal(self, node, raw=False):
+        log.debug("Attempting to resolve %s as literal", node)
+        resolution = super().resolve_literal(node, raw)
+        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not node
+                  else "Failed to resolve {} as literal".format(node))
+        return resolution
+
+    def resolve_name_or_attribute(self, node):
+        log.debug("Attempting to resolve name/attr %s", node)
+        resolution = super().resolve_name_or_attribute(node)
+        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not node
+                  else "Failed to resolve name/attr {}".format(node))
+        return resolution
+
+    def resolve_iterable(self, node):
+        log.debug("Attempting to resolve %s as iterable", node)
+        resolution = super().resolve_iterable(node)
+        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not None
+                  else "Failed to resolve {} as iterable".format(node))
+        return resolution
+
+    def resolve_indexable(self, node):
+        log.debug("Attempting to resolve %s as indexable", node)
+        resolution = super().resolve_indexable(node)
+        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not None
+                  else "Failed to resolve {} as indexable".format(node))
+        return resolution
+
+    def __setitem__(self, key, value):
+        log.debug(
+            "Context setting {} to {}".format(key, "?UNKNOWN?" if value is None else to_source(value).strip()))
+        super().__setitem__(key, value)
+
+    def __getitem__(self, item):
+        res = super().__getitem__(item)
+        log.debug(
+            "Context resolving {} to {}".format(item, "?UNKNOWN?" if res is None else to_source(res).strip()))
+        return res
+
+    def __delitem__(self, key):
+        log.debug("Context deleting %s", key)
+        super().__delitem__(key)
+
+
+_traced_types = {}
+
+
+def traced(transformer_type):
+    """
+    :param transformer_type: A subclass of :class:`TrackedContextTransformer`
+    :type transformer_type: type
+    :return: A subclass of the given transformer which logs everything it does
+    :rtype: type
+    """
+    if transformer_type not in _traced_types:
+        _traced_types[transformer_type] = type('Traced' + transformer_type.__name__,
+                                               (DebugTransformerMixin, transformer_type), {})
+    return _traced_types[transformer_type]
+
+
+class TrackedContextTransformer(ast.NodeTransformer):
+    tracing = False
 
-class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
     def __init__(self, ctxt=None):
         super().__init__()
         self.ctxt = ctxt or DictStack()
         self.conditional_execution = False
         self.in_main_func = False
         self.code_blocks = []
+        self.stats = TransformStats()
+
+    def visit(self, node):
+        self.stats.nodes_visited += 1
+        return getattr(self, 'visit_' + node.__class__.__name__, self.generic_visit)(node)
+
+    def copy(self, node):
+        """Copies an AST subtree, e.g. to emit it more than once"""
+        self.stats.ast_copies += 1
+        return clone(node)
 
     def visit_many(self, nodes):
         for n in nodes:
@@ -106,32 +195,24 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
         return lst
 
     def resolve_literal(self, node, raw=False):
-        log.debug("Attempting to resolve {} as literal".format(node))
-        resolution = resolve_literal(node, self.ctxt, give_raw_result=raw)
-        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not node
-                  else "Failed to resolve {} as literal".format(node))
-        return resolution
+        self.stats.resolver_calls += 1
+        with self.stats.phase('resolve'):
+            return resolve_literal(node, self.ctxt, give_raw_result=raw)
 
     def resolve_name_or_attribute(self, node):
-        log.debug("Attempting to resolve name/attr {}".format(node))
-        resolution = resolve_name_or_attribute(node, self.ctxt)
-        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not node
-                  else "Failed to resolve name/attr {}".format(node))
-        return resolution
+        self.stats.resolver_calls += 1
+        with self.stats.phase('resolve'):
+            return resolve_name_or_attribute(node, self.ctxt)
 
     def resolve_iterable(self, node):
-        log.debug("Attempting to resolve {} as iterable".format(node))
-        resolution = resolve_iterable(node, self.ctxt)
-        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not None
-                  else "Failed to resolve {} as iterable".format(node))
-        return resolution
+        self.stats.resolver_calls += 1
+        with self.stats.phase('resolve'):
+            return resolve_iterable(node, self.ctxt)
 
     def resolve_indexable(self, node):
-        log.debug("Attempting to resolve {} as indexable".format(node))
-        resolution = resolve_indexable(node, self.ctxt)
-        log.debug("Resolved {} to {}".format(node, resolution) if resolution is not None
-                  else "Failed to resolve {} as indexable".format(node))
-        return resolution
+        self.stats.resolver_calls += 1
+        with self.stats.phase('resolve'):
+            return resolve_indexable(node, self.ctxt)
 
     def generic_visit_less(self, node, *without):
         for field, old_value in ast.iter_fields(node):
@@ -158,18 +239,12 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
         return node
 
     def __setitem__(self, key, value):
-        log.debug(
-            "Context setting {} to {}".format(key, "?UNKNOWN?" if value is None else astor.to_source(value).strip()))
         self.ctxt[key] = value
 
     def __getitem__(self, item):
-        res = self.ctxt[item]
-        log.debug(
-            "Context resolving {} to {}".format(item, "?UNKNOWN?" if res is None else astor.to_source(res).strip()))
-        return res
+        return self.ctxt[item]
 
     def __delitem__(self, key):
-        log.debug("Context deleting {}".format(key))
         del self.ctxt[key]
 
     def _assign(self, name, val):
@@ -206,6 +281,9 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
             else:
                 literal_val = self.resolve_literal(val)
                 if isinstance(literal_val, ast.AST):
+                    # a = a * 2, where a is unknown: the expression can't stand in for a, since it would refer to itself
+                    if any(isinstance(n, ast.Name) and n.id == name.id for n in ast.walk(literal_val)):
+                        literal_val = None
                     self[name.id] = literal_val
                 else:
                     iterable_val = self.resolve_iterable(val)
@@ -253,7 +331,7 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
         try:
             return list(self._assign(name, val))
         except TypeError:
-            log.debug("Failed to assign {}={}, rvalue cannot be converted to AST".format(name, val))
+            log.debug("Failed to assign %s=%s, rvalue cannot be converted to AST", name, val)
 
     def visit_Assign(self, node):
         node.value = self.visit(node.value)
@@ -261,7 +339,6 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
         return node
 
     def visit_AugAssign(self, node):
-        node = copy.deepcopy(node)
         node.value = self.visit(node.value)
         new_val = self.resolve_literal(ast.BinOp(op=node.op, left=node.target, right=node.value))
         if not isinstance(new_val, ast.BinOp):
@@ -355,15 +432,237 @@ class TrackedContextTransformer(DebugTransformerMixin, ast.NodeTransformer):
         return self.generic_visit_less(node, 'body')
 
 
+class Stage:
+    """
+    A single transformation of a function's AST: the transformer to run, and the arguments a decorator was given for it
+    """
+
+    def __init__(self, transformer_type, name, transformer_kwargs=None, kwargs=None, function_globals=None,
+                 collapse_iterables=False, explicit_only=False, unroll_targets=None, unroll_in_tiers=None,
+                 max_statements=None, max_nodes=None, unroll_factor=None, unroll_versions=None):
+        self.transformer_type = transformer_type
+        self.name = name
+        self.transformer_kwargs = transformer_kwargs or {}
+        self.kwargs = kwargs or {}
+        self.function_globals = function_globals
+        self.collapse_iterables = collapse_iterables
+        self.explicit_only = explicit_only
+        self.unroll_targets = unroll_targets
+        self.unroll_in_tiers = unroll_in_tiers
+        self.max_statements = max_statements
+        self.max_nodes = max_nodes
+        self.unroll_factor = unroll_factor
+        self.unroll_versions = unroll_versions
+
+    @property
+    def options(self):
+        """Everything which affects the transformation besides the function's context, for keying caches"""
+        return dict(
+            name=self.name, collapse_iterables=self.collapse_iterables, explicit_only=self.explicit_only,
+            unroll_targets=self.unroll_targets, unroll_in_tiers=self.unroll_in_tiers, max_statements=self.max_statements,
+            max_nodes=self.max_nodes, unroll_factor=self.unroll_factor, unroll_versions=self.unroll_versions,
+            kwargs=self.kwargs, transformer_kwargs=self.transformer_kwargs)
+
+    def run(self, f_mod, glbls, stats, trace=False, explicit=None):
+        """
+        :param f_mod: A module containing only the function's definition
+        :type f_mod: Module
+        :param glbls: The names and values visible to the function
+        :type glbls: Mapping
+        :param stats: Where to count the transformer's work
+        :type stats: TransformStats
+        :param trace: Whether to log every step of the transformation
+        :type trace: bool
+        :param explicit: The names given through ``function_globals``, which are all an ``explicit_only`` stage sees
+            instead of ``glbls``
+        :type explicit: Mapping|None
+        :return: The transformed module
+        :rtype: Module
+        """
+        if self.explicit_only and explicit is not None:
+            glbls = explicit
+        transformer_type = traced(self.transformer_type) if trace else self.transformer_type
+        trans = transformer_type(DictStack(glbls, self.kwargs), **self.transformer_kwargs)
+        trans.stats = stats
+        trans.collapse_iterables = self.collapse_iterables
+        trans.unroll_targets = self.unroll_targets
+        trans.unroll_in_tiers = self.unroll_in_tiers
+        trans.max_statements = self.max_statements
+        trans.max_nodes = self.max_nodes
+        trans.unroll_factor = self.unroll_factor
+        trans.unroll_versions = self.unroll_versions
+        return trans.visit(f_mod)
+
+
+class FixedPoint:
+    """
+    Runs stages over a function's AST in rounds, until a whole round leaves it unchanged or a budget runs out. Each
+    stage's run is recorded in the transformation's :attr:`TransformStats.passes`.
+    """
+
+    def __init__(self, stages, max_passes=8, max_nodes=None, max_time=None):
+        """
+        :param stages: The transformations to alternate between
+        :type stages: list(Stage)
+        :param max_passes: The most rounds to run
+        :type max_passes: int
+        :param max_nodes: The largest AST to allow. A stage which would grow the AST beyond this is undone, and the
+            optimization stops
+        :type max_nodes: int|None
+        :param max_time: The longest time, in seconds, to keep starting new passes
+        :type max_time: float|None
+        """
+        self.stages = stages
+        self.max_passes = max_passes
+        self.max_nodes = max_nodes
+        self.max_time = max_time
+        self.name = 'optimize({})'.format(', '.join(stage.name for stage in stages))
+        merged = [stage.function_globals for stage in stages if stage.function_globals is not None]
+        self.function_globals = dict(ChainMap(*merged)) if merged else None
+        self.explicit_only = all(stage.explicit_only for stage in stages)
+        self.kwargs = dict(ChainMap(*[stage.kwargs for stage in stages]))
+
+    @property
+    def options(self):
+        """Everything which affects the transformation besides the function's context, for keying caches"""
+        return dict(name=self.name, stages=[stage.options for stage in self.stages], max_passes=self.max_passes,
+                    max_nodes=self.max_nodes, max_time=self.max_time)
+
+    def run(self, f_mod, glbls, stats, trace=False, explicit=None):
+        start = time.perf_counter()
+        dump = ast.dump(f_mod)
+        stats.stop_reason = 'max_passes'
+        for n in range(1, self.max_passes + 1):
+            changed = False
+            for stage in self.stages:
+                if self.max_time is not None and time.perf_counter() - start > self.max_time:
+                    stats.stop_reason = 'max_time'
+                    return f_mod
+                previous = copy.deepcopy(f_mod) if self.max_nodes is not None else None
+                stage_start = time.perf_counter()
+                f_mod = stage.run(f_mod, glbls, stats, trace, explicit)
+                new_dump = ast.dump(f_mod)
+                nodes = sum(1 for _ in ast.walk(f_mod))
+                stats.passes.append(dict(pass_number=n, stage=stage.name, changed=new_dump != dump, nodes=nodes,
+                                         time=time.perf_counter() - stage_start))
+                if self.max_nodes is not None and nodes > self.max_nodes:
+                    stats.stop_reason = 'max_nodes'
+                    return previous
+                changed = changed or new_dump != dump
+                dump = new_dump
+            if not changed:
+                stats.stop_reason = 'converged'
+                break
+        log.debug("%s stopped after %d passes (%s)", self.name, len(stats.passes), stats.stop_reason)
+        return f_mod
+
+
+def transform_function(f, stages, name, return_source=False, save_source=True, cache=False, live_globals=False):
+    """
+    Parses a function, runs each stage's transformation over its AST in order, and compiles the result (see the
+    decorators made by :func:`make_function_transformer` for the arguments)
+    :param f: The function to transform
+    :type f: Callable
+    :param stages: The transformations to run
+    :type stages: list(Stage)
+    :param name: What to call this transformation in stats and cache keys
+    :type name: str
+    :return: The transformed function, or its source code if requested
+    :rtype: Callable|str
+    """
+    stats = TransformStats(name, f.__qualname__)
+    result = _transform(f, stages, name, stats, return_source, save_source, cache, live_globals)
+    if not isinstance(result, str):
+        result.__pragma_stats__ = stats
+    registry.record(stats)
+    return result
+
+
+def _transform(f, stages, name, stats, return_source, save_source, cache, live_globals):
+    # The function's context is viewed in place rather than copied, since it may be large and only the names the
+    # function refers to are needed (either by the transformers or in the transformed function's globals)
+    overrides = [stage.function_globals for stage in stages if stage.function_globals is not None]
+    context = list(overrides)
+    if not all(stage.explicit_only for stage in stages):
+        # Grab function closure variables
+        if isinstance(f.__closure__, tuple):
+            context.append({k: v.cell_contents for k, v in zip(f.__code__.co_freevars, f.__closure__)})
+        # Grab function globals
+        context.append(f.__globals__)
+    elif not context and not any(stage.kwargs for stage in stages):
+        log.warning("No global context nor function context. No collapse will occur")
+    glbls = ChainMap(*context)
+
+    options = dict(save_source=save_source, live_globals=live_globals, stages=[stage.options for stage in stages])
+    # With live globals, the transformed function is run against f's own globals and closure, with only the
+    # function_globals overrides layered on top
+    live, namespace = (f, ChainMap(*overrides)) if live_globals else (None, glbls)
+    lru_key = pinned = None
+    disk_cache = key = None
+    with stats.phase('cache'):
+        if not return_source:
+            lru_key, pinned = transform_cache.key(f, name, options, glbls)
+            func = transform_cache.get(lru_key, f, glbls, live_globals)
+            if func is not None:
+                stats.cache = 'memory'
+                return func
+
+        if cache and not return_source:
+            disk_cache = get_cache(cache if isinstance(cache, str) else None)
+            key = disk_cache.key(f, name, options, glbls)
+            code = disk_cache.load(key) if key is not None else None
+            if code is not None:
+                stats.cache = 'disk'
+                func = exec_function(code, f.__name__, namespace, live=live)
+                transform_cache.put(lru_key, pinned, func)
+                return func
+
+    with stats.phase('source'):
+        f_mod, f_body, f_file = function_ast(f)
+    trace = log.isEnabledFor(logging.DEBUG)
+    f_mod.body[0].decorator_list = []
+    with tracing(trace), stats.phase('walk'):
+        # Stages marked explicit_only don't see the function's globals or closure, even if other stages do
+        for stage in stages:
+            f_mod = stage.run(f_mod, glbls, stats, trace, ChainMap(*overrides))
+    stats.emitted_nodes = sum(1 for _ in ast.walk(f_mod))
+    if key is None:
+        func = save_or_return_source(f_file, f_mod, namespace, return_source, save_source, stats, live)
+        if not return_source:
+            transform_cache.put(lru_key, pinned, func)
+        return func
+
+    func_name = f_mod.body[0].name
+    if live is not None:
+        f_mod = live_module(f_mod, live, namespace)
+    with stats.phase('codegen'):
+        source = to_source(f_mod) if save_source else None
+        if source is not None and live is not None:
+            align_live_module(f_mod, source)
+    if save_source:
+        f_file = disk_cache.source_file(key)
+    with stats.phase('compile'):
+        code = compile(ast.fix_missing_locations(f_mod), f_file, 'exec')
+        func = exec_function(code, func_name, namespace, live=live)
+    if source is not None:
+        # Pad the saved source the same way tempfiles are, see exec_function
+        source += '\n' * func.__code__.co_firstlineno
+    with stats.phase('io'):
+        disk_cache.store(key, code, source)
+    transform_cache.put(lru_key, pinned, func)
+    return func
+
+
 def make_function_transformer(transformer_type, name, description, **transformer_kwargs):
     @optional_argument_decorator
     @magic_contract
-    def transform(return_source=False, save_source=True, function_globals=None, collapse_iterables=False, explicit_only=False, unroll_targets=None, unroll_in_tiers=None, **kwargs):
+    def transform(return_source=False, save_source=True, function_globals=None, collapse_iterables=False, explicit_only=False, unroll_targets=None, unroll_in_tiers=None, cache=False, lazy=False, live_globals=False, max_statements=None, max_nodes=None, unroll_factor=None, unroll_versions=None, **kwargs):
         """
         :param return_source: Returns the transformed function's source code instead of compiling it
         :type return_source: bool
-        :param save_source: Saves the function source code to a tempfile to make it inspectable
-        :type save_source: bool
+        :param save_source: Saves the function source code to a tempfile to make it inspectable. Pass ``'linecache'`` to
+            keep it in memory instead, registered with :mod:`linecache`, and only generate it when it's first needed
+        :type save_source: bool|str
         :param function_globals: Overridden global name assignments to use when processing the function
         :type function_globals: dict|None
         :param collapse_iterables: Collapse iterable types
@@ -374,40 +673,48 @@ def make_function_transformer(transformer_type, name, description, **transformer
         :type unroll_targets: str|list|None
         :param unroll_in_tiers: Information about unrolling in tiers: (iterable_name, length_of_loop, number_of_inner_iterations)
         :type unroll_in_tiers: tuple|None
+        :param cache: Persist the transformed function on disk, keyed on its source, these arguments, and its context,
+            so that later processes skip the transformation. Either a cache directory or True for the default location
+        :type cache: bool|str
+        :param lazy: Defer the transformation until the function is first called (or :func:`pragma.materialize_all`)
+        :type lazy: bool
+        :param live_globals: Run the transformed function against its module's real globals and its original closure
+            cells, so that it sees later rebinds, rather than against a snapshot of the names it uses
+        :type live_globals: bool
+        :param max_statements: The most statements unrolling any one loop may emit. Loops over ``range(n)`` which would
+            emit more are unrolled in tiers instead, with as many iterations per tier as fit, and other loops are left
+            alone
+        :type max_statements: int|None
+        :param max_nodes: The most AST nodes unrolling any one loop may emit, as for ``max_statements``
+        :type max_nodes: int|None
+        :param unroll_factor: Unroll loops over ``range(...)`` whose bounds aren't known until the function is called
+            this many iterations at a time, followed by a loop over any remaining iterations
+        :type unroll_factor: int|None
+        :param unroll_versions: Common values of names only known when the function is called, such as
+            ``{'N': [3, 4, 8]}``. A version of the function's body is transformed for each value (or combination of
+            values, if several names are given), and the function checks which one to run when it's called, falling
+            back on the body transformed without them
+        :type unroll_versions: dict|None
         :param kwargs: Any other environmental variables to provide during unrolling
         :type kwargs: dict
         :return: The transformed function, or its source code if requested
         :rtype: Callable
         """
 
+        stage = Stage(transformer_type, name, transformer_kwargs, kwargs, function_globals, collapse_iterables,
+                      explicit_only, unroll_targets, unroll_in_tiers, max_statements, max_nodes,
+                      unroll_factor, unroll_versions)
+
         @magic_contract(f='Callable', returns='Callable|str')
         def inner(f):
-            f_mod, f_body, f_file = function_ast(f)
-            if not explicit_only:
-                # Grab function globals
-                glbls = f.__globals__.copy()
-                # Grab function closure variables
-                if isinstance(f.__closure__, tuple):
-                    glbls.update({k: v.cell_contents for k, v in zip(f.__code__.co_freevars, f.__closure__)})
-            else:
-                # Initialize empty context
-                if function_globals is None and len(kwargs) == 0:
-                    log.warning("No global context nor function context. No collapse will occur")
-                glbls = dict()
-            # Apply manual globals override
-            if function_globals is not None:
-                glbls.update(function_globals)
-            # print({k: v for k, v in glbls.items() if k not in globals()})
-            trans = transformer_type(DictStack(glbls, kwargs), **transformer_kwargs)
-            trans.collapse_iterables = collapse_iterables
-            trans.unroll_targets = unroll_targets
-            trans.unroll_in_tiers = unroll_in_tiers
-            f_mod.body[0].decorator_list = []
-            f_mod = trans.visit(f_mod)
-            return save_or_return_source(f_file, f_mod, glbls, return_source, save_source)
-
-        return inner
+            return transform_function(materialize(f), [stage], name, return_source, save_source, cache, live_globals)
+
+        decorator = (lambda f: LazyFunction(f, inner)) if lazy and not return_source else inner
+        # Lets pragma.pipeline fuse this transformation with others
+        decorator.__pragma_stage__ = stage
+        return decorator
 
     transform.__name__ = name
     transform.__doc__ = '\n'.join([description, transform.__doc__])
+    transform.__pragma_decorator__ = True
     return transform
@@ -1,7 +1,7 @@
 import ast
 import logging
 
-from miniutils import magic_contract
+from .core.contracts import magic_contract
 
 from .collapse_literals import collapse_literals
 
@@ -166,8 +166,10 @@ class InlineTransformer(TrackedContextTransformer):
                 warnings.warn("Inline hit recursion limit, using normal function call")
                 return node
 
-            func_for_inlining = _InlineBodyTransformer(fname, fsig.parameters, n)
-            fbody = list(func_for_inlining.visit_many(copy.deepcopy(fbody)))
+            body_transformer_type = traced(_InlineBodyTransformer) if self.tracing else _InlineBodyTransformer
+            func_for_inlining = body_transformer_type(fname, fsig.parameters, n)
+            func_for_inlining.stats = self.stats
+            fbody = list(func_for_inlining.visit_many(self.copy(fbody)))
 
             # print(self.code_blocks)
             cur_block = self.code_blocks[-1]
@@ -280,15 +282,20 @@ class InlineTransformer(TrackedContextTransformer):
 
 
 # @magic_contract
-def inline(*funs_to_inline, max_depth=1, **kwargs):
+def inline(*funs_to_inline, max_depth=1, lazy=False, **kwargs):
     """
     :param funs_to_inline: The inner called function that should be inlined in the wrapped function
     :type funs_to_inline: tuple(function)
     :param max_depth: The maximum number of times to inline the provided function (limits recursion)
     :type max_depth: int
+    :param lazy: Defer inlining, including parsing the inlined functions, until the function is first called
+    :type lazy: bool
     :return: The unrolled function, or its source code if requested
     :rtype: Callable
     """
+    if lazy and not kwargs.get('return_source', False):
+        return lambda f: LazyFunction(f, inline(*funs_to_inline, max_depth=max_depth, **kwargs))
+
     funs = []
     for fun_to_inline in funs_to_inline:
         fname = fun_to_inline.__name__
@@ -5,9 +5,12 @@ import tempfile
 from types import ModuleType
 
 import astor
-from miniutils import magic_contract, optional_argument_decorator
+from miniutils import optional_argument_decorator
 
+from .core.contracts import magic_contract
+from .core.lazy import LazyFunction, materialize
 from .core.resolve import make_ast_from_literal
+from .core.stats import TransformStats, registry
 from .core.transformer import function_ast
 from .utils import save_or_return_source
 
@@ -23,13 +26,14 @@ else:
 @optional_argument_decorator
 class lift:
     @magic_contract
-    def __init__(self, return_source=False, save_source=True, annotate_types=False, defaults=False, lift_globals=None, imports=True):
+    def __init__(self, return_source=False, save_source=True, annotate_types=False, defaults=False, lift_globals=None, imports=True, lazy=False):
         """Converts a closure or method into a pure function which accepts locally defined variables as keyword arguments
 
         :param return_source: Returns the transformed function's source code instead of compiling it
         :type return_source: bool
-        :param save_source: Saves the function source code to a tempfile to make it inspectable
-        :type save_source: bool
+        :param save_source: Saves the function source code to a tempfile to make it inspectable. Pass ``'linecache'`` to
+            keep it in memory instead, registered with :mod:`linecache`, and only generate it when it's first needed
+        :type save_source: bool|str
         :param annotate_types: Flag (or list of var names, or mapping) to use the types of closure variables as the type annotation of the keyword arguments
         :type annotate_types: bool|list|set|tuple|dict
         :param defaults: Default values for free arguments. Must be a dictionary of literals or AST expression, or a bool in which case a best effort is made to convert the closure values into default values
@@ -38,6 +42,8 @@ class lift:
         :type lift_globals: None|list|set|tuple
         :param imports: Flag or list of imports to include within the function body
         :type imports: bool|list|set|tuple
+        :param lazy: Defer lifting until the function is first called (or :func:`pragma.materialize_all`)
+        :type lazy: bool
         """
 
         self.return_source = return_source
@@ -46,6 +52,7 @@ class lift:
         self.defaults = defaults
         self.lift_globals = lift_globals
         self.imports = imports
+        self.lazy = lazy
 
     def _annotate(self, k, v):
         if self.annotate_types:
@@ -86,7 +93,7 @@ class lift:
                 assert isinstance(res, ast.expr)
                 return res
             except (TypeError, AssertionError):
-                log.debug("Failed to convert {} to an AST expression".format(attempt))
+                log.debug("Failed to convert %s to an AST expression", attempt)
                 return None
 
         return None
@@ -132,8 +139,26 @@ class lift:
 
     @magic_contract(f='Callable', returns='Callable|str')
     def __call__(self, f):
-        f_mod, f_body, f_file = function_ast(f)
-
+        if self.lazy and not self.return_source:
+            return LazyFunction(f, self._lift)
+        return self._lift(f)
+
+    def _lift(self, f):
+        f = materialize(f)
+        stats = TransformStats('lift', f.__qualname__)
+        with stats.phase('source'):
+            f_mod, f_body, f_file = function_ast(f)
+
+        with stats.phase('walk'):
+            result = self._lift_ast(f, f_mod, f_body)
+        stats.emitted_nodes = sum(1 for _ in ast.walk(f_mod))
+        result = save_or_return_source(f_file, result, {}, self.return_source, self.save_source, stats)
+        if not isinstance(result, str):
+            result.__pragma_stats__ = stats
+        registry.record(stats)
+        return result
+
+    def _lift_ast(self, f, f_mod, f_body):
         # Grab function closure variables
         free_vars = self._get_free_vars(f)
 
@@ -159,4 +184,4 @@ class lift:
         )
 
         f_mod.body[0] = new_func_def
-        return save_or_return_source(f_file, f_mod, {}, self.return_source, self.save_source)
+        return f_mod
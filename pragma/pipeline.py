@@ -0,0 +1,99 @@
+from .core.lazy import LazyFunction, materialize
+from .core.transformer import FixedPoint, transform_function
+
+
+def _get_stage(decorator):
+    stage = getattr(decorator, '__pragma_stage__', None)
+    if stage is None and getattr(decorator, '__pragma_decorator__', False):
+        # A decorator used without arguments, such as ``pragma.unroll``
+        stage = decorator().__pragma_stage__
+    if stage is None:
+        raise TypeError("{!r} is not a pragma transformation, so it can't be used in a pipeline".format(decorator))
+    return stage
+
+
+def pipeline(*decorators, return_source=False, save_source=True, cache=False, lazy=False, live_globals=False):
+    """
+    Fuses several pragma decorators into one. The function is parsed once, each decorator's transformation is run in
+    turn over the same AST, in the order given, and the result is compiled once at the end. This is equivalent to, but
+    much faster than, stacking the decorators (in reverse order, since stacked decorators apply from the bottom up).
+
+    Only the decorators' transformation arguments are used; arguments about the result, such as ``return_source``, are
+    given to the pipeline instead. :func:`lift` can't be fused, since it isn't a transformation of this kind.
+
+    :param decorators: The decorators to fuse, either used bare (e.g. ``pragma.unroll``) or with arguments (e.g.
+        ``pragma.deindex(fns, 'fns')``)
+    :type decorators: tuple(Callable)
+    :param return_source: Returns the transformed function's source code instead of compiling it
+    :type return_source: bool
+    :param save_source: Saves the function source code to make it inspectable (see :func:`collapse_literals`)
+    :type save_source: bool|str
+    :param cache: Persist the transformed function on disk (see :func:`collapse_literals`)
+    :type cache: bool|str
+    :param lazy: Defer the transformation until the function is first called
+    :type lazy: bool
+    :param live_globals: Run the transformed function against its module's real globals
+    :type live_globals: bool
+    :return: The fused decorator
+    :rtype: Callable
+    """
+    stages = [_get_stage(decorator) for decorator in decorators]
+    name = 'pipeline({})'.format(', '.join(stage.name for stage in stages))
+
+    def inner(f):
+        return transform_function(materialize(f), stages, name, return_source, save_source, cache, live_globals)
+
+    if lazy and not return_source:
+        return lambda f: LazyFunction(f, inner)
+    return inner
+
+
+def optimize(*decorators, max_passes=8, max_nodes=None, max_time=None, return_source=False, save_source=True,
+             cache=False, lazy=False, live_globals=False):
+    """
+    Alternates several pragma transformations until they stop changing the function. Transformations can open up work
+    for each other: collapsing may make a loop's bounds constant so it can be unrolled, and unrolling may make a
+    condition constant so it can be collapsed, so running each of them once isn't always enough.
+
+    Every pass of each transformation is recorded in the function's ``__pragma_stats__.passes``, with whether it
+    changed the function and how many AST nodes the function had after it. ``__pragma_stats__.stop_reason`` is one of
+    ``'converged'``, ``'max_passes'``, ``'max_nodes'`` or ``'max_time'``.
+
+    :param decorators: The decorators to alternate between, as for :func:`pipeline`. Defaults to :func:`unroll` and
+        :func:`collapse_literals`
+    :type decorators: tuple(Callable)
+    :param max_passes: The most rounds of running every transformation to run
+    :type max_passes: int
+    :param max_nodes: The largest the function's AST may grow to. A pass which would grow it beyond this is undone and
+        the optimization stops
+    :type max_nodes: int|None
+    :param max_time: How long, in seconds, to keep starting new passes
+    :type max_time: float|None
+    :param return_source: Returns the transformed function's source code instead of compiling it
+    :type return_source: bool
+    :param save_source: Saves the function source code to make it inspectable (see :func:`collapse_literals`)
+    :type save_source: bool|str
+    :param cache: Persist the transformed function on disk (see :func:`collapse_literals`)
+    :type cache: bool|str
+    :param lazy: Defer the transformation until the function is first called
+    :type lazy: bool
+    :param live_globals: Run the transformed function against its module's real globals
+    :type live_globals: bool
+    :return: The optimizing decorator
+    :rtype: Callable
+    """
+    if not decorators:
+        from .collapse_literals import collapse_literals
+        from .unroll import unroll
+        decorators = (unroll, collapse_literals)
+    if max_passes < 1:
+        raise ValueError("max_passes must be at least 1, not {}".format(max_passes))
+    stage = FixedPoint([_get_stage(decorator) for decorator in decorators], max_passes, max_nodes, max_time)
+
+    def inner(f):
+        return transform_function(materialize(f), [stage], stage.name, return_source, save_source, cache,
+                                  live_globals)
+
+    decorator = (lambda f: LazyFunction(f, inner)) if lazy and not return_source else inner
+    decorator.__pragma_stage__ = stage
+    return decorator
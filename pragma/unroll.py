@@ -1,9 +1,12 @@
 import ast
-import copy
+import builtins
+import itertools
 import logging
 import math
 import warnings
+from . import config
 from .core import TrackedContextTransformer, make_function_transformer, make_ast_from_literal
+from .core.codegen import to_source
 
 log = logging.getLogger(__name__)
 
@@ -23,13 +26,105 @@ def has_break(node):
     return False
 
 
+_loops = (ast.For, ast.AsyncFor, ast.While)
+_scopes = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+def _jumps(node):
+    """Yields the breaks and continues in ``node`` that belong to the loop it's in, not to loops nested in it"""
+    if isinstance(node, (ast.Break, ast.Continue)):
+        yield node
+    elif isinstance(node, _loops):
+        for n in node.orelse:  # A nested loop's else clause is still part of this loop
+            yield from _jumps(n)
+    elif not isinstance(node, _scopes):
+        for child in ast.iter_child_nodes(node):
+            yield from _jumps(child)
+
+
+def _assigned(node):
+    """Yields the names that ``node`` assigns in the scope it's in"""
+    if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+        yield node.id
+    elif isinstance(node, _scopes):
+        if not isinstance(node, ast.Lambda):
+            yield node.name
+    else:
+        for child in ast.iter_child_nodes(node):
+            yield from _assigned(child)
+
+
+def _lowerable(stmts):
+    """Whether every break and continue in a loop's body is either in the body itself or in ``if`` statements"""
+    for stmt in stmts:
+        if isinstance(stmt, ast.If):
+            if not (_lowerable(stmt.body) and _lowerable(stmt.orelse)):
+                return False
+        elif not isinstance(stmt, (ast.Break, ast.Continue)) and any(True for _ in _jumps(stmt)):
+            return False
+    return True
+
+
+def _flag_breaks(stmts, flag):
+    """Sets ``flag`` before each of the breaks in ``stmts``, which are either in it or in ``if`` statements"""
+    result = []
+    for stmt in stmts:
+        if isinstance(stmt, ast.Break):
+            result.append(ast.Assign(targets=[ast.Name(id=flag, ctx=ast.Store())], value=ast.NameConstant(value=True)))
+        elif isinstance(stmt, ast.If):
+            stmt.body = _flag_breaks(stmt.body, flag)
+            stmt.orelse = _flag_breaks(stmt.orelse, flag)
+        result.append(stmt)
+    return result
+
+
+def _run_once(body, orelse):
+    """A loop that runs ``body`` once, so that a break or continue in it only leaves ``body``"""
+    loop = ast.For(target=ast.Name(id='____', ctx=ast.Store()),
+                   iter=ast.List(elts=[ast.NameConstant(value=None)], ctx=ast.Load()), body=body, orelse=orelse)
+    # Unrolling it wouldn't remove the jumps it's there for, only wrap them again
+    loop._pragma_lowered = True
+    return loop
+
+
+_comprehensions = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _captures(node, names):
+    """Whether a function or comprehension in ``node`` reads any of ``names`` when it runs, rather than straight away"""
+    for n in ast.walk(node):
+        if isinstance(n, (ast.Lambda,) + _comprehensions) and any(
+                isinstance(m, ast.Name) and isinstance(m.ctx, ast.Load) and m.id in names for m in ast.walk(n)):
+            return True
+    return False
+
+
+#: Containers which can be changed in place, e.g. with ``append``, without the context seeing it
+_mutable_types = (list, dict, set, bytearray, ast.List, ast.Dict, ast.Set)
+
+
+#: Builtins which consume every item of an iterable, so a generator expression given to them can be expanded first
+_consumers = {'sum', 'min', 'max', 'sorted', 'list', 'tuple', 'set', 'frozenset'}
+
+
 # noinspection PyPep8Naming
 class UnrollTransformer(TrackedContextTransformer):
     def __init__(self, *args, **kwargs):
         self.unroll_targets = None
         self.unroll_in_tiers = None
+        self.max_statements = None
+        self.max_nodes = None
+        self.unroll_factor = None
+        self.unroll_versions = None
         super().__init__(*args, **kwargs)
-        self.loop_vars = []
+        # Every name assigned by an unrolled loop. Python keeps loop variables after their loop ends, so names are
+        # never removed; this holds one entry per name, not per iteration
+        self.loop_vars = set()
+        # How many tiered loops enclose the one being unrolled, so that nested tiers use different outer variables
+        self._tier_depth = 0
+        # How many unrolled loops enclose the one being unrolled, so that nested loops use different break flags
+        self._loop_depth = 0
+        self._versioned = False
 
     def _names(self, node):
         if isinstance(node, ast.Name):
@@ -39,9 +134,26 @@ class UnrollTransformer(TrackedContextTransformer):
                 yield from self._names(elt)
         else:
             warnings.warn(
-                "Not sure how to handle {} in a for loop target list yet".format(astor.to_source(node).strip()))
+                "Not sure how to handle {} in a for loop target list yet".format(to_source(node).strip()))
+
+    def _leave_alone(self, node):
+        """Visits a loop that isn't being unrolled. Its variables change as it runs, so their values are unknown"""
+        self.loop_vars.difference_update(self.assign(node.target, None) or ())
+        return self.generic_visit(node)
+
+    def _forget_carried(self, stmts):
+        """
+        Marks the names assigned in a loop's body as unknown, before visiting a body that runs more than once at
+        runtime. Each run starts from the values the last one left, so what they were before the loop no longer holds
+        """
+        for stmt in stmts:
+            for name in _assigned(stmt):
+                self.loop_vars.discard(name)
+                self.assign(ast.Name(id=name, ctx=ast.Store()), None)
 
     def visit_For(self, node):
+        if getattr(node, '_pragma_lowered', False):
+            return super().visit_For(node)
         if self.unroll_in_tiers is not None:
             try:
                 var, N, n_inner = self.unroll_in_tiers
@@ -50,18 +162,24 @@ class UnrollTransformer(TrackedContextTransformer):
             if n_inner is None:
                 n_inner = 1
             if isinstance(node.iter, ast.Name) and node.iter.id == var:
-                return self._visit_ForTiered(node)
+                return self._visit_ForTiered(node, N, n_inner)
             else:
-                return self.generic_visit(node)
+                return self._leave_alone(node)
         else:
             if self.unroll_targets is not None and node.target.id not in self.unroll_targets:
-                return self.generic_visit(node)
+                return self._leave_alone(node)
         return self._visit_ForFlat(node)
 
     def _visit_ForFlat(self, node, offset=None):
         iterable = self.resolve_iterable(node.iter)
+        if iterable is not None and any(isinstance(n, ast.Name) and self._changed_in_place(n.id)
+                                        for n in ast.walk(node.iter)):
+            log.debug("Not unrolling loop, its iterable might have been changed in place")
+            iterable = None
         if iterable is None:
-            return self.generic_visit(node)
+            if offset is None and self.unroll_factor is not None:
+                return self._visit_ForFactor(node, self.unroll_factor)
+            return self._leave_alone(node)
 
         if offset is not None:
             if isinstance(offset, int):
@@ -71,58 +189,272 @@ class UnrollTransformer(TrackedContextTransformer):
             elif not isinstance(offset, ast.AST):
                 raise TypeError('offset must be an integer, string, or AST type')
 
-        top_level_break = False
-        for n in node.body:
-            if isinstance(n, ast.Break):
-                top_level_break = True
-            # We don't need to check if there's a break in an inner loop, since that doesn't affect this loop
-            elif isinstance(n, ast.If) and has_break(n):
-                # If there's a conditional break, there's not much we can do about that
-                # TODO: If the conditional is resolvable at unroll time, then do so
-                return self.generic_visit(node)
+        if not _lowerable(node.body):
+            log.debug("Not unrolling loop, it has a break or continue that isn't under an if")
+            return self._leave_alone(node)
+        if offset is not None and any(isinstance(n, ast.If) and has_break(n) for n in node.body):
+            # Breaking out of one tier wouldn't break out of the others
+            return self._leave_alone(node)
+
+        if offset is None and (self.max_statements is not None or self.max_nodes is not None):
+            n_inner = self._budget_factor(node, iterable)
+            if n_inner == 0:
+                log.debug("Not unrolling loop over %d items, it's too large for the budget", len(iterable))
+                return self._leave_alone(node)
+            elif n_inner < len(iterable):
+                log.debug("Unrolling loop over %d items in tiers of %d", len(iterable), n_inner)
+                return self._visit_ForTiered(node, len(iterable), n_inner)
 
+        # Each iteration's statements, its loop variable's value, and which breaks and continues stayed dynamic
+        iterations = []
+        broke = False
+        was_conditional_exec = self.conditional_execution
+        self._loop_depth += 1
+        try:
+            for val in iterable:
+                try:
+                    val = make_ast_from_literal(val)
+                except TypeError:
+                    log.debug("Failed to unroll loop, %s failed to convert to AST", val)
+                    return self._leave_alone(node)
+
+                if offset is not None:
+                    val = ast.BinOp(left=offset, op=ast.Add(), right=val)
+
+                # Each copy of the body is emitted, so its loop variable is known even inside a conditional block
+                iteration_conditional, self.conditional_execution = self.conditional_execution, False
+                self.loop_vars.update(self.assign(node.target, val))
+                self.conditional_execution = iteration_conditional
+
+                jumps = set()
+                body, state = self._unroll_block(self.copy(node.body), jumps)
+                iterations.append((body, val, jumps))
+                if state == 'break':
+                    broke = True
+                    break
+                if 'break' in jumps:
+                    # The rest of the loop only runs if this iteration didn't break
+                    self.conditional_execution = True
+        finally:
+            self._loop_depth -= 1
+            self.conditional_execution = was_conditional_exec
+
+        if not broke:
+            orelse = self.nested_visit(node.orelse, set_conditional_exec=False)
+        else:
+            orelse = []
+        if not any(jumps for _, _, jumps in iterations):
+            return [stmt for body, _, _ in iterations for stmt in body] + orelse
+        return self._lower_jumps(node, iterations, orelse)
+
+    def visit_While(self, node):
+        """
+        Unrolls a ``while`` loop by running it: its condition is resolved before each iteration, and each iteration's
+        assignments update the context, until the condition is false or the loop certainly breaks. The loop is left
+        alone if its condition can't be resolved, if it breaks or continues depending on runtime conditions, or if it
+        runs for more than :data:`pragma.config.max_while_iterations`
+        """
+        if self.unroll_targets is not None or self.unroll_in_tiers is not None or not _lowerable(node.body):
+            return super().visit_While(node)
+
+        token, loop_vars = self.ctxt.snapshot(), set(self.loop_vars)
+        result = None
+        try:
+            result = self._unroll_while(node)
+        finally:
+            if result is None:
+                self.ctxt.restore(token)
+                self.loop_vars = loop_vars
+            else:
+                self.ctxt.release(token)
+        return super().visit_While(node) if result is None else result
+
+    def _unroll_while(self, node):
         result = []
-        # loop_var = node.target.id
-        # orig_loop_vars = self.loop_vars
-        # print("Unrolling 'for {} in {}'".format(loop_var, list(iterable)))
-        for val in iterable:
-            # self.ctxt.push({loop_var: val})
-            # self.loop_vars = orig_loop_vars | {loop_var}
-            # self.ctxt.push()
-            # self.visit(ast.Assign(targets=(node.target,), value=make_ast_from_literal(val)))
-            try:
-                val = make_ast_from_literal(val)
-            except TypeError:
-                log.debug("Failed to unroll loop, %s failed to convert to AST", val)
-                return self.generic_visit(node)
-
-            if offset is not None:
-                val = ast.BinOp(left=offset, op=ast.Add(), right=val)
-
-            self.loop_vars.append(set(self.assign(node.target, val)))
-            for body_node in copy.deepcopy(node.body):
-                res = self.visit(body_node)
-                if isinstance(res, list):
-                    result.extend(res)
-                elif res is None:
-                    continue
-                else:
-                    result.append(res)
-            # result.extend([self.visit(body_node) for body_node in copy.deepcopy(node.body)])
-            # self.ctxt.pop()
-            if top_level_break:
-                first_result = result
-                result = []
-                for n in first_result:
-                    if isinstance(n, ast.Break):
-                        break
-                    result.append(n)
+        for _ in range(config.max_while_iterations + 1):
+            cond = self.resolve_literal(self.visit(self.copy(node.test)), raw=True)
+            if isinstance(cond, ast.AST):
+                log.debug("Not unrolling while loop, its condition can't be resolved")
+                return None
+            if not cond:
+                result += self.nested_visit(node.orelse, set_conditional_exec=False)
                 break
-        # self.loop_vars = orig_loop_vars
+            jumps = set()
+            body, state = self._unroll_block(self.copy(node.body), jumps)
+            if jumps:
+                log.debug("Not unrolling while loop, it breaks or continues depending on runtime conditions")
+                return None
+            result += body
+            if state == 'break':
+                break
+        else:
+            log.debug("Not unrolling while loop, it runs for more than %d iterations", config.max_while_iterations)
+            return None
+
+        if self.max_statements is not None or self.max_nodes is not None:
+            statements, total = self._size(result)
+            if ((self.max_statements is not None and statements > self.max_statements)
+                    or (self.max_nodes is not None and total > self.max_nodes)):
+                log.debug("Not unrolling while loop, it's too large for the budget")
+                return None
         return result
 
-    def _visit_ForTiered(self, node):
-        var, N, n_inner = self.unroll_in_tiers
+    def _unroll_block(self, stmts, jumps, conditional=False):
+        """
+        Visits one iteration's statements, resolving the conditions of ``if`` statements that break or continue where
+        possible, so that statements which can't be reached are dropped
+        :param stmts: The statements to visit
+        :type stmts: list(AST)
+        :param jumps: Where to record ``'break'`` or ``'continue'`` when one of them stays in the code, since it
+            depends on a condition that's only known at runtime
+        :type jumps: set
+        :param conditional: Whether these statements are in an ``if`` whose condition wasn't resolved
+        :type conditional: bool
+        :return: The statements to emit, and ``'break'`` if the loop certainly breaks here, ``'end'`` if the rest of
+            the iteration is certainly skipped, or else None
+        :rtype: tuple
+        """
+        result = []
+        for stmt in stmts:
+            if isinstance(stmt, (ast.Break, ast.Continue)):
+                kind = 'break' if isinstance(stmt, ast.Break) else 'continue'
+                if not conditional:
+                    if kind == 'continue':
+                        return result, 'end'
+                    elif 'continue' not in jumps:
+                        return result, 'break'
+                # Only reached at runtime under some condition, so the jump has to stay
+                jumps.add(kind)
+                result.append(stmt)
+                return result, 'end'
+
+            if isinstance(stmt, ast.If) and any(True for _ in _jumps(stmt)):
+                test = self.visit(stmt.test)
+                cond = self.resolve_literal(test, raw=True)
+                if not isinstance(cond, ast.AST):
+                    body, state = self._unroll_block(stmt.body if cond else stmt.orelse, jumps, conditional)
+                    result.extend(body)
+                    if state is not None:
+                        return result, state
+                    continue
+
+                was_conditional_exec, self.conditional_execution = self.conditional_execution, True
+                stmt.test = test
+                stmt.body = self._unroll_block(stmt.body, jumps, True)[0] or [ast.Pass()]
+                stmt.orelse = self._unroll_block(stmt.orelse, jumps, True)[0]
+                # Whatever follows only runs if the jump wasn't taken
+                self.conditional_execution = was_conditional_exec or bool(jumps)
+                result.append(stmt)
+                continue
+
+            res = self.visit(stmt)
+            if isinstance(res, list):
+                result.extend(res)
+            elif res is not None:
+                result.append(res)
+        return result, None
+
+    def _lower_jumps(self, node, iterations, orelse):
+        """
+        Emits an unrolled loop whose breaks or continues depend on runtime conditions, by wrapping it in loops that run
+        once. ``break`` leaves a loop around all the iterations, and ``continue`` ends a loop around its iteration; if
+        both are needed, a break out of an iteration sets a flag to then break out of the rest::
+
+            for ____ in [None]:
+                x += a[0]
+                if x > 10:
+                    break
+                x += a[1]
+                if x > 10:
+                    break
+            else:
+                print('Never over 10')
+        """
+        suffix = '' if self._loop_depth == 0 else str(self._loop_depth)
+        flag = 'PRAGMA_broke' + suffix
+        loop_var = node.target.id if isinstance(node.target, ast.Name) else None
+        if loop_var is not None and any('break' in jumps for _, _, jumps in iterations):
+            # The loop variable's value after the loop depends on which iteration it broke on
+            self.loop_vars.discard(loop_var)
+            self.assign(node.target, None)
+            assign_var = self._used_elsewhere(node, loop_var)
+        else:
+            assign_var = False
+
+        result = []
+        flagged = False
+        for body, val, jumps in iterations:
+            if assign_var:
+                body = [ast.Assign(targets=[ast.Name(id=loop_var, ctx=ast.Store())], value=val)] + body
+            if 'continue' not in jumps:
+                result.extend(body)
+                continue
+            if 'break' in jumps:
+                flagged = True
+                body = _flag_breaks(body, flag)
+            result.append(_run_once(body, []))
+            if 'break' in jumps:
+                result.append(ast.If(test=ast.Name(id=flag, ctx=ast.Load()), body=[ast.Break()], orelse=[]))
+
+        if not any('break' in jumps for _, _, jumps in iterations):
+            return result + orelse
+        prefix = [ast.Assign(targets=[ast.Name(id=flag, ctx=ast.Store())], value=ast.NameConstant(value=False))]
+        return (prefix if flagged else []) + [_run_once(result or [ast.Pass()], orelse)]
+
+    def _size(self, nodes):
+        """
+        Estimates how many statements and nodes unrolling ``nodes`` once emits, counting inner loops which can be
+        unrolled once per iteration
+        """
+        statements = total = 0
+        for node in nodes:
+            if isinstance(node, ast.For):
+                iterable = self.resolve_iterable(node.iter)
+                if iterable is not None:
+                    inner_statements, inner_total = self._size(node.body)
+                    statements += len(iterable) * inner_statements
+                    total += len(iterable) * inner_total
+                    continue
+            for n in ast.walk(node):
+                total += 1
+                statements += isinstance(n, ast.stmt)
+        return statements, total
+
+    def _budget_factor(self, node, iterable):
+        """
+        :return: How many iterations of the loop to unroll at a time within ``max_statements`` and ``max_nodes``: all of
+            them, fewer to unroll in tiers, or 0 to leave the loop alone
+        :rtype: int
+        """
+        statements, total = self._size(node.body)
+
+        def fits(n):
+            return ((self.max_statements is None or n * statements <= self.max_statements)
+                    and (self.max_nodes is None or n * total <= self.max_nodes))
+
+        N = len(iterable)
+        if fits(N):
+            return N
+        # Tiers index the loop by position, so only loops over range(N) can be unrolled in tiers, and a break would
+        # only leave its tier
+        if not isinstance(node.target, ast.Name) or any(type(v) is not int for v in iterable) \
+                or iterable != list(range(N)) or has_break(node):
+            return 0
+        # The tiers run in a loop, so the body can't rely on values it assigns itself
+        self._forget_carried(node.body)
+        statements, total = self._size(node.body)
+        # Unrolling in tiers of n emits n iterations in the outer loop, and N % n for the remainder
+        largest = N // 2
+        if self.max_statements is not None:
+            largest = min(largest, self.max_statements // max(statements, 1))
+        if self.max_nodes is not None:
+            largest = min(largest, self.max_nodes // max(total, 1))
+        for n in range(largest, 1, -1):
+            if fits(n + N % n):
+                return n
+        return 0
+
+    def _visit_ForTiered(self, node, N, n_inner):
         n_outer = math.floor(N / n_inner)
         outer_iterable = range(0, n_inner * n_outer, n_inner)
         inner_iterable = list(range(n_inner))
@@ -132,9 +464,15 @@ class UnrollTransformer(TrackedContextTransformer):
             node.iter = make_ast_from_literal(list(range(N)))
             return self._visit_ForFlat(node)
 
+        self._forget_carried(node.body)
+        outer_var = 'PRAGMA_iouter' if self._tier_depth == 0 else 'PRAGMA_iouter{}'.format(self._tier_depth)
         inner_node = ast.For(iter=make_ast_from_literal(inner_iterable),
                              target=node.target, body=node.body, orelse=[])
-        inner_node = self._visit_ForFlat(inner_node, offset='PRAGMA_iouter')
+        self._tier_depth += 1
+        try:
+            inner_node = self._visit_ForFlat(inner_node, offset=outer_var)
+        finally:
+            self._tier_depth -= 1
 
         remainder_node = ast.For(iter=make_ast_from_literal(remainder_iterable),
                                  target=node.target, body=node.body, orelse=[])
@@ -145,7 +483,7 @@ class UnrollTransformer(TrackedContextTransformer):
         ast_range_call = ast.Call(func=ast_range_fun, args=ast_range_args, keywords=[])
 
         outer_node = ast.For(iter=ast_range_call,
-                             target=ast.Name(id='PRAGMA_iouter', ctx=ast.Store()), body=inner_node, orelse=[])
+                             target=ast.Name(id=outer_var, ctx=ast.Store()), body=inner_node, orelse=[])
 
         if isinstance(remainder_node, list):
             return [outer_node] + remainder_node
@@ -154,8 +492,297 @@ class UnrollTransformer(TrackedContextTransformer):
         else:
             return [outer_node, remainder_node]
 
+    def visit_FunctionDef(self, node):
+        if self.unroll_versions and not self.in_main_func and not self._versioned:
+            # Only the decorated function itself, not functions defined in it, and only once if unroll is run again
+            self._versioned = True
+            if not getattr(node, '_pragma_versioned', False):
+                node._pragma_versioned = True
+                return self._visit_FunctionDef_versioned(node)
+        return super().visit_FunctionDef(node)
+
+    def _visit_FunctionDef_versioned(self, node):
+        """
+        Transforms the function's body once for each combination of ``unroll_versions``, and dispatches between them
+        when the function is called::
+
+            def f(x, N):
+                if N == 2:
+                    x += 0
+                    x += 1
+                else:
+                    for i in range(N):
+                        x += i
+        """
+        try:
+            names = list(self.unroll_versions)
+            combinations = list(itertools.product(*(self.unroll_versions[name] for name in names)))
+        except (AttributeError, TypeError) as err:
+            raise ValueError("Invalid specification of unroll_versions: should be a dict of names to lists of values"
+                             ) from err
+
+        docstring = ast.get_docstring(node, clean=False) is not None
+        header, body = node.body[:docstring], node.body[docstring:]
+        branches = []
+        for values in combinations:
+            tests = [ast.Compare(left=ast.Name(id=name, ctx=ast.Load()), ops=[ast.Eq()],
+                                 comparators=[make_ast_from_literal(value)])
+                     for name, value in zip(names, values)]
+            token, loop_vars = self.ctxt.snapshot(), set(self.loop_vars)
+            self.ctxt.push(dict(zip(names, values)))
+            try:
+                version = self.nested_visit(self.copy(body), set_conditional_exec=False)
+            finally:
+                self.ctxt.restore(token)
+                self.loop_vars = loop_vars
+            test = tests[0] if len(tests) == 1 else ast.BoolOp(op=ast.And(), values=tests)
+            branches.append((test, version or [ast.Pass()]))
+
+        self.ctxt.push({})
+        dispatch = self.nested_visit(body, set_conditional_exec=False)
+        self.ctxt.pop()
+        for test, version in reversed(branches):
+            dispatch = [ast.If(test=test, body=version, orelse=dispatch)]
+        node.body = header + dispatch
+        return self.generic_visit_less(node, 'body')
+
+    def visit_Module(self, node):
+        self._module = node
+        # The names used where they might be changed in place, found the first time they're needed
+        self._escaping = None
+        return super().visit_Module(node)
+
+    def _used_elsewhere(self, loop, name):
+        """Whether ``name`` is read anywhere in the function besides in ``loop`` and in other loops which assign it"""
+        def used(node):
+            if node is loop:
+                return False
+            if isinstance(node, ast.Name):
+                return node.id == name and isinstance(node.ctx, ast.Load)
+            if isinstance(node, ast.For) and isinstance(node.target, ast.Name) and node.target.id == name:
+                return used(node.iter) or any(used(n) for n in node.orelse)
+            return any(used(child) for child in ast.iter_child_nodes(node))
+
+        return used(self._module)
+
+    def _visit_ForFactor(self, node, factor):
+        """
+        Unrolls ``for i in range(...)``, whose bounds aren't known until the function runs, ``factor`` iterations at a
+        time. The body is repeated ``factor`` times in a loop over every ``factor``-th value, followed by a loop over
+        whatever's left::
+
+            PRAGMA_range = range(n)
+            for PRAGMA_iouter in PRAGMA_range[:len(PRAGMA_range) // 2 * 2:2]:
+                x += PRAGMA_iouter
+                x += PRAGMA_iouter + 1
+            for i in PRAGMA_range[len(PRAGMA_range) // 2 * 2:]:
+                x += i
+        """
+        if not (isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and node.iter.func.id == 'range'
+                and 1 <= len(node.iter.args) <= 3 and not node.iter.keywords and isinstance(node.target, ast.Name)):
+            return self._leave_alone(node)
+        try:
+            is_range = self.ctxt['range'] is range
+        except KeyError:
+            is_range = False
+        step = self.resolve_literal(node.iter.args[2], raw=True) if len(node.iter.args) == 3 else 1
+        # Copies after a break would run out of order, and the loop variable is only left with its last value if
+        # there's a remainder
+        if (not is_range or type(step) is not int or step == 0 or factor < 2 or node.orelse or has_break(node)
+                or self._used_elsewhere(node, node.target.id)):
+            log.debug("Not unrolling loop over %s by a factor of %d", to_source(node.iter).strip(), factor)
+            return self._leave_alone(node)
+
+        suffix = '' if self._tier_depth == 0 else str(self._tier_depth)
+        range_var, outer_var = 'PRAGMA_range' + suffix, 'PRAGMA_iouter' + suffix
+        node.iter = self.visit(node.iter)
+        self._forget_carried(node.body)
+        range_assign = ast.Assign(targets=[ast.Name(id=range_var, ctx=ast.Store())], value=node.iter)
+        # len(PRAGMA_range) // factor * factor
+        split = ast.BinOp(
+            left=ast.BinOp(left=ast.Call(func=ast.Name(id='len', ctx=ast.Load()),
+                                         args=[ast.Name(id=range_var, ctx=ast.Load())], keywords=[]),
+                           op=ast.FloorDiv(), right=ast.Num(n=factor)),
+            op=ast.Mult(), right=ast.Num(n=factor))
+
+        inner_node = ast.For(iter=make_ast_from_literal(list(range(0, factor * step, step))),
+                             target=node.target, body=node.body, orelse=[])
+        self._tier_depth += 1
+        try:
+            inner_body = self._visit_ForFlat(inner_node, offset=outer_var)
+            # The loop variable's value is only known at runtime from here on
+            self.loop_vars.discard(node.target.id)
+            self.assign(node.target, None)
+            remainder_body = self.nested_visit(node.body)
+        finally:
+            self._tier_depth -= 1
+        outer_node = ast.For(
+            iter=ast.Subscript(value=ast.Name(id=range_var, ctx=ast.Load()),
+                               slice=ast.Slice(lower=None, upper=split, step=ast.Num(n=factor)), ctx=ast.Load()),
+            target=ast.Name(id=outer_var, ctx=ast.Store()), body=inner_body, orelse=[])
+
+        node.iter = ast.Subscript(value=ast.Name(id=range_var, ctx=ast.Load()),
+                                  slice=ast.Slice(lower=self.copy(split), upper=None, step=None), ctx=ast.Load())
+        node.body = remainder_body
+        return [range_assign, outer_node, node]
+
+    def _expand(self, node, fields):
+        """
+        Works out every item a comprehension produces, if its iterables and conditions can all be resolved
+        :param node: The comprehension
+        :type node: ListComp|SetComp|DictComp|GeneratorExp
+        :param fields: The fields of ``node`` that make up each item, e.g. ``['key', 'value']`` for a dict
+        :type fields: list(str)
+        :return: Each item's values for ``fields``, or None if the comprehension can't be expanded
+        :rtype: list(list(AST))|None
+        """
+        if self.unroll_targets is not None or self.unroll_in_tiers is not None \
+                or any(gen.is_async for gen in node.generators):
+            return None
+        # A lambda or nested comprehension reads the variables when it's called, by which time they have their last
+        # values, so substituting each item's value would change what it does
+        names = {name for gen in node.generators for name in _assigned(gen.target)}
+        if any(_captures(getattr(node, field), names) for field in fields) \
+                or any(_captures(cond, names) for gen in node.generators for cond in gen.ifs):
+            return None
+        if any(isinstance(n, ast.Name) and self._changed_in_place(n.id)
+               for gen in node.generators for n in ast.walk(gen.iter)):
+            log.debug("Not expanding comprehension, its iterable might have been changed in place")
+            return None
+
+        # The comprehension's variables are local to it, so they're all forgotten afterwards
+        token, loop_vars = self.ctxt.snapshot(), set(self.loop_vars)
+        was_conditional_exec, self.conditional_execution = self.conditional_execution, False
+        self.ctxt.push({})
+        items = []
+        try:
+            expanded = self._expand_generators(node, node.generators, fields, items)
+        finally:
+            self.conditional_execution = was_conditional_exec
+            self.ctxt.restore(token)
+            self.loop_vars = loop_vars
+        if not expanded:
+            return None
+        if any(isinstance(n, ast.Call) and isinstance(n.func, ast.Lambda)
+               for item in items for value in item for n in ast.walk(value)):
+            # A lambda called in place, e.g. from [g() for g in fs], is emitted as 'lambda: 0()', which calls 0
+            log.debug("Not expanding comprehension, it calls lambdas from its iterable")
+            return None
+        if self.max_nodes is not None and sum(self._size(item)[1] for item in items) > self.max_nodes:
+            log.debug("Not expanding comprehension, it's too large for the budget")
+            return None
+        return items
+
+    def _expand_generators(self, node, generators, fields, items):
+        if not generators:
+            if len(items) >= config.max_comprehension_items:
+                log.debug("Not expanding comprehension, it has more than %d items", config.max_comprehension_items)
+                return False
+            items.append([self.visit(self.copy(getattr(node, field))) for field in fields])
+            return True
+
+        gen = generators[0]
+        iterable = self.resolve_iterable(gen.iter)
+        if iterable is None:
+            return False
+        for val in iterable:
+            try:
+                val = make_ast_from_literal(val)
+            except TypeError:
+                log.debug("Failed to expand comprehension, %s failed to convert to AST", val)
+                return False
+            self.loop_vars.update(self.assign(gen.target, val))
+            for cond in gen.ifs:
+                test = self.resolve_literal(self.visit(self.copy(cond)), raw=True)
+                if isinstance(test, ast.AST):
+                    return False
+                if not test:
+                    break
+            else:
+                if not self._expand_generators(node, generators[1:], fields, items):
+                    return False
+        return True
+
+    def _changed_in_place(self, name):
+        """
+        Whether ``name`` holds a mutable container which the function might change in a way the context doesn't follow:
+        anything but reading or assigning its items, looping over it, or binding the name again (e.g. by calling
+        ``out.append(x)``, or by passing it to a function or giving it another name)
+        """
+        try:
+            value = self.ctxt[name]
+        except KeyError:
+            return False
+        if not isinstance(value, _mutable_types):
+            return False
+        if self._escaping is None:
+            safe = set()
+            for node in ast.walk(self._module):
+                if isinstance(node, ast.Subscript) and not isinstance(node.ctx, ast.Del):
+                    safe.add(id(node.value))
+                elif isinstance(node, (ast.For, ast.comprehension)):
+                    # Iterables can only be resolved through functions that don't change their arguments
+                    safe.update(id(n) for n in ast.walk(node.iter))
+            self._escaping = {node.id for node in ast.walk(self._module) if isinstance(node, ast.Name)
+                              and not isinstance(node.ctx, ast.Store) and id(node) not in safe}
+        return name in self._escaping
+
+    def _is_builtin(self, name):
+        try:
+            return self.ctxt[name] is getattr(builtins, name, None)
+        except KeyError:
+            return False
+
+    def visit_ListComp(self, node):
+        items = self._expand(node, ['elt'])
+        if items is None:
+            return self.generic_visit(node)
+        return ast.copy_location(ast.List(elts=[elt for elt, in items], ctx=ast.Load()), node)
+
+    def visit_SetComp(self, node):
+        items = self._expand(node, ['elt'])
+        if not items:  # There's no literal for an empty set
+            return self.generic_visit(node)
+        return ast.copy_location(ast.Set(elts=[elt for elt, in items]), node)
+
+    def visit_DictComp(self, node):
+        items = self._expand(node, ['key', 'value'])
+        if items is None:
+            return self.generic_visit(node)
+        return ast.copy_location(ast.Dict(keys=[key for key, _ in items], values=[value for _, value in items]), node)
+
+    def visit_Call(self, node):
+        """
+        Expands generator expressions passed to builtins that consume all of them, such as ``sum(...)``, into tuples,
+        and those passed to ``any`` or ``all`` into ``or`` or ``and`` expressions, which stop at the same item
+        """
+        if not (isinstance(node.func, ast.Name) and node.args and isinstance(node.args[0], ast.GeneratorExp)
+                and not any(isinstance(arg, ast.Starred) for arg in node.args)):
+            return self.generic_visit(node)
+        name = node.func.id
+        short_circuits = name in ('any', 'all') and len(node.args) == 1 and not node.keywords
+        if not (short_circuits or name in _consumers) or not self._is_builtin(name):
+            return self.generic_visit(node)
+        if short_circuits and not self._is_builtin('bool'):
+            return self.generic_visit(node)
+        items = self._expand(node.args[0], ['elt'])
+        if items is None:
+            return self.generic_visit(node)
+
+        elts = [elt for elt, in items]
+        if short_circuits:
+            if not elts:
+                return ast.copy_location(ast.NameConstant(value=name == 'all'), node)
+            value = elts[0] if len(elts) == 1 else ast.BoolOp(op=ast.Or() if name == 'any' else ast.And(), values=elts)
+            return ast.copy_location(ast.Call(func=ast.Name(id='bool', ctx=ast.Load()), args=[value], keywords=[]),
+                                     node)
+        node.args = [ast.Tuple(elts=elts, ctx=ast.Load())] + [self.visit(arg) for arg in node.args[1:]]
+        for keyword in node.keywords:
+            keyword.value = self.visit(keyword.value)
+        return node
+
     def visit_Name(self, node):
-        if isinstance(node.ctx, ast.Load) and self.loop_vars and node.id in set.union(*self.loop_vars):
+        if isinstance(node.ctx, ast.Load) and node.id in self.loop_vars:
             if node.id in self.ctxt:
                 return self.ctxt[node.id]
             raise NameError("'{}' not defined in context".format(node.id))
@@ -164,7 +791,7 @@ class UnrollTransformer(TrackedContextTransformer):
     def visit_Subscript(self, node):
         # resolve only if node is an ast.Name in our loop_vars
         if (isinstance(node.value, ast.Name) and isinstance(node.value.ctx, ast.Load)
-                and self.loop_vars and node.value.id in set.union(*self.loop_vars)):
+                and node.value.id in self.loop_vars):
             return self.resolve_literal(self.generic_visit(node))
         return self.generic_visit(node)
 
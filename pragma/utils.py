@@ -1,34 +1,229 @@
 import ast
+import copy
+import itertools
+import linecache
+import re
 import tempfile
+import types
+from collections import OrderedDict
 
-import astor
+from . import config
+from .core.cache import function_namespace, live_closure
+from .core.codegen import to_source, write_source, is_large
+from .core.stats import TransformStats
 
 
-def save_or_return_source(f_file, f_mod, glbls, return_source, save_source):
-    if return_source or save_source:
-        try:
-            source = astor.to_source(f_mod)
-        except Exception as ex:  # pragma: nocover
-            raise RuntimeError(astor.dump_tree(f_mod)) from ex
+#: The function which live transformed functions are defined inside of, see :func:`live_module`
+FACTORY_NAME = '__pragma_factory__'
+
+
+#: Filenames given to functions whose source is kept in linecache, see :func:`register_source`
+LINECACHE_PREFIX = 'pragma://'
+_linecache_ids = itertools.count()
+#: The functions registered with linecache whose source hasn't been generated yet, oldest first
+_pending = OrderedDict()
+#: The linecache entry of every function registered with it, to restore if the cache is cleared, see :func:`_checkcache`
+_registered = {}
+#: The checkcache which :func:`_checkcache` replaced, once any source has been registered
+_linecache_checkcache = None
+
+
+def live_module(f_mod, f, overlay):
+    """
+    Nests a transformed function's definition inside a factory function, whose parameters are the names the function
+    refers to from ``overlay`` or from ``f``'s closure. Once run by :func:`exec_function`, the transformed function
+    sees these as closure variables, and everything else in ``f``'s real module globals.
+    :param f_mod: A module containing only the transformed function's definition
+    :type f_mod: Module
+    :param f: The original function
+    :type f: Callable
+    :param overlay: Names and values which the transformed function should see in place of its globals
+    :type overlay: Mapping
+    :return: The wrapped module
+    :rtype: Module
+    """
+    func_def = f_mod.body[0]
+    used = {node.id for node in ast.walk(func_def) if isinstance(node, ast.Name)}
+    params = sorted(used & (set(overlay) | set(f.__code__.co_freevars)))
+    factory = ast.parse('def {}({}):\n    return {}'.format(FACTORY_NAME, ', '.join(params), func_def.name)).body[0]
+    factory.body.insert(0, func_def)
+    f_mod = copy.copy(f_mod)
+    f_mod.body = [factory]
+    return f_mod
+
+
+def align_live_module(f_mod, source):
+    """
+    Points the line numbers of the function in a :func:`live_module` at where its definition appears in ``source``,
+    so that the function's source can be found
+    :param f_mod: A module built by :func:`live_module`
+    :type f_mod: Module
+    :param source: The module's source code
+    :type source: str
+    """
+    func_def = f_mod.body[0].body[0]
+    pattern = re.compile(r'\s+(async\s+)?def\s+{}\b'.format(func_def.name))
+    for lineno, line in enumerate(source.splitlines()[1:], 2):
+        if pattern.match(line):
+            ast.increment_lineno(func_def, lineno - func_def.lineno)
+            return
+
+
+def _exec_live(code, glbls, f):
+    namespace = {}
+    exec(code, namespace)
+    factory = namespace[FACTORY_NAME]
+    factory = types.FunctionType(factory.__code__, f.__globals__, FACTORY_NAME)
+    cells = dict(zip(f.__code__.co_freevars, f.__closure__ or ()))
+    args = []
+    for param in factory.__code__.co_varnames[:factory.__code__.co_argcount]:
+        if param in glbls:
+            args.append(glbls[param])
+        else:
+            try:
+                args.append(cells[param].cell_contents)
+            except ValueError:  # Not assigned yet; the real cell will be used anyway
+                args.append(None)
+    func = factory(*args)
+    live = types.FunctionType(func.__code__, f.__globals__, func.__name__, func.__defaults__, live_closure(func, f))
+    live.__kwdefaults__ = func.__kwdefaults__
+    live.__annotations__ = func.__annotations__
+    live.__qualname__ = f.__qualname__
+    return live
+
+
+def exec_function(code, name, glbls, source=None, temp=None, stats=None, live=None):
+    """
+    Executes a compiled module containing a single function definition, and returns that function
+    :param code: The compiled module
+    :param name: The name of the function defined by the module
+    :param glbls: The names and values visible to the module. Only those it refers to are copied into its namespace
+    :param source: The module's source code, to write to ``temp`` (if not already written)
+    :param temp: An open tempfile to save the source to, so that the function is inspectable
+    :param stats: Where to record the time spent writing ``temp``
+    :type stats: TransformStats
+    :param live: The original function, if the module was built by :func:`live_module`. ``glbls`` is then its overlay
+    :type live: Callable|None
+    :return: The defined function
+    """
+    if live is not None:
+        func = _exec_live(code, glbls, live)
     else:
-        source = None
+        glbls = function_namespace(code, glbls)
+        exec(code, glbls)
+        func = glbls[name]
+    if temp is not None:
+        func.__tempfile__ = temp
+        with (stats or TransformStats()).phase('io'):
+            _write_source(temp, source, func)
+    return func
+
+
+def _write_source(temp, source, func):
+    # When there are other decorators, the co_firstlineno of *some* python distributions gets confused
+    # and thinks they will be there even when they are not written to the file, causing readline overflow
+    # So we put some empty lines to make them align
+    if source is not None:  # Otherwise, it was written as it was generated
+        temp.write(source)
+    temp.write('\n' * func.__code__.co_firstlineno)
+    temp.flush()
+    temp.close()
+
+
+def register_source(f_mod, name, source=None):
+    """
+    Registers a module's source with :mod:`linecache` under a new, synthetic filename, so that code compiled with that
+    filename can be inspected and shows up in tracebacks without writing any files. Unless ``source`` is given, it is
+    only generated from ``f_mod`` once something asks for it.
+
+    Until then, the entry keeps ``f_mod`` alive, which takes far more memory than its source. So only the most recent
+    :data:`pragma.config.linecache_pending` modules are kept; when there are more, the oldest one's source is
+    generated and its AST released. The entry is also kept here, so that :func:`_checkcache` can restore it if it's
+    removed from linecache's cache.
+    :param f_mod: The module to register
+    :type f_mod: Module
+    :param name: The name of the function the module defines, to make the filename readable
+    :type name: str
+    :param source: The module's source code, if it's already been generated
+    :type source: str|None
+    :return: The filename to compile the module with
+    :rtype: str
+    """
+    global _linecache_checkcache
+    if _linecache_checkcache is None:
+        _linecache_checkcache, linecache.checkcache = linecache.checkcache, _checkcache
+    filename = '{}{}#{}'.format(LINECACHE_PREFIX, name, next(_linecache_ids))
+
+    def get_source():
+        _pending.pop(filename, None)
+        text = source if source is not None else to_source(f_mod)
+        # Pad the same way tempfiles are, see _write_source
+        text += '\n' * max(getattr(node, 'lineno', 0) for node in ast.walk(f_mod))
+        # From now on, keep only the text rather than this function and the AST it refers to. With no modification
+        # time, linecache.checkcache leaves the entry alone
+        _registered[filename] = (len(text), None, text.splitlines(True), filename)
+        return text
+
+    if source is not None:
+        get_source()
+        linecache.cache[filename] = _registered[filename]
+        return filename
+
+    # A 1-tuple is linecache's placeholder for lazily loaded source
+    linecache.cache[filename] = _registered[filename] = (get_source,)
+    _pending[filename] = get_source
+    while len(_pending) > max(config.linecache_pending, 0):
+        oldest, oldest_source = _pending.popitem(last=False)
+        oldest_source()
+        linecache.cache[oldest] = _registered[oldest]
+    return filename
 
+
+def _checkcache(filename=None):
+    """
+    Replaces :func:`linecache.checkcache` once any source is registered, to restore the entries of registered functions
+    if :func:`linecache.clearcache` (or anything else) has removed them. :mod:`inspect` and :mod:`traceback` call it
+    before reading a file's lines, and without the entry, linecache would ask the loader of the function's module for
+    the source, returning the original module's source instead.
+    :param filename: The file to check, or None to check every file
+    :type filename: str|None
+    """
+    _linecache_checkcache(filename)
+    if filename is None:
+        for name, entry in _registered.items():
+            linecache.cache.setdefault(name, entry)
+    elif filename in _registered:
+        linecache.cache.setdefault(filename, _registered[filename])
+
+
+def save_or_return_source(f_file, f_mod, glbls, return_source, save_source, stats=None, live=None):
+    stats = stats or TransformStats()
     if return_source:
-        return source
+        with stats.phase('codegen'):
+            return to_source(f_mod)
 
-    f_mod = ast.fix_missing_locations(f_mod)
+    name = f_mod.body[0].name
+    if live is not None:
+        f_mod = live_module(f_mod, live, glbls)
+    source = temp = None
     if save_source:
-        temp = tempfile.NamedTemporaryFile('w', delete=False)
-        f_file = temp.name
-    exec(compile(f_mod, f_file, 'exec'), glbls)
-    func = glbls[f_mod.body[0].name]
-    if save_source:
-        func.__tempfile__ = temp
-        # When there are other decorators, the co_firstlineno of *some* python distributions gets confused
-        # and thinks they will be there even when they are not written to the file, causing readline overflow
-        # So we put some empty lines to make them align
-        temp.write(source)
-        temp.write('\n' * func.__code__.co_firstlineno)
-        temp.flush()
-        temp.close()
-    return func
\ No newline at end of file
+        with stats.phase('codegen'):
+            # Live globals need the source now to line up the function. Otherwise, source kept in linecache is only
+            # generated once it's needed, and large functions are written to their tempfile as they're generated
+            if live is not None or (save_source != 'linecache' and not is_large(f_mod)):
+                source = to_source(f_mod)
+            if live is not None:
+                align_live_module(f_mod, source)
+        if save_source == 'linecache':
+            f_file = register_source(f_mod, name, source)
+            source = None
+        else:
+            with stats.phase('io'):
+                temp = tempfile.NamedTemporaryFile('w', delete=False)
+            if source is None:
+                with stats.phase('codegen'):
+                    write_source(f_mod, temp)
+            f_file = temp.name
+    with stats.phase('compile'):
+        code = compile(ast.fix_missing_locations(f_mod), f_file, 'exec')
+    return exec_function(code, name, glbls, source, temp, stats, live)
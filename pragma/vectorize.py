@@ -0,0 +1,396 @@
+"""
+Rewrites element-wise loops over NumPy arrays, such as ``for i in range(8): out[i] = a[i] * b[i]``, and the runs of
+statements that unrolling such loops leaves behind, as single slice operations like ``out[0:8] = a[0:8] * b[0:8]``.
+
+Whether the arrays really are NumPy arrays is only known once the function is called, so each rewrite is guarded by a
+call to :func:`vectorizable`, and the original, scalar code is kept as the fallback::
+
+    if PRAGMA_vectorizable((out, a, b), (8, 8, 8), 1, ()):
+        out[0:8] = a[0:8] * b[0:8]
+    else:
+        for i in range(8):
+            out[i] = a[i] * b[i]
+
+Loops are only rewritten when their iterations are certainly independent: every statement assigns an element of an
+array, reads array elements at a fixed offset from the loop variable and otherwise only uses scalars, and every array
+that's assigned to is only used at the same offset as it's assigned. The guard checks the rest when the function runs.
+Without NumPy, the guards could never pass, so functions are left unchanged.
+"""
+import ast
+import logging
+
+from miniutils import optional_argument_decorator
+
+from . import config
+from .core import TrackedContextTransformer, make_function_transformer
+from .core.clone import clone
+
+try:
+    import numpy
+except ImportError:  # pragma: nocover
+    numpy = None
+
+log = logging.getLogger(__name__)
+
+#: Operators that apply to NumPy arrays element by element, just as they apply to their elements
+_elementwise_ops = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+                    ast.LShift, ast.RShift, ast.BitAnd, ast.BitOr, ast.BitXor)
+_elementwise_unary_ops = (ast.UAdd, ast.USub, ast.Invert)
+_guard_name = 'PRAGMA_vectorizable'
+_run_var = 'PRAGMA_i'
+
+
+def vectorizable(arrays, lengths, n_written, scalars, augmented=()):
+    """
+    Checks, when a function rewritten by :func:`vectorize_loops` runs, whether a rewritten loop can use its slice form
+    :param arrays: The arrays the loop uses, starting with those it assigns to
+    :type arrays: tuple
+    :param lengths: The length each array needs for the loop not to index past its end
+    :type lengths: tuple(int)
+    :param n_written: How many of ``arrays`` the loop assigns to
+    :type n_written: int
+    :param scalars: The other values the loop uses, which must be the same in every iteration
+    :type scalars: tuple
+    :param augmented: The positions in ``arrays`` of those the loop updates with an augmented assignment, e.g. ``+=``
+    :type augmented: tuple(int)
+    :return: Whether every array is a one-dimensional NumPy array that's long enough (so that every slice has the same
+        length, and nothing broadcasts differently from the loop), none of the arrays assigned to share memory with
+        another, every scalar is a scalar, and the arrays updated in place can hold the results without the casting
+        error NumPy would raise where the loop would truncate
+    :rtype: bool
+    """
+    if numpy is None:
+        return False
+    for array, length in zip(arrays, lengths):
+        if not isinstance(array, numpy.ndarray) or array.ndim != 1 or len(array) < length:
+            return False
+    for i in range(n_written):
+        if any(numpy.may_share_memory(arrays[i], other) for other in arrays[i + 1:]):
+            return False
+    if not all(numpy.ndim(scalar) == 0 for scalar in scalars):
+        return False
+    if augmented:
+        result = numpy.result_type(*arrays, *scalars)
+        return all(numpy.can_cast(result, arrays[i].dtype, 'same_kind') for i in augmented)
+    return True
+
+
+def _index(node):
+    index = node.slice
+    return index.value if isinstance(index, ast.Index) else index
+
+
+def _offset(index, var):
+    """
+    :return: ``c`` if ``index`` is ``var``, ``var + c``, ``c + var`` or ``var - c`` for a constant integer ``c``, else
+        None
+    :rtype: int|None
+    """
+    if isinstance(index, ast.Name) and index.id == var:
+        return 0
+    if not isinstance(index, ast.BinOp):
+        return None
+    left, right = index.left, index.right
+    if isinstance(index.op, ast.Add) and isinstance(left, ast.Num) and isinstance(right, ast.Name):
+        left, right = right, left
+    if not (isinstance(left, ast.Name) and left.id == var and isinstance(right, ast.Num)
+            and type(right.n) is int):
+        return None
+    if isinstance(index.op, ast.Add):
+        return right.n
+    if isinstance(index.op, ast.Sub):
+        return -right.n
+    return None
+
+
+class _Accesses:
+    """The arrays and scalars an element-wise loop body uses, in the order they're first used"""
+
+    def __init__(self, var):
+        self.var = var
+        self.written = {}  # Name -> offsets
+        self.read = {}
+        self.scalars = []
+        self.augmented = set()  # Names assigned with +=, -=, ...
+
+    def target(self, node):
+        if not (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name)):
+            return False
+        offset = _offset(_index(node), self.var)
+        if offset is None:
+            return False
+        self.written.setdefault(node.value.id, set()).add(offset)
+        return True
+
+    def expr(self, node):
+        if isinstance(node, ast.Subscript):
+            if not isinstance(node.value, ast.Name):
+                return False
+            offset = _offset(_index(node), self.var)
+            if offset is None:
+                return False
+            self.read.setdefault(node.value.id, set()).add(offset)
+            return True
+        if isinstance(node, ast.Name):
+            if node.id == self.var:  # The index itself isn't an array
+                return False
+            if node.id not in self.scalars:
+                self.scalars.append(node.id)
+            return True
+        if isinstance(node, ast.Num):
+            return not isinstance(node.n, bool)
+        if isinstance(node, ast.BinOp):
+            return isinstance(node.op, _elementwise_ops) and self.expr(node.left) and self.expr(node.right)
+        if isinstance(node, ast.UnaryOp):
+            return isinstance(node.op, _elementwise_unary_ops) and self.expr(node.operand)
+        return False
+
+    def independent(self):
+        """Whether no iteration uses an element that another iteration assigns"""
+        arrays = set(self.written) | set(self.read)
+        if self.var in arrays or arrays & set(self.scalars):
+            return False
+        return all(len(offsets | self.read.get(name, set())) == 1 for name, offsets in self.written.items())
+
+
+# noinspection PyPep8Naming
+class VectorizeTransformer(TrackedContextTransformer):
+    def visit_Module(self, node):
+        if numpy is None:
+            # The slice forms could never run, so the guards would only slow the function down
+            return node
+        self._function = node.body[0]
+        node = super().visit_Module(node)
+        self._vectorize_runs(node.body[0])
+        return node
+
+    def visit_For(self, node):
+        node = super().visit_For(node)
+        if node.orelse or not isinstance(node.target, ast.Name):
+            return node
+        iterable = self.resolve_iterable(node.iter)
+        values = _progression(iterable)
+        if values is None or len(values) < config.vectorize_min_length:
+            return node
+        vectorized = self._vectorize(node.body, node.target.id, values, [node])
+        if vectorized is None:
+            return node
+        if self._used_elsewhere(node, node.target.id):
+            # The loop variable is left with its last value
+            vectorized.body.append(ast.Assign(targets=[ast.Name(id=node.target.id, ctx=ast.Store())],
+                                              value=ast.Num(n=values[-1])))
+        return vectorized
+
+    def _used_elsewhere(self, loop, name):
+        inside = {id(n) for n in ast.walk(loop)}
+        return any(isinstance(n, ast.Name) and n.id == name and id(n) not in inside for n in ast.walk(self._function))
+
+    def _vectorize(self, body, var, values, fallback):
+        """
+        :param body: The statements run for each value of ``var``
+        :type body: list(stmt)
+        :param var: The loop variable
+        :type var: str
+        :param values: The values ``var`` takes, evenly spaced
+        :type values: list(int)
+        :param fallback: The scalar code to run if the arrays can't be vectorized when the function's called
+        :type fallback: list(stmt)
+        :return: The guarded slice form of the loop, or None if its iterations might not be independent
+        :rtype: If|None
+        """
+        accesses = _Accesses(var)
+        for stmt in body:
+            if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+                target = stmt.targets[0]
+            elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.op, _elementwise_ops):
+                target = stmt.target
+            else:
+                return None
+            if not (accesses.target(target) and accesses.expr(stmt.value)):
+                return None
+            if isinstance(stmt, ast.AugAssign):
+                accesses.augmented.add(target.value.id)
+        if not accesses.independent():
+            log.debug("Not vectorizing loop over %s, its iterations might depend on each other", var)
+            return None
+
+        low, high = min(values), max(values)
+        step = abs(values[1] - values[0])
+        offsets = {}
+        for group in (accesses.written, accesses.read):
+            for name, found in group.items():
+                offsets.setdefault(name, set()).update(found)
+        if low + min(min(found) for found in offsets.values()) < 0:
+            return None  # Negative indices wrap around, but slices with them don't
+
+        vectorized = clone(body)
+        for stmt in vectorized:
+            for node in ast.walk(stmt):
+                if isinstance(node, ast.Subscript):
+                    offset = _offset(_index(node), var)
+                    node.slice = ast.Slice(lower=ast.Num(n=low + offset), upper=ast.Num(n=high + offset + 1),
+                                           step=ast.Num(n=step) if step != 1 else None)
+
+        arrays = list(accesses.written) + [name for name in accesses.read if name not in accesses.written]
+        guard = ast.Call(func=ast.Name(id=_guard_name, ctx=ast.Load()), args=[
+            ast.Tuple(elts=[ast.Name(id=name, ctx=ast.Load()) for name in arrays], ctx=ast.Load()),
+            ast.Tuple(elts=[ast.Num(n=high + max(offsets[name]) + 1) for name in arrays], ctx=ast.Load()),
+            ast.Num(n=len(accesses.written)),
+            ast.Tuple(elts=[ast.Name(id=name, ctx=ast.Load()) for name in accesses.scalars], ctx=ast.Load()),
+        ], keywords=[])
+        if accesses.augmented:
+            guard.args.append(ast.Tuple(elts=[ast.Num(n=i) for i, name in enumerate(arrays)
+                                              if name in accesses.augmented], ctx=ast.Load()))
+        result = ast.If(test=guard, body=vectorized, orelse=fallback)
+        result._pragma_vectorized = True
+        return result
+
+    def _vectorize_runs(self, node):
+        """Vectorizes runs of unrolled statements in every block of the function, except nested definitions"""
+        if getattr(node, '_pragma_vectorized', False):
+            return
+        for field in ('body', 'orelse', 'finalbody', 'handlers'):
+            stmts = getattr(node, field, None)
+            if not isinstance(stmts, list):
+                continue
+            for stmt in stmts:
+                if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    self._vectorize_runs(stmt)
+            if field != 'handlers':
+                setattr(node, field, self._replace_runs(stmts))
+
+    def _replace_runs(self, stmts):
+        patterns = [_pattern(stmt) for stmt in stmts]
+        result = []
+        start = 0
+        while start < len(stmts):
+            found = self._run_at(stmts, patterns, start)
+            if found is None:
+                result.append(stmts[start])
+                start += 1
+            else:
+                length, vectorized = found
+                result.append(vectorized)
+                start += length
+        return result
+
+    def _run_at(self, stmts, patterns, start):
+        """
+        Looks for a run of statements starting at ``start`` which repeat a block of ``period`` statements, with every
+        constant index growing by the same step each time, as unrolling an element-wise loop leaves behind
+        :return: How many statements the run has and its vectorized form, or None if there's no such run
+        :rtype: tuple(int, If)|None
+        """
+        for period in range(1, (len(stmts) - start) // config.vectorize_min_length + 1):
+            block = patterns[start:start + period]
+            if any(pattern is None for pattern in block):
+                return None
+            step = None
+            count = 1
+            while start + (count + 1) * period <= len(stmts):
+                repeat = patterns[start + count * period:start + (count + 1) * period]
+                if any(p is None or p[0] != b[0] for p, b in zip(repeat, block)):
+                    break
+                diffs = {i - j for p, b in zip(repeat, block) for i, j in zip(p[1], b[1])}
+                if step is None:
+                    if len(diffs) != 1 or 0 in diffs:
+                        break
+                    step = diffs.pop()
+                elif diffs != {count * step}:
+                    break
+                count += 1
+            if count < config.vectorize_min_length:
+                continue
+
+            # Rewrite the first block as the body of a loop over the first index's values
+            first = block[0][1][0]
+            body = clone(stmts[start:start + period])
+            for stmt in body:
+                for node in ast.walk(stmt):
+                    if isinstance(node, ast.Subscript) and _constant_index(node) is not None:
+                        offset = _constant_index(node) - first
+                        node.slice = ast.BinOp(left=ast.Name(id=_run_var, ctx=ast.Load()),
+                                               op=ast.Add() if offset >= 0 else ast.Sub(), right=ast.Num(n=abs(offset)))
+            values = [first + step * i for i in range(count)]
+            length = count * period
+            vectorized = self._vectorize(body, _run_var, values, stmts[start:start + length])
+            if vectorized is not None:
+                return length, vectorized
+        return None
+
+
+def _constant_index(node):
+    """
+    :return: The subscript's index if it's a non-negative integer (including sums such as ``2 - 1``, which unrolling
+        leaves when the loop's index has an offset), else None
+    :rtype: int|None
+    """
+    index = _sum(_index(node))
+    return index if index is not None and index >= 0 else None
+
+
+def _sum(node):
+    if isinstance(node, ast.Num) and type(node.n) is int:
+        return node.n
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+        left, right = _sum(node.left), _sum(node.right)
+        if left is not None and right is not None:
+            return left + right if isinstance(node.op, ast.Add) else left - right
+    return None
+
+
+def _pattern(stmt):
+    """
+    :return: What an assignment to an array element looks like without its constant indices, and those indices, or
+        None if it's not an assignment to an array element at a constant index
+    :rtype: tuple(str, tuple(int))|None
+    """
+    target = stmt.targets[0] if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 else getattr(stmt, 'target', None)
+    if not (isinstance(stmt, (ast.Assign, ast.AugAssign)) and isinstance(target, ast.Subscript)
+            and _constant_index(target) is not None):
+        return None
+    stmt = clone(stmt)
+    indices = []
+    for node in ast.walk(stmt):
+        if isinstance(node, ast.Subscript) and _constant_index(node) is not None:
+            indices.append(_constant_index(node))
+            node.slice = ast.Name(id=_run_var, ctx=ast.Load())
+    return ast.dump(stmt), tuple(indices)
+
+
+def _progression(iterable):
+    """
+    :return: The values of ``iterable`` if it's at least two evenly spaced integers, else None
+    :rtype: list(int)|None
+    """
+    if iterable is None or len(iterable) < 2 or any(type(v) is not int for v in iterable):
+        return None
+    step = iterable[1] - iterable[0]
+    if step == 0 or any(b - a != step for a, b in zip(iterable, iterable[1:])):
+        return None
+    return iterable
+
+
+_vectorize_loops = make_function_transformer(VectorizeTransformer, 'vectorize_loops',
+                                             "Rewrites element-wise loops over NumPy arrays as slice operations")
+
+
+@optional_argument_decorator
+def vectorize_loops(function_globals=None, **kwargs):
+    """
+    Rewrites element-wise loops over NumPy arrays, and runs of statements left by unrolling them, as slice operations,
+    falling back on the original code when the function's called with anything but NumPy arrays that don't overlap.
+    Takes the same arguments as :func:`pragma.collapse_literals`
+    :param function_globals: Overridden global name assignments to use when processing the function
+    :type function_globals: dict|None
+    :param kwargs: Any other arguments (see :func:`pragma.collapse_literals`)
+    :type kwargs: dict
+    :return: The decorator
+    :rtype: Callable
+    """
+    # The guards call vectorizable, so the transformed function needs it in its globals
+    function_globals = dict(function_globals or {}, **{_guard_name: vectorizable})
+    return _vectorize_loops(function_globals=function_globals, **kwargs)
+
+
+vectorize_loops.__pragma_decorator__ = True
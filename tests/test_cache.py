@@ -0,0 +1,443 @@
+import array
+import linecache
+import os
+import tempfile
+import traceback
+import types
+from unittest import mock
+
+import pragma
+from pragma import config
+from pragma.core.cache import get_cache, fingerprint, Unfingerprintable, transform_cache, function_namespace
+from .test_pragma import PragmaTest
+
+
+class TestDiskCache(PragmaTest):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = get_cache(self.cache_dir)
+        # Keep the in-process cache from answering first
+        self.lru_size = transform_cache.maxsize
+        transform_cache.maxsize = 0
+
+    def tearDown(self):
+        transform_cache.maxsize = self.lru_size
+
+    def test_hit(self):
+        def make():
+            @pragma.unroll(cache=self.cache_dir, n=3)
+            def f():
+                for i in range(n):
+                    yield i
+            return f
+
+        f1 = make()
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+        f2 = make()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(list(f1()), [0, 1, 2])
+        self.assertEqual(list(f2()), [0, 1, 2])
+        self.assertTrue(f2.__code__.co_filename.startswith(self.cache_dir))
+
+        result = '''
+        def f():
+            yield 0
+            yield 1
+            yield 2
+        '''
+        self.assertSourceEqual(f2, result)
+
+    def test_live_globals(self):
+        def make():
+            step = 2
+
+            @pragma.unroll(cache=self.cache_dir, live_globals=True)
+            def f():
+                for i in range(2):
+                    yield i * step
+            return f
+
+        f1, f2 = make(), make()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(list(f2()), [0, 2])
+        self.assertIs(f2.__globals__, globals())
+        self.assertSourceEqual(f2, '''
+        def f():
+            yield 0 * step
+            yield 1 * step
+        ''')
+
+    def test_context_invalidates(self):
+        def make(n):
+            @pragma.unroll(cache=self.cache_dir)
+            def f():
+                for i in range(n):
+                    yield i
+            return f
+
+        self.assertEqual(list(make(2)()), [0, 1])
+        self.assertEqual(list(make(3)()), [0, 1, 2])
+        self.assertEqual(list(make(2)()), [0, 1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_attributes_invalidate(self):
+        settings = types.ModuleType('settings')
+
+        class Cfg:
+            M = 1
+
+        def make():
+            @pragma.unroll(cache=self.cache_dir)
+            def f():
+                for i in range(settings.N):
+                    yield i
+                for i in range(Cfg.M):
+                    yield -i
+            return f
+
+        settings.N = 2
+        self.assertEqual(list(make()()), [0, 1, 0])
+        settings.N = 4
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0])
+        Cfg.M = 2
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0, -1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 3))
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0, -1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+
+    def test_uncacheable_context(self):
+        obj = object()
+
+        @pragma.collapse_literals(cache=self.cache_dir)
+        def f():
+            return obj
+
+        self.assertIs(f(), obj)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint([1, 'a', (None,)]), fingerprint([1, 'a', (None,)]))
+        self.assertNotEqual(fingerprint([1, 2]), fingerprint((1, 2)))
+        self.assertEqual(fingerprint({2: 'b', 1: 'a'}), fingerprint({1: 'a', 2: 'b'}))
+        self.assertRaises(Unfingerprintable, fingerprint, object())
+
+        module = types.ModuleType('module')
+        module.N, module.obj = 2, object()
+        before = fingerprint(module, ['N'])
+        module.N = 3
+        self.assertNotEqual(fingerprint(module, ['N']), before)
+        self.assertEqual(fingerprint(module), fingerprint(module))  # Attributes the code doesn't use are ignored
+        self.assertRaises(Unfingerprintable, fingerprint, module, ['obj'])
+
+
+class TestTransformLRU(PragmaTest):
+    def setUp(self):
+        transform_cache.clear()
+
+    def test_factory(self):
+        def make(a, b):
+            @pragma.unroll
+            def f(x):
+                for i in range(a):
+                    yield x + i + b
+            return f
+
+        f1 = make(2, 10)
+        f2 = make(2, 20)
+        self.assertEqual(transform_cache.info().hits, 0)  # b is a closure variable with a new value
+        f3 = make(2, 10)
+        f4 = make(2, 20)
+        self.assertEqual(transform_cache.info().hits, 2)
+        self.assertIs(f3.__code__, f1.__code__)
+        self.assertIs(f4.__code__, f2.__code__)
+        self.assertEqual(list(f1(0)), [10, 11])
+        self.assertEqual(list(f2(0)), [20, 21])
+        self.assertEqual(list(f3(0)), [10, 11])
+        self.assertEqual(list(f4(0)), [20, 21])
+
+    def test_defaults_rebound(self):
+        def make():
+            @pragma.collapse_literals
+            def f(acc=[]):
+                acc.append(1)
+                return acc
+            return f
+
+        f1, f2 = make(), make()
+        self.assertEqual(transform_cache.info().hits, 1)
+        self.assertEqual(f1(), [1])
+        self.assertEqual(f2(), [1])
+
+    def test_mutated_attributes(self):
+        g = lambda: None
+        g.n = 2
+
+        def make():
+            @pragma.unroll
+            def f():
+                for i in range(g.n):
+                    yield i
+            return f
+
+        self.assertEqual(list(make()()), [0, 1])
+        g.n = 3
+        self.assertEqual(list(make()()), [0, 1, 2])
+        self.assertEqual(transform_cache.info().hits, 0)
+
+    def test_mutated_class_and_module(self):
+        class Cfg:
+            N = 2
+
+        settings = types.ModuleType('settings')
+        settings.M = 1
+
+        def make():
+            @pragma.unroll
+            def f():
+                for i in range(Cfg.N):
+                    yield i
+                for i in range(settings.M):
+                    yield -i
+            return f
+
+        self.assertEqual(list(make()()), [0, 1, 0])
+        Cfg.N = 4
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0])
+        settings.M = 2
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0, -1])
+        self.assertEqual(transform_cache.info().hits, 0)
+        self.assertEqual(list(make()()), [0, 1, 2, 3, 0, -1])
+        self.assertEqual(transform_cache.info().hits, 1)
+
+    def test_mutable_without_dict(self):
+        class Slotted:
+            __slots__ = ('n',)
+
+        c = Slotted()
+        c.n = 3
+        a = array.array('i', [1, 2])
+
+        def make():
+            @pragma.unroll
+            def f():
+                for i in range(c.n):
+                    yield i + a[0]
+            return f
+
+        self.assertEqual(list(make()()), [1, 2, 3])
+        c.n, a[0] = 2, 100
+        self.assertEqual(list(make()()), [100, 101])
+        self.assertEqual(transform_cache.info().hits, 0)
+
+    def test_eviction(self):
+        transform_cache.maxsize, size = 1, transform_cache.maxsize
+        try:
+            def make(n):
+                @pragma.unroll
+                def f():
+                    for i in range(n):
+                        yield i
+                return f
+
+            make(1), make(2), make(1)
+            self.assertEqual(transform_cache.info().hits, 0)
+            self.assertEqual(transform_cache.info().currsize, 1)
+        finally:
+            transform_cache.maxsize = size
+
+
+unused_global = 'unused'
+used_global = 'used'
+
+
+class TestFunctionNamespace(PragmaTest):
+    def test_only_referenced_names(self):
+        @pragma.unroll
+        def f():
+            return [used_global for _ in range(2)]
+
+        self.assertEqual(f(), ['used', 'used'])
+        self.assertIn('used_global', f.__globals__)
+        self.assertNotIn('unused_global', f.__globals__)
+        self.assertNotIn('range', f.__globals__)  # Unrolled away
+        self.assertEqual(f.__globals__['__name__'], __name__)
+
+    def test_dynamic_access(self):
+        def f():
+            return globals()['unused_global']
+
+        namespace = function_namespace(f.__code__, globals())
+        self.assertIn('unused_global', namespace)
+        self.assertIsNot(namespace, globals())
+
+
+rebound = 1
+
+
+class TestLiveGlobals(PragmaTest):
+    def tearDown(self):
+        global rebound
+        rebound = 1
+
+    def test_sees_rebinds(self):
+        global rebound
+
+        @pragma.unroll(live_globals=True)
+        def f():
+            out = []
+            for i in range(3):
+                out.append(rebound * i)
+            return out
+
+        self.assertEqual(f(), [0, 1, 2])
+        self.assertIs(f.__globals__, globals())
+        rebound = 2
+        self.assertEqual(f(), [0, 2, 4])
+        self.assertSourceEqual(f, '''
+        def f():
+            out = []
+            out.append(rebound * 0)
+            out.append(rebound * 1)
+            out.append(rebound * 2)
+            return out
+        ''')
+
+    def test_closure_cells(self):
+        scale = 1
+
+        @pragma.unroll(live_globals=True)
+        def f():
+            return [scale * i for i in range(2)]
+
+        self.assertEqual(f(), [0, 1])
+        scale = 3
+        self.assertEqual(f(), [0, 3])
+        self.assertEqual(f.__qualname__, 'TestLiveGlobals.test_closure_cells.<locals>.f')
+
+    def test_function_globals(self):
+        @pragma.deindex([abs, len], 'fns', live_globals=True)
+        def f(x):
+            return fns[0](x) + fns[1]([x])
+
+        self.assertEqual(f(-2), 3)
+        self.assertNotIn('fns_0', f.__globals__)
+
+    def test_cached(self):
+        size = transform_cache.maxsize
+        transform_cache.maxsize = 16
+        transform_cache.clear()
+        try:
+            def make(offset):
+                @pragma.collapse_literals(live_globals=True)
+                def f(x):
+                    return x + offset + rebound
+                return f
+
+            first, second = make(1), make(1)
+            self.assertEqual(transform_cache.info().hits, 1)
+            self.assertEqual((first(0), second(0)), (2, 2))
+            self.assertIs(second.__globals__, globals())
+        finally:
+            transform_cache.maxsize = size
+
+
+class TestLinecacheSource(PragmaTest):
+    def test_inspectable_without_files(self):
+        with mock.patch('tempfile.NamedTemporaryFile', side_effect=AssertionError("Wrote a tempfile")), \
+                mock.patch('pragma.utils.to_source', wraps=pragma.utils.to_source) as to_source:
+            @pragma.unroll(save_source='linecache')
+            def f():
+                for i in range(2):
+                    yield i
+
+            self.assertEqual(to_source.call_count, 0)
+            self.assertTrue(f.__code__.co_filename.startswith('pragma://'))
+            self.assertFalse(hasattr(f, '__tempfile__'))
+            self.assertSourceEqual(f, '''
+            def f():
+                yield 0
+                yield 1
+            ''')
+            self.assertEqual(to_source.call_count, 1)
+        self.assertEqual(list(f()), [0, 1])
+
+    def test_pending_bounded(self):
+        pending, config.linecache_pending = config.linecache_pending, 1
+        try:
+            def make(n):
+                @pragma.unroll(save_source='linecache')
+                def f():
+                    for i in range(n):
+                        yield i
+                return f
+
+            first, second = make(1), make(2)
+            # Only the newest function keeps its AST; the other's source was generated to release it
+            self.assertEqual(len(linecache.cache[first.__code__.co_filename]), 4)
+            self.assertEqual(len(linecache.cache[second.__code__.co_filename]), 1)
+            self.assertSourceEqual(first, '''
+            def f():
+                yield 0
+            ''')
+            self.assertSourceEqual(second, '''
+            def f():
+                yield 0
+                yield 1
+            ''')
+        finally:
+            config.linecache_pending = pending
+
+    def test_cache_cleared(self):
+        @pragma.unroll(save_source='linecache')
+        def f(x):
+            for i in range(2):
+                x += i
+            return x
+
+        result = '''
+        def f(x):
+            x += 0
+            x += 1
+            return x
+        '''
+        self.assertSourceEqual(f, result)
+        # Otherwise, linecache would ask this module's loader, and find this file's source instead
+        linecache.clearcache()
+        self.assertSourceEqual(f, result)
+        linecache.clearcache()
+        linecache.checkcache()
+        self.assertEqual(linecache.getline(f.__code__.co_filename, 4), '    return x\n')
+
+    def test_traceback_and_redecoration(self):
+        @pragma.collapse_literals(save_source='linecache')
+        @pragma.unroll(save_source='linecache')
+        def f(x):
+            for i in range(2):
+                x += i
+            return x / (x - 1)
+
+        self.assertSourceEqual(f, '''
+        def f(x):
+            x += 0
+            x += 1
+            return x / (x - 1)
+        ''')
+        try:
+            f(0)
+        except ZeroDivisionError:
+            self.assertIn('File "pragma://f#', traceback.format_exc())
+        else:
+            self.fail("Expected a ZeroDivisionError")
+
+    def test_live_globals(self):
+        @pragma.unroll(save_source='linecache', live_globals=True)
+        def f():
+            for i in range(2):
+                yield i + rebound
+
+        self.assertEqual(list(f()), [1, 2])
+        self.assertSourceEqual(f, '''
+        def f():
+            yield 0 + rebound
+            yield 1 + rebound
+        ''')
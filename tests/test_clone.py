@@ -0,0 +1,46 @@
+import ast
+
+import pragma
+from pragma.core.clone import clone
+from .test_pragma import PragmaTest
+
+
+class TestClone(PragmaTest):
+    def setUp(self):
+        super().setUp()
+        self.tree = ast.parse('x += a[1] * -b if c and d < 2 else f(*args, key=(1, "s"), **kw)\nfor i in y:\n    del z\n')
+
+    def test_equal(self):
+        copied = clone(self.tree)
+        self.assertEqual(ast.dump(copied, include_attributes=True), ast.dump(self.tree, include_attributes=True))
+        self.assertEqual(compile(copied, '<clone>', 'exec').co_names, compile(self.tree, '<tree>', 'exec').co_names)
+
+    def test_independent(self):
+        copied = clone(self.tree.body)
+        original = {id(n) for n in ast.walk(self.tree)}
+        for stmt in copied:
+            for node in ast.walk(stmt):
+                # Only contexts and operators, which are never modified, are shared
+                self.assertEqual(id(node) in original, isinstance(node, (ast.expr_context, ast.operator, ast.boolop,
+                                                                         ast.unaryop, ast.cmpop)), node)
+
+        copied[0].target.id = 'changed'
+        copied[1].body.append(ast.Pass())
+        self.assertEqual(self.tree.body[0].target.id, 'x')
+        self.assertEqual(len(self.tree.body[1].body), 1)
+
+    def test_unroll_reuses_nothing(self):
+        @pragma.unroll(return_source=True)
+        def f(x):
+            for i in range(3):
+                x += [i][0]
+            return x
+
+        result = '''
+        def f(x):
+            x += [0][0]
+            x += [1][0]
+            x += [2][0]
+            return x
+        '''
+        self.assertSourceEqual(f, result)
@@ -0,0 +1,93 @@
+import ast
+import unittest
+from unittest import mock
+
+import pragma
+from pragma import config
+from pragma.core import codegen
+from .test_pragma import PragmaTest
+
+source = '''
+def f(x, y=3, *args, **kw):
+    """A
+    docstring"""
+    x += 1
+
+    def g():
+        return 1
+    for i in range(3):
+        x += i
+    return x
+'''
+
+
+class TestCodegen(PragmaTest):
+    def test_chunks_match(self):
+        f_mod = ast.parse(source)
+        for backend in codegen.BACKENDS:
+            self.assertEqual(''.join(codegen.iter_source(f_mod, backend, chunk_size=2)),
+                             codegen.to_source(f_mod, backend))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            codegen.to_source(ast.parse(source), 'nope')
+
+    @unittest.skipUnless('unparse' in codegen.BACKENDS, "ast.unparse requires python 3.9+")
+    def test_configured_backend(self):
+        with mock.patch.object(config, 'codegen', 'unparse'):
+            @pragma.collapse_literals(return_source=True)
+            def f(x):
+                return [(i * 2) for i in range(x + 1 + 2)]
+
+        # astor would keep the parentheses
+        self.assertSourceEqual(f, '''
+        def f(x):
+            return [i * 2 for i in range(x + 1 + 2)]
+        ''')
+
+    def test_transformed(self):
+        def g(y):
+            return y + 1
+
+        def f(x, n):
+            for i in range(n):  # Unrolled by a factor, into nodes that are made rather than parsed
+                x += i
+            for i in range(3):
+                if x > 10:
+                    break
+                x += g(i)
+            return x
+
+        decorators = [
+            pragma.unroll(unroll_factor=2, return_source=True),
+            pragma.unroll(max_statements=4, return_source=True),
+            pragma.pipeline(pragma.inline(g), pragma.unroll, return_source=True),
+            pragma.lift(imports=False, return_source=True),
+        ]
+        for decorator in decorators:
+            sources = {}
+            for backend in codegen.BACKENDS:
+                with mock.patch.object(config, 'codegen', backend):
+                    sources[backend] = decorator(f)
+            # The backends format code differently, but it should parse to the same thing
+            self.assertEqual(len({ast.dump(ast.parse(source)) for source in sources.values()}), 1, sources)
+
+    def test_streamed_to_tempfile(self):
+        with mock.patch.object(config, 'streaming_threshold', 3), \
+                mock.patch.object(pragma.utils, 'to_source', side_effect=AssertionError("Rendered all at once")):
+            @pragma.unroll
+            def f(x):
+                for i in range(5):
+                    x += i
+                return x
+
+        self.assertEqual(f(0), 10)
+        self.assertSourceEqual(f, '''
+        def f(x):
+            x += 0
+            x += 1
+            x += 2
+            x += 3
+            x += 4
+            return x
+        ''')
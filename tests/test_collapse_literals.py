@@ -462,6 +462,22 @@ class TestCollapseLiterals(PragmaTest):
 
         self.assertSourceEqual(f, result)
 
+    def test_functools_reduce(self):
+        from functools import reduce
+        from operator import mul
+        shape = (2, 3, 4)
+
+        @pragma.collapse_literals
+        def f():
+            return reduce(mul, shape)
+
+        result = '''
+        def f():
+            return 24
+        '''
+
+        self.assertSourceEqual(f, result)
+
     def test_odd_binop(self):
         @pragma.collapse_literals
         def f():
@@ -16,4 +16,63 @@ class TestDictStack(PragmaTest):
         stack.items()
         stack.keys()
         del stack['x']
-        self.assertNotIn('x', stack)
\ No newline at end of file
+        self.assertNotIn('x', stack)
+
+    def test_shadowing(self):
+        glbls, kwargs = {'x': 1, 'y': 2}, {'x': 10}
+        stack = pragma.core.DictStack(glbls, kwargs)
+        self.assertEqual(stack['x'], 10)
+        self.assertIs(stack['len'], len)
+        stack.push({'y': None})
+        self.assertIn('y', stack)
+        with self.assertRaises(KeyError):
+            stack['y']
+        stack['y'] = 3
+        self.assertEqual(stack['y'], 3)
+        self.assertEqual(stack.pop(), {'y': 3})
+        self.assertEqual(stack['y'], 2)
+
+        del stack['x']
+        self.assertEqual(stack['x'], 1)
+        del stack['x']
+        self.assertNotIn('x', stack)
+        with self.assertRaises(KeyError):
+            del stack['x']
+        stack['x'] = 5
+        self.assertEqual(stack['x'], 5)
+
+        # The base mappings are never modified
+        self.assertEqual(glbls, {'x': 1, 'y': 2})
+        self.assertEqual(kwargs, {'x': 10})
+        self.assertIn(('y', 2), stack.items())
+        self.assertIn('len', stack.keys())
+
+    def test_snapshot(self):
+        stack = pragma.core.DictStack({'x': 1})
+        stack['y'] = 2
+        outer = stack.snapshot()
+        stack['y'] = 3
+        stack.push({'z': 4})
+        inner = stack.snapshot()
+        del stack['x']
+        stack['w'] = 5
+        stack.restore(inner)
+        self.assertEqual(stack['x'], 1)
+        self.assertNotIn('w', stack)
+        self.assertEqual(stack['z'], 4)
+
+        stack.pop()
+        del stack['y']
+        self.assertNotIn('y', stack)
+        stack.restore(outer)
+        self.assertEqual(stack['y'], 2)
+        self.assertNotIn('z', stack)
+        self.assertEqual(stack._journal, [])
+
+    def test_release(self):
+        stack = pragma.core.DictStack()
+        token = stack.snapshot()
+        stack['x'] = 1
+        stack.release(token)
+        self.assertEqual(stack['x'], 1)
+        self.assertEqual(stack._journal, [])
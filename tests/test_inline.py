@@ -291,9 +291,16 @@ class TestInline(PragmaTest):
         def test_my_range():
             _my_range_0 = dict([('yield', [])], x=5)
             i = 0
-            while i < _my_range_0['x']:
-                _my_range_0['yield'].append(i)
-                i += 1
+            _my_range_0['yield'].append(i)
+            i += 1
+            _my_range_0['yield'].append(i)
+            i += 1
+            _my_range_0['yield'].append(i)
+            i += 1
+            _my_range_0['yield'].append(i)
+            i += 1
+            _my_range_0['yield'].append(i)
+            i += 1
             _my_range_return_0 = _my_range_0['yield']
             del _my_range_0
             return list(_my_range_return_0)
@@ -0,0 +1,88 @@
+import pragma
+from pragma.core import LazyFunction
+from .test_pragma import PragmaTest
+
+
+def module_level():
+    for i in range(3):
+        yield i
+
+
+def sqr(x):
+    return x ** 2
+
+
+class TestLazy(PragmaTest):
+    def test_transform_on_call(self):
+        @pragma.unroll(lazy=True)
+        def f():
+            for i in range(3):
+                yield i
+
+        self.assertIsInstance(f, LazyFunction)
+        self.assertEqual(f.__name__, 'f')
+        self.assertIsNone(f._func)
+        self.assertEqual(list(f()), [0, 1, 2])
+
+        result = '''
+        def f():
+            yield 0
+            yield 1
+            yield 2
+        '''
+        self.assertSourceEqual(f.materialize(), result)
+
+    def test_replaces_module_global(self):
+        orig = module_level
+        proxy = globals()['module_level'] = pragma.unroll(lazy=True)(module_level)
+        try:
+            self.assertEqual(list(module_level()), [0, 1, 2])
+            self.assertIs(globals()['module_level'], proxy.materialize())
+        finally:
+            globals()['module_level'] = orig
+
+    def test_materialize_all(self):
+        @pragma.collapse_literals(lazy=True)
+        def f():
+            return 1 + 2
+
+        pragma.materialize_all()
+        self.assertIsNotNone(f._func)
+        self.assertSourceEqual(f._func, '''
+        def f():
+            return 3
+        ''')
+
+    def test_stacked(self):
+        @pragma.collapse_literals
+        @pragma.unroll(lazy=True)
+        def f():
+            x = 0
+            for i in range(3):
+                x += i
+            return x
+
+        self.assertNotIsInstance(f, LazyFunction)
+        self.assertEqual(f(), 3)
+
+    def test_lift_and_inline(self):
+        @pragma.lift(lazy=True, imports=False)
+        def f(y):
+            return y
+
+        @pragma.inline(sqr, lazy=True)
+        def g(a):
+            return sqr(a)
+
+        self.assertIsInstance(f, LazyFunction)
+        self.assertIsInstance(g, LazyFunction)
+        self.assertEqual(f(3), 3)
+        self.assertEqual(g(3), 9)
+
+    def test_method(self):
+        class A:
+            @pragma.unroll(lazy=True)
+            def f(self):
+                return [i for i in range(2)]
+
+        self.assertEqual(A().f(), [0, 1])
@@ -0,0 +1,217 @@
+import math
+import sys
+from unittest import mock
+
+import pragma
+from .test_pragma import PragmaTest
+
+transformer = sys.modules['pragma.core.transformer']
+
+fns = [math.sin, math.cos]
+
+
+class TestPipeline(PragmaTest):
+    def test_matches_stacked(self):
+        def f(x):
+            y = 0
+            for i in range(len(fns)):
+                y += fns[i](x)
+            return y
+
+        stacked = pragma.collapse_literals(pragma.deindex(fns, 'fns')(pragma.unroll(f)))
+        fused = pragma.pipeline(pragma.unroll, pragma.deindex(fns, 'fns'), pragma.collapse_literals)(f)
+
+        result = '''
+        def f(x):
+            y = 0
+            y += fns_0(x)
+            y += fns_1(x)
+            return y
+        '''
+        self.assertSourceEqual(stacked, result)
+        self.assertSourceEqual(fused, result)
+        self.assertEqual(fused(1.), math.sin(1.) + math.cos(1.))
+        self.assertEqual(fused.__pragma_stats__.decorator, 'pipeline(unroll, collapse_literals, collapse_literals)')
+
+    def test_parses_and_compiles_once(self):
+        stages = [pragma.unroll, pragma.collapse_literals(n=3), pragma.inline(sqr)]
+
+        with mock.patch.object(transformer, 'function_ast', wraps=transformer.function_ast) as function_ast, \
+                mock.patch.object(transformer, 'save_or_return_source',
+                                  wraps=transformer.save_or_return_source) as compile_:
+            @pragma.pipeline(*stages)
+            def f(x):
+                for i in range(n):
+                    x += sqr(i)
+                return x
+
+        self.assertEqual(f(1), 6)
+        self.assertEqual(function_ast.call_count, 1)
+        self.assertEqual(compile_.call_count, 1)
+
+    def test_return_source(self):
+        result = pragma.pipeline(pragma.unroll(n=2), pragma.collapse_literals, return_source=True)(for_source)
+        self.assertSourceEqual(result, '''
+        def for_source():
+            yield 0
+            yield 1
+        ''')
+
+    def test_explicit_only_per_stage(self):
+        a = 2
+
+        def f():
+            for i in range(a):
+                yield i
+            x = a
+
+        # The first stage sees a from the closure, the second only sees what it's given explicitly
+        result = '''
+        def f():
+            yield 0
+            yield 1
+            x = a
+        '''
+        self.assertSourceEqual(pragma.pipeline(pragma.unroll, pragma.collapse_literals(explicit_only=True),
+                                               return_source=True)(f), result)
+        self.assertSourceEqual(pragma.optimize(pragma.unroll, pragma.collapse_literals(explicit_only=True),
+                                               return_source=True)(f), result)
+
+    def test_invalid_stage(self):
+        with self.assertRaises(TypeError):
+            pragma.pipeline(pragma.lift)
+        with self.assertRaises(TypeError):
+            pragma.pipeline(print)
+
+
+def sqr(a):
+    return a * a
+
+
+def for_source():
+    for i in range(n):
+        yield i
+
+
+class TestOptimize(PragmaTest):
+    def setUp(self):
+        super().setUp()
+
+        def f(x):
+            for i in range(3):
+                if i == 1:
+                    x += 10
+                else:
+                    x += i
+            return x
+
+        self.f = f
+
+    def test_converges(self):
+        result = '''
+        def f(x):
+            x += 0
+            x += 10
+            x += 2
+            return x
+        '''
+        self.assertSourceEqual(pragma.optimize(return_source=True)(self.f), result)
+
+        g = pragma.optimize()(self.f)
+        self.assertEqual(g(0), self.f(0))
+        stats = g.__pragma_stats__
+        self.assertEqual(stats.stop_reason, 'converged')
+        self.assertEqual([(p['pass_number'], p['stage'], p['changed']) for p in stats.passes], [
+            (1, 'unroll', True), (1, 'collapse_literals', True),
+            (2, 'unroll', False), (2, 'collapse_literals', False),
+        ])
+        self.assertGreater(stats.passes[0]['nodes'], stats.passes[1]['nodes'])
+
+    def test_converges_with_jumps(self):
+        a = [3, 5]
+
+        def f(x):
+            for i in range(2):
+                if x > a[i]:
+                    continue
+                x += a[i]
+                if x > 20:
+                    break
+            return x
+
+        # The loops that lower the break and continue run once, and aren't unrolled again on later passes
+        result = '''
+        def f(x):
+            PRAGMA_broke = False
+            for ____ in [None]:
+                for ____ in [None]:
+                    if x > 3:
+                        continue
+                    x += 3
+                    if x > 20:
+                        PRAGMA_broke = True
+                        break
+                if PRAGMA_broke:
+                    break
+                for ____ in [None]:
+                    if x > 5:
+                        continue
+                    x += 5
+                    if x > 20:
+                        PRAGMA_broke = True
+                        break
+                if PRAGMA_broke:
+                    break
+            return x
+        '''
+        self.assertSourceEqual(pragma.optimize(return_source=True)(f), result)
+
+        g = pragma.optimize()(f)
+        self.assertEqual(g.__pragma_stats__.stop_reason, 'converged')
+        for x in range(-5, 25):
+            self.assertEqual(g(x), f(x))
+
+    def test_max_passes(self):
+        g = pragma.optimize(max_passes=1)(self.f)
+        self.assertEqual(g(0), self.f(0))
+        self.assertEqual(g.__pragma_stats__.stop_reason, 'max_passes')
+        self.assertEqual(len(g.__pragma_stats__.passes), 2)
+        with self.assertRaises(ValueError):
+            pragma.optimize(max_passes=0)
+
+    def test_max_nodes(self):
+        # Unrolling would grow the function past the budget, so it's undone and the loop is left alone
+        result = '''
+        def f(x):
+            for i in range(3):
+                if i == 1:
+                    x += 10
+                else:
+                    x += i
+            return x
+        '''
+        self.assertSourceEqual(pragma.optimize(max_nodes=30, return_source=True)(self.f), result)
+        g = pragma.optimize(max_nodes=30)(self.f)
+        self.assertEqual(g(0), self.f(0))
+        self.assertEqual(g.__pragma_stats__.stop_reason, 'max_nodes')
+        self.assertEqual(len(g.__pragma_stats__.passes), 1)
+
+    def test_max_time(self):
+        g = pragma.optimize(max_time=0)(self.f)
+        self.assertEqual(g(0), self.f(0))
+        self.assertEqual(g.__pragma_stats__.stop_reason, 'max_time')
+
+    def test_custom_stages(self):
+        def f(x):
+            for i in range(len(fns)):
+                x += fns[i](x)
+            return x
+
+        result = '''
+        def f(x):
+            x += fns_0(x)
+            x += fns_1(x)
+            return x
+        '''
+        self.assertSourceEqual(pragma.optimize(pragma.unroll, pragma.deindex(fns, 'fns'), return_source=True)(f),
+                               result)
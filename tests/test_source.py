@@ -0,0 +1,80 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import textwrap
+import time
+from unittest import SkipTest
+
+import pragma
+from pragma.core import source
+from .test_pragma import PragmaTest
+
+module_source = '''
+import pragma
+
+
+def plain(x):
+    return x
+
+
+class A:
+    @staticmethod
+    @pragma.unroll(lazy=True)
+    def method():
+        for i in range(2):
+            yield i
+
+
+def outer():
+    if True:
+        def inner(y):
+            return y
+    return inner
+'''
+
+
+class TestSourceIndex(PragmaTest):
+    def setUp(self):
+        if not source._has_spans:
+            raise SkipTest("Python < 3.8 doesn't record where definitions end, so files aren't indexed")
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, '_pragma_test_source.py')
+        self.module = self.load(module_source)
+
+    def tearDown(self):
+        sys.modules.pop('_pragma_test_source', None)
+
+    def load(self, text):
+        with open(self.path, 'w') as fp:
+            fp.write(textwrap.dedent(text))
+        spec = importlib.util.spec_from_file_location('_pragma_test_source', self.path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        return module
+
+    def test_finds_definitions(self):
+        index = source.get_index(self.module.plain)
+        self.assertIs(source.get_index(self.module.outer), index)
+        self.assertEqual(source.function_source(self.module.plain), 'def plain(x):\n    return x\n')
+        self.assertEqual(source.function_source(self.module.outer()),
+                         'def inner(y):\n    return y\n')
+        self.assertIn('outer.<locals>.inner', index.by_qualname)
+        self.assertIn('A.method', index.by_qualname)
+
+        self.assertSourceEqual(self.module.A.method.materialize(), '''
+        def method():
+            yield 0
+            yield 1
+        ''')
+
+    def test_invalidated_on_change(self):
+        index = source.get_index(self.module.plain)
+        time.sleep(0.01)  # Make sure the modification time changes too
+        module = self.load(module_source.replace('return x', 'return x + 1'))
+        self.assertIsNot(source.get_index(module.plain), index)
+        self.assertSourceEqual(pragma.collapse_literals(module.plain), '''
+        def plain(x):
+            return x + 1
+        ''')
@@ -0,0 +1,78 @@
+import pragma
+from pragma.core.cache import transform_cache
+from pragma.core.stats import PHASES, registry
+from .test_pragma import PragmaTest
+
+
+def sqr(x):
+    return x ** 2
+
+
+class TestStats(PragmaTest):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_unroll(self):
+        @pragma.unroll
+        def f(x):
+            for i in range(3):
+                x += i
+            return x
+
+        stats = f.__pragma_stats__
+        self.assertEqual(stats.decorator, 'unroll')
+        self.assertEqual(stats.function, 'TestStats.test_unroll.<locals>.f')
+        self.assertIsNone(stats.cache)
+        self.assertEqual(set(stats.timings), set(PHASES))
+        for phase in ('source', 'walk', 'codegen', 'compile'):
+            self.assertGreater(stats.timings[phase], 0)
+        self.assertGreater(stats.nodes_visited, stats.emitted_nodes / 2)
+        self.assertGreater(stats.resolver_calls, 0)
+        self.assertEqual(stats.ast_copies, 3)  # Each iteration's body
+        self.assertGreater(stats.emitted_nodes, 0)
+        self.assertAlmostEqual(stats.total, sum(stats.as_dict()['timings'].values()) - stats.timings['resolve'])
+
+    def test_inline_copies(self):
+        @pragma.inline(sqr)
+        def f(a):
+            return sqr(a) + sqr(a + 1)
+
+        self.assertEqual(f(2), 13)
+        self.assertEqual(f.__pragma_stats__.ast_copies, 2)
+
+    def test_cache_hit(self):
+        old_maxsize = transform_cache.maxsize
+        transform_cache.maxsize = 16
+        try:
+            def make():
+                @pragma.collapse_literals
+                def f():
+                    return 1 + 2
+                return f
+
+            first, second = make(), make()
+        finally:
+            transform_cache.maxsize = old_maxsize
+
+        self.assertIsNone(first.__pragma_stats__.cache)
+        self.assertEqual(second.__pragma_stats__.cache, 'memory')
+        self.assertEqual(second.__pragma_stats__.nodes_visited, 0)
+
+    def test_registry(self):
+        @pragma.collapse_literals
+        def f():
+            return 1 + 2
+
+        @pragma.lift(imports=False)
+        def g(y):
+            return y
+
+        totals = registry.snapshot()
+        self.assertEqual(totals['collapse_literals']['transforms'], 1)
+        self.assertEqual(totals['collapse_literals']['nodes_visited'], f.__pragma_stats__.nodes_visited)
+        self.assertEqual(totals['lift']['transforms'], 1)
+        self.assertGreater(totals['lift']['time_compile'], 0)
+
+        registry.reset()
+        self.assertEqual(registry.snapshot(), {})
@@ -0,0 +1,39 @@
+import logging
+from unittest import mock
+
+import pragma
+import pragma.core
+import pragma.core.transformer
+from .test_pragma import PragmaTest
+
+
+def _forbidden(*args, **kwargs):
+    raise AssertionError("Rendered source for logging while tracing was off")
+
+
+class TestTracing(PragmaTest):
+    def test_no_codegen_when_off(self):
+        logging.getLogger('pragma').setLevel(logging.INFO)
+        try:
+            with mock.patch.object(pragma.core, '_pretty_str', _forbidden), \
+                    mock.patch.object(pragma.core.transformer, 'to_source', _forbidden):
+                @pragma.unroll(save_source=False)
+                def f(x):
+                    y = 2
+                    for i in range(y):
+                        x += i * y
+                    return x
+        finally:
+            logging.getLogger('pragma').setLevel(logging.NOTSET)
+
+        self.assertEqual(f(1), 3)
+
+    def test_traced_when_debugging(self):
+        with self.assertLogs('pragma', logging.DEBUG) as logs:
+            @pragma.collapse_literals(return_source=True)
+            def f():
+                return 1 + 2
+
+        self.assertTrue(any('Starting to visit' in line for line in logs.output))
+        self.assertTrue(any('START' in line for line in logs.output))
+        self.assertFalse(pragma.core._tracing)
@@ -1,11 +1,13 @@
 # file deepcode ignore E0602: Ignore undefined variables because they never go live if just converting function string
 # file deepcode ignore E0102: Ignore function names that are redefined, such as f(x)
 from textwrap import dedent
-from unittest import SkipTest
+from unittest import SkipTest, mock
 import sys
 import math
 
 import pragma
+from pragma.core.cache import transform_cache
+from pragma.unroll import UnrollTransformer
 from .test_pragma import PragmaTest
 
 dict_order_maintained = (sys.version_info.minor >= 6)
@@ -305,19 +307,171 @@ class TestUnroll(PragmaTest):
     def test_inner_break(self):
         @pragma.unroll
         def f(y):
-            for i in range(10):
+            for i in range(3):
                 print(i)
                 if i == y:
                     break
+            else:
+                print('Not found')
 
         result = '''
         def f(y):
-            for i in range(10):
-                print(i)
-                if i == y:
+            for ____ in [None]:
+                print(0)
+                if 0 == y:
+                    break
+                print(1)
+                if 1 == y:
+                    break
+                print(2)
+                if 2 == y:
+                    break
+            else:
+                print('Not found')
+        '''
+
+        self.assertSourceEqual(f, result)
+
+    def test_static_break_continue(self):
+        K = 2
+
+        @pragma.unroll
+        def f(a):
+            for i in range(5):
+                if i == K:
+                    break
+                elif i == 0:
+                    continue
+                a.append(i)
+            else:
+                a.append('else')
+            return a
+
+        result = '''
+        def f(a):
+            a.append(1)
+            return a
+        '''
+        self.assertSourceEqual(f, result)
+
+        @pragma.unroll
+        def g(a):
+            for i in range(3):
+                if i == 1:
+                    continue
+                a.append(i)
+            else:
+                a.append('else')
+            return a
+
+        result = '''
+        def g(a):
+            a.append(0)
+            a.append(2)
+            a.append('else')
+            return a
+        '''
+        self.assertSourceEqual(g, result)
+
+    def test_dynamic_break_continue(self):
+        def f(a, t):
+            for i in range(4):
+                if a[i] < 0:
+                    continue
+                if a[i] > t:
                     break
+                t -= a[i]
+            else:
+                return None
+            return i, t
+
+        result = '''
+        def f(a, t):
+            PRAGMA_broke = False
+            for ____ in [None]:
+                for ____ in [None]:
+                    i = 0
+                    if a[0] < 0:
+                        continue
+                    if a[0] > t:
+                        PRAGMA_broke = True
+                        break
+                    t -= a[0]
+                if PRAGMA_broke:
+                    break
+                for ____ in [None]:
+                    i = 1
+                    if a[1] < 0:
+                        continue
+                    if a[1] > t:
+                        PRAGMA_broke = True
+                        break
+                    t -= a[1]
+                if PRAGMA_broke:
+                    break
+                for ____ in [None]:
+                    i = 2
+                    if a[2] < 0:
+                        continue
+                    if a[2] > t:
+                        PRAGMA_broke = True
+                        break
+                    t -= a[2]
+                if PRAGMA_broke:
+                    break
+                for ____ in [None]:
+                    i = 3
+                    if a[3] < 0:
+                        continue
+                    if a[3] > t:
+                        PRAGMA_broke = True
+                        break
+                    t -= a[3]
+                if PRAGMA_broke:
+                    break
+            else:
+                return None
+            return i, t
         '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+
+        g = pragma.unroll(f)
+        for a in [[1, 2, 3, 4], [-1, 5, 1, -1], [3, -2, 0, 9], [-1, -1, -1, -1]]:
+            for t in range(8):
+                self.assertEqual(g(list(a), t), f(list(a), t))
 
+    def test_nested_dynamic_break(self):
+        def f(a):
+            s = 0
+            for i in range(3):
+                for j in range(3):
+                    if a[i][j] < 0:
+                        break
+                    if a[i][j] == 0:
+                        continue
+                    s += a[i][j]
+                if s > 5:
+                    break
+            return s
+
+        g = pragma.unroll(f)
+        self.assertIn('PRAGMA_broke1', pragma.unroll(return_source=True)(f))
+        for a in [[[1, 2, 3]] * 3, [[1, -1, 3], [0, 2, 0], [1, 1, 1]], [[0, 0, 0], [1, 0, -1], [-1, 9, 9]]]:
+            self.assertEqual(g(a), f(a))
+
+    def test_unsupported_break(self):
+        @pragma.unroll
+        def f(lock):
+            for i in range(3):
+                with lock:
+                    break
+
+        result = '''
+        def f(lock):
+            for i in range(3):
+                with lock:
+                    break
+        '''
         self.assertSourceEqual(f, result)
 
     def test_nonliteral_iterable(self):
@@ -655,3 +809,574 @@ class TestUnroll(PragmaTest):
             self.assertSourceEqual(f, result)
             self.assertEqual(list(f()), a)
 
+
+    def test_scales_linearly(self):
+        def make(n):
+            def f(x):
+                for i in range(n):
+                    for j in range(4):
+                        x += i * j
+                return x
+            return f
+
+        loop_vars = []
+        visit_name = UnrollTransformer.visit_Name
+
+        def record(transformer, node):
+            loop_vars.append(len(transformer.loop_vars))
+            return visit_name(transformer, node)
+
+        def stats(n):
+            return pragma.unroll(save_source=False)(make(n)).__pragma_stats__
+
+        size, transform_cache.maxsize = transform_cache.maxsize, 0
+        try:
+            with mock.patch.object(UnrollTransformer, 'visit_Name', record):
+                small, large = stats(100), stats(800)
+        finally:
+            transform_cache.maxsize = size
+        # 8x the iterations is 8x the work, give or take the function's fixed size
+        self.assertLess(large.nodes_visited / small.nodes_visited, 8.1)
+        self.assertLess(large.resolver_calls / small.resolver_calls, 8.1)
+        # Each name lookup checks one entry per loop variable; this used to hold one set per unrolled iteration
+        self.assertEqual(max(loop_vars), 2)
+
+    def test_budget_fits(self):
+        @pragma.unroll(max_statements=3)
+        def f(x):
+            for i in range(3):
+                x += i
+            return x
+
+        result = '''
+        def f(x):
+            x += 0
+            x += 1
+            x += 2
+            return x
+        '''
+        self.assertSourceEqual(f, result)
+
+    def test_budget_tiers(self):
+        def f(x):
+            for i in range(10):
+                for j in range(3):
+                    x += i * j
+            return x
+
+        result = '''
+        def f(x):
+            for PRAGMA_iouter in range(0, 9, 3):
+                x += PRAGMA_iouter * 0
+                x += PRAGMA_iouter * 1
+                x += PRAGMA_iouter * 2
+                x += (PRAGMA_iouter + 1) * 0
+                x += (PRAGMA_iouter + 1) * 1
+                x += (PRAGMA_iouter + 1) * 2
+                x += (PRAGMA_iouter + 2) * 0
+                x += (PRAGMA_iouter + 2) * 1
+                x += (PRAGMA_iouter + 2) * 2
+            x += 9 * 0
+            x += 9 * 1
+            x += 9 * 2
+            return x
+        '''
+        self.assertSourceEqual(pragma.unroll(max_statements=14, return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(max_statements=14)(f)(1), f(1))
+
+    def test_budget_carried(self):
+        def f():
+            out = []
+            y = 1
+            for i in range(6):
+                y = y + 1
+                for j in range(y):  # Grows with every iteration, so it can't be unrolled inside a tier
+                    out.append((i, j))
+            return out
+
+        result = '''
+        def f():
+            out = []
+            y = 1
+            for PRAGMA_iouter in range(0, 6, 2):
+                y = y + 1
+                for j in range(y):
+                    out.append((PRAGMA_iouter, j))
+                y = y + 1
+                for j in range(y):
+                    out.append((PRAGMA_iouter + 1, j))
+            return out
+        '''
+        self.assertSourceEqual(pragma.unroll(max_statements=8, return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(max_statements=8)(f)(), f())
+
+    def test_budget_nested(self):
+        def f(x):
+            for i in range(100):
+                for j in range(100):
+                    x += i * j
+            return x
+
+        # The outer loop can't fit even two copies of the inner loop unrolled, so only the inner loop is unrolled
+        g = pragma.unroll(max_nodes=500)(f)
+        self.assertEqual(g(1), f(1))
+        self.assertIn('for i in range(100):', pragma.unroll(max_nodes=500, return_source=True)(f))
+
+    def test_budget_leaves_alone(self):
+        a = [3, 1, 2]
+
+        def f(x):
+            for i in a:  # Not a range, so it can't be unrolled in tiers
+                x += i
+            for i in range(10):
+                x += i
+                if x > 20:
+                    break
+            return x
+
+        result = '''
+        def f(x):
+            for i in a:
+                x += i
+            for i in range(10):
+                x += i
+                if x > 20:
+                    break
+            return x
+        '''
+        self.assertSourceEqual(pragma.unroll(max_statements=2, return_source=True)(f), result)
+
+    def test_unroll_factor(self):
+        def f(x, n):
+            for i in range(n):
+                x += i
+            return x
+
+        result = '''
+        def f(x, n):
+            PRAGMA_range = range(n)
+            for PRAGMA_iouter in PRAGMA_range[:len(PRAGMA_range) // 3 * 3:3]:
+                x += PRAGMA_iouter
+                x += PRAGMA_iouter + 1
+                x += PRAGMA_iouter + 2
+            for i in PRAGMA_range[len(PRAGMA_range) // 3 * 3:]:
+                x += i
+            return x
+        '''
+        self.assertSourceEqual(pragma.unroll(unroll_factor=3, return_source=True)(f), result)
+        g = pragma.unroll(unroll_factor=3)(f)
+        for n in range(8):
+            self.assertEqual(g(0, n), f(0, n))
+
+    def test_unroll_factor_nested(self):
+        def f(x, a, b, m):
+            for i in range(a, b, -3):
+                for j in range(m):
+                    for k in range(2):
+                        x += i * j - k
+            return x
+
+        g = pragma.unroll(unroll_factor=2)(f)
+        source = pragma.unroll(unroll_factor=2, return_source=True)(f)
+        self.assertIn('PRAGMA_range1 = range(m)', source)
+        for a in range(-4, 5):
+            for b in range(-8, 3):
+                self.assertEqual(g(0, a, b, 3), f(0, a, b, 3))
+
+    def test_unroll_factor_carried(self):
+        def f(n):
+            out = []
+            y = 1
+            for i in range(n):
+                y = y * 2
+                for j in range(y):  # Each copy of the body runs once per outer iteration, so y isn't known
+                    out.append((i, j))
+            return out
+
+        g = pragma.unroll(unroll_factor=2)(f)
+        self.assertEqual(len(g(4)), 30)
+        for n in range(6):
+            self.assertEqual(g(n), f(n))
+
+    def test_unroll_factor_skipped(self):
+        def f(x, n, step):
+            for i in range(n):  # The loop variable is read after the loop
+                x += i
+            for j in range(0, n, step):  # The step isn't known
+                x += j
+            for k in range(n):
+                if x > 100:
+                    break
+                x += k
+            return x + i
+
+        result = '''
+        def f(x, n, step):
+            for i in range(n):
+                x += i
+            for j in range(0, n, step):
+                x += j
+            for k in range(n):
+                if x > 100:
+                    break
+                x += k
+            return x + i
+        '''
+        self.assertSourceEqual(pragma.unroll(unroll_factor=2, return_source=True)(f), result)
+
+    def test_unroll_versions(self):
+        def f(x, N):
+            """Sums squares"""
+            for i in range(N):
+                x += i * i
+            return x
+
+        result = '''
+        def f(x, N):
+            """Sums squares"""
+            if N == 2:
+                x += 0 * 0
+                x += 1 * 1
+                return x
+            elif N == 3:
+                x += 0 * 0
+                x += 1 * 1
+                x += 2 * 2
+                return x
+            else:
+                for i in range(N):
+                    x += i * i
+                return x
+        '''
+        self.assertSourceEqual(pragma.unroll(unroll_versions={'N': [2, 3]}, return_source=True)(f), result)
+        g = pragma.unroll(unroll_versions={'N': [2, 3]})(f)
+        self.assertEqual(g.__doc__, 'Sums squares')
+        for n in range(6):
+            self.assertEqual(g(1, n), f(1, n))
+
+    def test_unroll_versions_combined(self):
+        def f(a, N, M):
+            s = 0
+            for i in range(N):
+                for j in range(M):
+                    s += a[i][j]
+            return s
+
+        result = '''
+        def f(a, N, M):
+            if N == 1 and M == 2:
+                s = 0
+                s += a[0][0]
+                s += a[0][1]
+                return s
+            elif N == 2 and M == 2:
+                s = 0
+                s += a[0][0]
+                s += a[0][1]
+                s += a[1][0]
+                s += a[1][1]
+                return s
+            else:
+                s = 0
+                for i in range(N):
+                    for j in range(M):
+                        s += a[i][j]
+                return s
+        '''
+        self.assertSourceEqual(pragma.unroll(unroll_versions={'N': [1, 2], 'M': [2]}, return_source=True)(f), result)
+
+        # Running unroll again, as pragma.optimize does, doesn't version the function twice
+        g = pragma.optimize(pragma.unroll(unroll_versions={'N': [1, 2], 'M': [2]}), pragma.collapse_literals)(f)
+        self.assertEqual(g.__pragma_stats__.stop_reason, 'converged')
+        a = [[1, 2, 3], [4, 5, 6]]
+        for n, m in [(1, 2), (2, 2), (2, 3), (0, 0)]:
+            self.assertEqual(g(a, n, m), f(a, n, m))
+
+        with self.assertRaises(ValueError):
+            pragma.unroll(unroll_versions={'N': 3})(f)
+
+    def test_while(self):
+        N = 3
+
+        def f(a):
+            x = 0
+            i = 0
+            while i < N:
+                x += a[i]
+                i += 1
+            else:
+                x *= 2
+            return x, i
+
+        result = '''
+        def f(a):
+            x = 0
+            i = 0
+            x += a[i]
+            i += 1
+            x += a[i]
+            i += 1
+            x += a[i]
+            i += 1
+            x *= 2
+            return x, i
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(f)([1, 2, 3]), f([1, 2, 3]))
+
+        result = '''
+        def f(a):
+            x = 0
+            i = 0
+            x += a[0]
+            i += 1
+            x += a[1]
+            i += 1
+            x += a[2]
+            i += 1
+            x *= 2
+            return x, 3
+        '''
+        self.assertSourceEqual(pragma.pipeline(pragma.unroll, pragma.collapse_literals, return_source=True)(f),
+                               result)
+
+    def test_while_break(self):
+        @pragma.unroll
+        def f(a):
+            i = 0
+            while True:
+                i += 1
+                if i % 2:
+                    continue
+                if i > 4:
+                    break
+                a.append(i)
+            return a
+
+        result = '''
+        def f(a):
+            i = 0
+            i += 1
+            i += 1
+            a.append(i)
+            i += 1
+            i += 1
+            a.append(i)
+            i += 1
+            i += 1
+            return a
+        '''
+        self.assertSourceEqual(f, result)
+        self.assertEqual(f([]), [2, 4])
+
+    def test_while_left_alone(self):
+        def f(a, n):
+            i = 0
+            while i < n:  # Not known until the function's called
+                i += 1
+            j = 0
+            while j < 10:
+                if a[j]:  # Breaks depending on a runtime value
+                    break
+                j += 1
+            k = 0
+            while k < 10 ** 6:  # Too many iterations
+                k += 1
+            return i, j, k
+
+        result = '''
+        def f(a, n):
+            i = 0
+            while i < n:
+                i += 1
+            j = 0
+            while j < 10:
+                if a[j]:
+                    break
+                j += 1
+            k = 0
+            while k < 10 ** 6:
+                k += 1
+            return i, j, k
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+
+    def test_itertools(self):
+        from itertools import product, combinations, chain
+
+        def f(a):
+            for i, j in product(range(2), range(2)):
+                a[i][j] += 1
+            for i, j in combinations('abc', 2):
+                print(i, j)
+            for x in chain([1, 2], (3,)):
+                print(x)
+
+        result = '''
+        def f(a):
+            a[0][0] += 1
+            a[0][1] += 1
+            a[1][0] += 1
+            a[1][1] += 1
+            print('a', 'b')
+            print('a', 'c')
+            print('b', 'c')
+            print(1)
+            print(2)
+            print(3)
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+
+    def test_callbacks_not_called(self):
+        from functools import reduce
+        from itertools import accumulate, starmap
+        from operator import add
+        calls = []
+
+        def cb(a, b):
+            calls.append((a, b))
+            return a + b
+
+        def f():
+            for x in accumulate([1, 2, 3], cb):  # cb is only called when f is
+                print(x)
+            for x in starmap(add, [(1, 2), (3, 4)]):
+                print(x)
+            return reduce(cb, (1, 2))
+
+        result = '''
+        def f():
+            for x in accumulate([1, 2, 3], cb):
+                print(x)
+            print(3)
+            print(7)
+            return reduce(cb, (1, 2))
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(calls, [])
+
+    def test_unknown_function_left_alone(self):
+        def pairs():
+            yield 0, 1
+
+        def f():
+            for i, j in [(1, 2)]:
+                print(i, j)
+            for i, j in pairs():  # Could do anything, so isn't called
+                print(i, j)
+
+        result = '''
+        def f():
+            print(1, 2)
+            for i, j in pairs():
+                print(i, j)
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+
+    def test_comprehensions(self):
+        w = (2, 3, 5)
+
+        def f(x):
+            a = [w[i] * x[i] for i in range(3)]
+            b = {x[i] for i in range(2)}
+            c = {i: x[i] for i in range(4) if i % 2}
+            d = [(i, j) for i in range(3) for j in range(i)]
+            return a, b, c, d
+
+        result = '''
+        def f(x):
+            a = [w[0] * x[0], w[1] * x[1], w[2] * x[2]]
+            b = {x[0], x[1]}
+            c = {(1): x[1], (3): x[3]}
+            d = [(1, 0), (2, 0), (2, 1)]
+            return a, b, c, d
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(f)([1, 2, 3, 4]), f([1, 2, 3, 4]))
+
+    def test_generator_expressions(self):
+        coeffs = (0.5, 1.5)
+
+        def f(x):
+            a = sum(c * x[i] for i, c in enumerate(coeffs))
+            b = max((x[i] for i in range(2)), key=abs)
+            c = any(x[i] > 2 for i in range(3))
+            d = all(x[i] > 2 for i in [])
+            e = (x[i] for i in range(2))  # Not consumed by a builtin
+            return a, b, c, d, list(e)
+
+        result = '''
+        def f(x):
+            a = sum((0.5 * x[0], 1.5 * x[1]))
+            b = max((x[0], x[1]), key=abs)
+            c = bool(x[0] > 2 or x[1] > 2 or x[2] > 2)
+            d = True
+            e = (x[i] for i in range(2))
+            return a, b, c, d, list(e)
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(f)([1, -4, 3]), f([1, -4, 3]))
+
+    def test_comprehensions_left_alone(self):
+        def f(x, n):
+            a = [y for y in x]  # Not known until the function's called
+            b = [x[i] for i in range(3) if x[i]]  # Filtered by a runtime value
+            c = [i for i in range(10 ** 6)]  # Too many items
+            d = {i for i in []}  # There's no literal for an empty set
+            sum = len
+            e = sum(i for i in range(3))  # Not the builtin
+            return a, b, c, d, e
+
+        result = '''
+        def f(x, n):
+            a = [y for y in x]
+            b = [x[i] for i in range(3) if x[i]]
+            c = [i for i in range(10 ** 6)]
+            d = {i for i in []}
+            sum = len
+            e = sum(i for i in range(3))
+            return a, b, c, d, e
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+
+    def test_changed_in_place(self):
+        def f(a):
+            out = []
+            out.append(a)  # The context only knows that out was empty
+            b = [g for g in out]
+            for g in out:
+                b.append(g)
+            c = [1, 2]  # Only ever read or looped over
+            return b, [g for g in c]
+
+        result = '''
+        def f(a):
+            out = []
+            out.append(a)
+            b = [g for g in out]
+            for g in out:
+                b.append(g)
+            c = [1, 2]
+            return b, [1, 2]
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(f)(5), ([5, 5], [1, 2]))
+
+    def test_comprehensions_late_binding(self):
+        fs = [lambda: 0, lambda: 1]
+
+        def f():
+            a = [lambda: i for i in range(3)]  # Each lambda reads i when it's called, so they all return 2
+            b = [[i * j for j in range(2)] for i in range(2)]  # Only the inner one can be expanded
+            c = [g() for g in fs]  # Would be emitted as 'lambda: 0()'
+            return [h() for h in a], b, c
+
+        result = '''
+        def f():
+            a = [(lambda : i) for i in range(3)]
+            b = [[i * 0, i * 1] for i in range(2)]
+            c = [g() for g in fs]
+            return [h() for h in a], b, c
+        '''
+        self.assertSourceEqual(pragma.unroll(return_source=True)(f), result)
+        self.assertEqual(pragma.unroll(f)(), ([2, 2, 2], [[0, 0], [0, 1]], [0, 1]))
@@ -0,0 +1,173 @@
+# file deepcode ignore E0602: Ignore undefined variables because they never go live if just converting function string
+# file deepcode ignore E0102: Ignore function names that are redefined, such as f(x)
+from unittest import SkipTest, mock
+
+import pragma
+from pragma import config
+from .test_pragma import PragmaTest
+
+try:
+    import numpy as np
+except ImportError:  # pragma: nocover
+    np = None
+
+
+class TestVectorize(PragmaTest):
+    def setUp(self):
+        super().setUp()
+        if np is None:
+            raise SkipTest("NumPy isn't installed")
+        # Keeps the examples short
+        self.min_length, config.vectorize_min_length = config.vectorize_min_length, 4
+
+    def tearDown(self):
+        config.vectorize_min_length = self.min_length
+
+    def test_loop(self):
+        def f(out, a, b, k):
+            for i in range(8):
+                out[i] = a[i] * b[i] + k
+            for j in range(1, 7):
+                out[j] += a[j - 1]
+            return out
+
+        result = '''
+        def f(out, a, b, k):
+            if PRAGMA_vectorizable((out, a, b), (8, 8, 8), 1, (k,)):
+                out[0:8] = a[0:8] * b[0:8] + k
+            else:
+                for i in range(8):
+                    out[i] = a[i] * b[i] + k
+            if PRAGMA_vectorizable((out, a), (7, 6), 1, (), (0,)):
+                out[1:7] += a[0:6]
+            else:
+                for j in range(1, 7):
+                    out[j] += a[j - 1]
+            return out
+        '''
+        self.assertSourceEqual(pragma.vectorize_loops(return_source=True)(f), result)
+
+        g = pragma.vectorize_loops(f)
+        a, b = np.arange(8.), np.arange(8.) + 1
+        np.testing.assert_array_equal(g(np.zeros(8), a, b, 2), f(np.zeros(8), a, b, 2))
+        # Lists are left to the original loops, since they'd be concatenated and repeated rather than multiplied
+        self.assertEqual(g([0] * 8, list(a), list(b), 2), f([0] * 8, list(a), list(b), 2))
+
+    def test_unrolled(self):
+        def f(out, a, b):
+            for i in range(5):
+                out[i] = a[i] + b[i + 1]
+            return out
+
+        result = '''
+        def f(out, a, b):
+            if PRAGMA_vectorizable((out, a, b), (5, 5, 6), 1, ()):
+                out[0:5] = a[0:5] + b[1:6]
+            else:
+                out[0] = a[0] + b[0 + 1]
+                out[1] = a[1] + b[1 + 1]
+                out[2] = a[2] + b[2 + 1]
+                out[3] = a[3] + b[3 + 1]
+                out[4] = a[4] + b[4 + 1]
+            return out
+        '''
+        self.assertSourceEqual(pragma.pipeline(pragma.unroll, pragma.vectorize_loops, return_source=True)(f), result)
+
+        g = pragma.pipeline(pragma.unroll, pragma.vectorize_loops)(f)
+        np.testing.assert_array_equal(g(np.zeros(5), np.arange(5.), np.arange(6.)),
+                                      f(np.zeros(5), np.arange(5.), np.arange(6.)))
+
+    def test_dependent_left_alone(self):
+        def f(out, a, n):
+            for i in range(1, 8):
+                out[i] = out[i - 1] + a[i]  # Each iteration reads the last one's result
+            for i in range(8):
+                out[i] = a[i] * i  # Uses the index as a value
+            for i in range(3):
+                out[i] = a[i]  # Too short to be worth it
+            for i in range(n):
+                out[i] = a[i]  # Not known until the function's called
+            return out
+
+        result = '''
+        def f(out, a, n):
+            for i in range(1, 8):
+                out[i] = out[i - 1] + a[i]
+            for i in range(8):
+                out[i] = a[i] * i
+            for i in range(3):
+                out[i] = a[i]
+            for i in range(n):
+                out[i] = a[i]
+            return out
+        '''
+        self.assertSourceEqual(pragma.vectorize_loops(return_source=True)(f), result)
+
+    def test_overlapping_arrays(self):
+        @pragma.vectorize_loops
+        def f(out, a):
+            for i in range(5):
+                out[i] = a[i] * 2
+            return out
+
+        x = np.arange(6.)
+        expected = x.copy()
+        for i in range(5):
+            expected[i] = expected[i + 1] * 2
+        # out and a are views of the same array, so the loop runs element by element
+        np.testing.assert_array_equal(f(x[:5], x[1:]), expected[:5])
+
+    def test_loop_variable_kept(self):
+        def f(out, a):
+            for i in range(4):
+                out[i] = a[i]
+            return i
+
+        result = '''
+        def f(out, a):
+            if PRAGMA_vectorizable((out, a), (4, 4), 1, ()):
+                out[0:4] = a[0:4]
+                i = 3
+            else:
+                for i in range(4):
+                    out[i] = a[i]
+            return i
+        '''
+        self.assertSourceEqual(pragma.vectorize_loops(return_source=True)(f), result)
+        self.assertEqual(pragma.vectorize_loops(f)(np.zeros(4), np.ones(4)), 3)
+
+    def test_without_numpy(self):
+        def f(out, a):
+            for i in range(4):
+                out[i] = a[i] + 1
+            return out
+
+        # The slice form could never run, so the loop is left as it is
+        result = '''
+        def f(out, a):
+            for i in range(4):
+                out[i] = a[i] + 1
+            return out
+        '''
+        with mock.patch('pragma.vectorize.numpy', None):
+            self.assertSourceEqual(pragma.vectorize_loops(return_source=True)(f), result)
+
+    def test_scalar_semantics_kept(self):
+        def f(out, a, b):
+            for i in range(4):
+                out[i] = a[i] * b[i]
+            return out
+
+        @pragma.vectorize_loops
+        def g(out, a):
+            for i in range(4):
+                out[i] += a[i]
+            return out
+
+        # A row of a 2-D array would broadcast against b rather than being multiplied element by element
+        a = np.arange(16.).reshape(4, 4)
+        b = np.arange(4.)
+        np.testing.assert_array_equal(pragma.vectorize_loops(f)(np.zeros((4, 4)), a, b), f(np.zeros((4, 4)), a, b))
+        # In place, NumPy refuses to cast floats to ints, where the loop truncates
+        np.testing.assert_array_equal(g(np.zeros(4, dtype=int), np.full(4, 1.5)), [1, 1, 1, 1])
+        np.testing.assert_array_equal(g(np.zeros(4), np.full(4, 1.5)), [1.5] * 4)